@@ -0,0 +1,127 @@
+"""
+   CodeCraft PMS Backend Project
+
+   파일명   : batch_DB.py
+   생성자   : 김창환
+
+   생성일   : 2026/10/18
+   업데이트 : 2026/10/18
+
+   설명     : Database Project의 연결을 사용하는 일괄 조회/저장/삭제 쿼리 정의
+"""
+
+from logger import logger
+import os, sys
+
+sys.path.append(os.path.abspath('/data/Database Project'))  # Database Project와 연동하기 위해 사용
+
+import mysql_connection
+
+# Database Project 모듈은 행 단위 함수만 제공하므로, 여러 행을 한 번에 처리하는 쿼리는 이 모듈에 모은다.
+# 각 함수는 하나의 연결과 하나의 트랜잭션으로 실행하며, 실패하면 rollback 후 예외를 그대로 발생시킨다.
+# (Database Project 함수처럼 Exception 객체를 반환하지 않으므로 호출하는 쪽에서 실패를 무시할 수 없음)
+# 테이블과 컬럼 이름은 Database Project의 스키마를 따르며, 이 모듈의 쿼리가 사용하는 이름은 모두 SCHEMA에 모아 둔다.
+# 서버 시작 시 verify_schema()로 실제 DB에 SCHEMA의 테이블/컬럼이 있는지 확인하고(test_batch_DB.py는 실제 DB가 있는
+# 환경에서 각 쿼리를 rollback되는 트랜잭션으로 실행), 스키마가 바뀌면 이 모듈도 함께 수정해야 한다.
+HISTORY_TABLE = "history"  # CCP 버전 히스토리 (csv_DB.fetch_csv_history/insert_csv_history/delete_csv_history가 사용)
+OTHER_DOCUMENT_TABLE = "doc_other"  # 기타 산출물 (output_DB.add_other_document/fetch_all_other_documents가 사용)
+ATTACHMENT_TABLE = "doc_attach"  # 산출물 첨부파일 (output_DB.add_attachment/fetch_all_attachments가 사용)
+PROJECT_TABLE = "project"  # 프로젝트 (project_DB.init_project가 사용)
+OTHER_DOCUMENT_COLUMNS = ("file_no", "file_name", "file_path", "file_date", "s_no", "p_no")  # output_DB.add_other_document 인자(file_unique_id, ..., univ_id, pid) 순서
+SCHEMA = {  # 테이블 -> 이 모듈의 쿼리가 사용하는 컬럼
+    HISTORY_TABLE: ("p_no", "ver"),
+    OTHER_DOCUMENT_TABLE: OTHER_DOCUMENT_COLUMNS,
+    ATTACHMENT_TABLE: ("doc_a_no",),
+    PROJECT_TABLE: ("p_no",),
+}
+PROJECT_ID_SOURCES = [(PROJECT_TABLE, "p_no")]  # 프로젝트 번호를 사용하는 (테이블, 컬럼)
+FILE_ID_SOURCES = [(OTHER_DOCUMENT_TABLE, "file_no"), (ATTACHMENT_TABLE, "doc_a_no")]  # 파일 고유 ID를 사용하는 (테이블, 컬럼)
+
+def _placeholders(values):
+    return ", ".join(["%s"] * len(values))
+
+
+def _execute(query, args=None, many=False):
+    """쿼리를 하나의 트랜잭션으로 실행하고 영향받은 행 수를 반환"""
+    connection = mysql_connection.db_connect()
+    cursor = connection.cursor()
+    try:
+        if many:
+            cursor.executemany(query, args)
+        else:
+            cursor.execute(query, args)
+        connection.commit()
+        return cursor.rowcount
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+        connection.close()
+
+
+def _first(row):
+    """조회 결과 행의 첫 번째 값 (연결의 cursor가 DictCursor여도 동작)"""
+    return next(iter(row.values())) if isinstance(row, dict) else row[0]
+
+
+def _fetch(query, args=None):
+    """조회 쿼리를 실행하고 모든 행을 반환"""
+    connection = mysql_connection.db_connect()
+    cursor = connection.cursor()
+    try:
+        cursor.execute(query, args)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+        connection.close()
+
+
+def verify_schema():
+    """SCHEMA의 테이블과 컬럼이 실제 DB에 있는지 확인 (없는 항목이 있으면 모두 모아 Exception 발생)"""
+    errors = []
+    for table, columns in SCHEMA.items():
+        try:
+            _fetch(f"SELECT {', '.join(columns)} FROM {table} LIMIT 0")
+        except Exception as e:
+            errors.append(f"{table}({', '.join(columns)}): {e}")
+    if errors:
+        raise Exception(f"Database schema does not match batch_DB: {'; '.join(errors)}")
+
+
+def fetch_existing_ids(sources, ids):
+    """ids 중 sources((테이블, 컬럼) 목록)의 어느 테이블에든 이미 있는 번호를 한 번의 조회로 반환"""
+    ids = [int(uid) for uid in ids]
+    if not ids:
+        return set()
+    query = " UNION ".join(f"SELECT {column} FROM {table} WHERE {column} IN ({_placeholders(ids)})" for table, column in sources)
+    return {int(_first(row)) for row in _fetch(query, ids * len(sources))}
+
+
+def delete_history_versions(pid, versions):
+    """프로젝트 히스토리에서 지정한 버전들의 행을 삭제하고 삭제된 행 수를 반환"""
+    versions = [int(ver) for ver in versions]
+    if not versions:
+        return 0
+    deleted = _execute(
+        f"DELETE FROM {HISTORY_TABLE} WHERE p_no = %s AND ver IN ({_placeholders(versions)})",
+        [pid] + versions
+    )
+    logger.info(f"Deleted {deleted} history rows of PID {pid} (versions {versions})")
+    return deleted
+
+
+def add_other_documents(documents, pid, univ_id):
+    """기타 산출물 메타데이터 여러 개를 하나의 트랜잭션으로 저장 (전부 저장되거나 하나도 저장되지 않음)
+
+    PyMySQL의 executemany는 INSERT ... VALUES 문을 여러 행의 VALUES를 가진 INSERT 하나로 묶어 실행한다.
+    """
+    rows = [(document["file_unique_id"], document["file_name"], document["file_path"], document["file_date"], univ_id, pid)
+            for document in documents]
+    if not rows:
+        return 0
+    _execute(
+        f"INSERT INTO {OTHER_DOCUMENT_TABLE} ({', '.join(OTHER_DOCUMENT_COLUMNS)}) VALUES ({_placeholders(OTHER_DOCUMENT_COLUMNS)})",
+        rows, many=True
+    )
+    return len(rows)
@@ -0,0 +1,73 @@
+"""
+   CodeCraft PMS Backend Project
+
+   파일명   : bench_ccp_codecs.py
+   생성자   : 김창환
+
+   생성일   : 2026/10/18
+   업데이트 : 2026/10/18
+
+   설명     : CCP 스트림 코덱(none/gzip/zstd)별 암호화/복호화 처리량과 압축률 비교 벤치마크
+              실행: python bench_ccp_codecs.py
+"""
+
+from cryptography.fernet import Fernet
+import io, os, time, statistics
+import ccp_stream
+
+SIZE = 64 * 1024 * 1024  # 측정할 평문 크기 (바이트)
+WRITE_SIZE = 64 * 1024  # tarfile이 한 번에 기록하는 크기와 비슷한 쓰기 단위
+ROUNDS = 3  # 측정 반복 횟수 (중앙값 사용)
+WORKERS = (1, 4)  # 청크 병렬 처리 스레드 수
+KEY = Fernet.generate_key()
+
+
+def sample_payload(size):
+    """CCP 내용과 비슷한 평문: 압축이 잘 되는 CSV/텍스트 절반 + 이미 압축된 파일(무작위 바이트) 절반"""
+    text = b"p_no,s_no,title,date\n" + b"".join(f"{i},{20240000 + i % 97},weekly report {i},2026-10-18\n".encode() for i in range(4096))
+    half = size // 2
+    return (text * (half // len(text) + 1))[:half] + os.urandom(size - half)
+
+
+def encrypt(data, codec, workers):
+    out = io.BytesIO()
+    with ccp_stream.CCPStreamWriter(out, KEY, codec=codec, workers=workers) as writer:
+        for i in range(0, len(data), WRITE_SIZE):
+            writer.write(data[i:i + WRITE_SIZE])
+    return out.getvalue()
+
+
+def decrypt(blob):
+    reader = ccp_stream.CCPStreamReader(io.BytesIO(blob), KEY)
+    while reader.read(WRITE_SIZE):
+        pass
+
+
+def timed(function, *args):
+    durations = []
+    result = None
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        result = function(*args)
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations), result
+
+
+def main():
+    data = sample_payload(SIZE)
+    megabytes = SIZE / (1024 * 1024)
+    for name in ccp_stream.CODECS:
+        try:
+            codec = ccp_stream.resolve_codec(name)
+        except Exception as e:
+            print(f"{name:<5} skipped: {e}")
+            continue
+        for workers in WORKERS:
+            encrypt_time, blob = timed(encrypt, data, codec, workers)
+            decrypt_time, _ = timed(decrypt, blob)
+            print(f"{name:<5} workers {workers}  encrypt {megabytes / encrypt_time:8.1f} MiB/s  "
+                  f"decrypt {megabytes / decrypt_time:8.1f} MiB/s  ratio {len(blob) / SIZE:6.3f}")
+
+
+if __name__ == "__main__":
+    main()
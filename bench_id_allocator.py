@@ -0,0 +1,104 @@
+"""
+   CodeCraft PMS Backend Project
+
+   파일명   : bench_id_allocator.py
+   생성자   : 김창환
+
+   생성일   : 2026/10/18
+   업데이트 : 2026/10/18
+
+   설명     : 프로젝트 번호 발급 방식 비교 벤치마크 (기존 random + is_uid_exists 방식 / id_allocator 블록 발급)
+              실행: python bench_id_allocator.py
+"""
+
+import os, sys, time, types, random, tempfile, importlib, logging, statistics
+
+sys.path.append(os.path.abspath('/data/Database Project'))  # Database Project와 연동하기 위해 사용
+
+# 실제 DB 대신 왕복 지연을 흉내내는 연결을 사용하므로 Database Project가 없어도 실행할 수 있게 함
+try:
+    importlib.import_module("mysql_connection")
+except ImportError:
+    sys.modules["mysql_connection"] = types.ModuleType("mysql_connection")
+
+bench_dir = tempfile.TemporaryDirectory()  # 시퀀스 DB를 실행마다 새로 만들고 종료 시 삭제
+os.environ.setdefault('ID_ALLOCATOR_DB', os.path.join(bench_dir.name, "id_allocator.db"))
+import batch_DB
+import id_allocator
+
+RTT = 0.0002  # DB 왕복 지연 (초)
+ROW_COST = 0.000002  # IN 목록의 번호 하나당 추가 조회 시간 (초)
+LOW, HIGH = 10000, 99999  # 프로젝트 번호 범위
+REQUESTS = 300  # 측정할 발급 횟수
+REQUEST_GAP = 0.002  # 발급 요청 사이 간격 (초); 백그라운드 블록 예약이 따라잡을 시간
+FILLS = (0.5, 0.9, 0.99)  # 범위 중 이미 사용 중인 번호 비율
+
+
+class SimulatedConnection:
+    """used 집합을 테이블로 사용하는 DB 연결 (쿼리마다 RTT + 번호 수 * ROW_COST 만큼 지연)"""
+
+    def __init__(self, used, stats):
+        self.used = used
+        self.stats = stats
+        self.rows = []
+
+    def cursor(self):
+        return self
+
+    def execute(self, query, args=None):
+        self.stats["queries"] += 1
+        time.sleep(RTT + ROW_COST * len(args or ()))
+        self.rows = [(uid,) for uid in set(args or ()) if uid in self.used]
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+def random_probe(used):
+    """기존 방식: 무작위 번호를 골라 DB에 있는지 하나씩 확인"""
+    while True:
+        uid = random.randint(LOW, HIGH)
+        if not batch_DB.fetch_existing_ids(batch_DB.PROJECT_ID_SOURCES, [uid]):
+            return uid
+
+
+def measure(name, fill, allocate, used, stats, gap=0.0):
+    latencies = []
+    issued = set()
+    stats["queries"] = 0
+    for _ in range(REQUESTS):
+        started = time.perf_counter()
+        uid = allocate()
+        latencies.append(time.perf_counter() - started)
+        assert uid not in used and uid not in issued, f"duplicate id {uid}"
+        issued.add(uid)
+        used.add(uid)
+        time.sleep(gap)
+    latencies.sort()
+    print(f"fill {fill:5.0%}  {name:<24} mean {statistics.mean(latencies) * 1e3:7.3f}ms  "
+          f"p99 {latencies[int(0.99 * (len(latencies) - 1))] * 1e3:7.3f}ms  max {latencies[-1] * 1e3:7.2f}ms  "
+          f"DB queries/id {stats['queries'] / REQUESTS:5.2f}")
+
+
+def main():
+    logging.disable(logging.INFO)
+    for fill in FILLS:
+        base = set(random.sample(range(LOW, HIGH + 1), int((HIGH - LOW + 1) * fill)))
+        stats = {"queries": 0}
+
+        used = set(base)
+        batch_DB.mysql_connection.db_connect = lambda: SimulatedConnection(used, stats)
+        measure("random + is_uid_exists", fill, lambda: random_probe(used), used, stats)
+
+        used = set(base)
+        batch_DB.mysql_connection.db_connect = lambda: SimulatedConnection(used, stats)
+        allocator = id_allocator.IdAllocator(f"bench_{fill}", LOW, HIGH, 16, batch_DB.PROJECT_ID_SOURCES)
+        allocator.allocate()  # 서버 시작 직후 첫 블록 예약은 측정에서 제외
+        measure("id_allocator (IN query)", fill, allocator.allocate, used, stats, REQUEST_GAP)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,7 @@
    생성자   : 김창환                                
                                                                               
    생성일   : 2025/01/10                                                      
-   업데이트 : 2025/03/23
+   업데이트 : 2026/10/18
                                                                              
    설명     : 프로젝트 Import/Export API 엔드포인트 정의
 """
@@ -17,7 +17,7 @@ from dotenv import load_dotenv
 from urllib.parse import quote
 from logger import logger
 from collections import defaultdict
-import os, sys, logging, shutil, tarfile, io, struct, httpx, requests, json
+import os, sys, logging, shutil, tarfile, io, struct, httpx, requests, json, asyncio, time
 import traceback
 
 router = APIRouter()
@@ -26,6 +26,13 @@ sys.path.append(os.path.abspath('/data/Database Project'))  # Database Project
 import csv_DB
 import project_DB
 import push
+import ccp_stream
+import ccp_store
+import ccp_job
+import ccp_transport
+import deleted_project
+from storage_client import storage
+import ccp_history
 
 class ccp_payload(BaseModel):
     pid: int = None
@@ -33,6 +40,14 @@ class ccp_payload(BaseModel):
     msg: str = None
     ver: int = None
     is_removed: int = None # 삭제된 프로젝트를 복원하는 경우에만 사용; 1로 export 기능을 스킵
+    full: int = None # 1이면 델타 대신 전체 스냅샷으로 저장
+    path: str = None # 버전 내 파일 경로 (예: OUTPUT/{pid}/report.pdf, DATABASE/work_{pid}.csv)
+    offset: int = None # load_history_id 페이지 시작 위치 (저장 시각 최신순 버전 기준)
+    limit: int = None # load_history_id 페이지 크기
+    updated_since: str = None # load_history_id에서 이 시각(같은 초 포함) 이후 저장된 버전만 조회 (이전 응답의 UPDATED 값, (p_no, ver)로 중복 제거)
+
+class ccp_job_payload(BaseModel):
+    job_id: str
 
 def handle_db_result(result):
     """데이터베이스 결과 처리 함수"""
@@ -46,74 +61,132 @@ def create_project_info():
 
 async def pull_storage_server(pid: int, output_path: str):
     """Storage 서버에서 특정 프로젝트의 데이터를 다운로드 및 추출하는 함수"""
-    b_server_url = f"http://192.168.50.84:10080/api/ccp/push"
-    timeout = httpx.Timeout(60.0, connect=5.0)
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        try:
-            response = await client.post(b_server_url, params={"pid": pid})
-            if response.status_code == 200:
-                if not os.path.exists(output_path):
-                    os.makedirs(output_path)
-                archive_path = os.path.join(output_path, f"{pid}_output.tar.gz")
-                with open(archive_path, 'wb') as f:
-                    f.write(response.content)
-                logging.info(f"Downloaded archive for project {pid}: {archive_path}")
-                with tarfile.open(archive_path, 'r:gz') as tar:
-                    tar.extractall(path=output_path)
-                os.remove(archive_path)
-                logging.info(f"Extraction completed and archive removed for project {pid}")
-                return {"RESULT_CODE": 200, "RESULT_MSG": f"Files for project {pid} downloaded successfully."}
-            else:
+    try:
+        async with storage.stream("/ccp/push", params={"pid": pid}) as response:
+            if response.status_code != 200:
                 logging.error(f"Failed to download from storage server for project {pid}. Status code: {response.status_code}")
                 return {"RESULT_CODE": 500, "RESULT_MSG": f"Failed to download from storage server. Status code: {response.status_code}"}
-        except Exception as e:
-            logging.error(f"Error while pulling from storage server for project {pid}: {str(e)}", exc_info=True)
-            return {"RESULT_CODE": 500, "RESULT_MSG": f"Error while pulling from storage server: {str(e)}"}
+            os.makedirs(output_path, exist_ok=True)
+            # 다운로드와 동시에 작업 스레드에서 gzip tar 스트림을 추출 (임시 .tar.gz 파일 없음)
+            pipe = ccp_stream.StreamPipe()
+            extraction = asyncio.ensure_future(ccp_job.run_blocking(extract_output_stream, pipe, output_path))
+            try:
+                async for block in response.aiter_bytes():
+                    if not await pipe.feed(block):
+                        break
+                await pipe.finish()
+                await extraction
+            except BaseException as e:
+                # 오류나 요청 취소(클라이언트 연결 종료 등)로 중단되어도 추출 스레드가 대기 중인 read()에서 깨어나 종료하도록 알림
+                pipe.abort(e if isinstance(e, Exception) else Exception("download cancelled"))
+                await asyncio.shield(asyncio.gather(extraction, return_exceptions=True))
+                raise
+        logging.info(f"Download and extraction completed for project {pid}")
+        return {"RESULT_CODE": 200, "RESULT_MSG": f"Files for project {pid} downloaded successfully."}
+    except Exception as e:
+        logging.error(f"Error while pulling from storage server for project {pid}: {str(e)}", exc_info=True)
+        return {"RESULT_CODE": 500, "RESULT_MSG": f"Error while pulling from storage server: {str(e)}"}
 
 load_dotenv()
 
 key = os.getenv('CCP_KEY')
 cipher = Fernet(key)
+EXTRACT_BUFFER_SIZE = 1024 * 1024  # CCP 추출 시 파일 복사 버퍼 크기
+TEMP_DOWNLOAD_DIR = "/data/tmp"  # 단일 파일 복원 시 Next.js 전송 전 임시 저장 경로
+CCP_CODEC = os.getenv('CCP_CODEC', 'gzip')  # CCP 압축 코덱 (none, gzip, zstd)
+CCP_WORKERS = int(os.getenv('CCP_WORKERS', os.cpu_count() or 1))  # 청크 병렬 압축/암호화 스레드 수
+CCP_DEDUP = os.getenv('CCP_DEDUP', '1') == '1'  # 1이면 중복 제거 저장소(매니페스트) 방식으로 버전 저장
+CCP_DELTA = os.getenv('CCP_DELTA', '1') == '1'  # 1이면 직전 버전 대비 델타 매니페스트로 저장 (CCP_DEDUP 필요)
+CCP_FULL_INTERVAL = int(os.getenv('CCP_FULL_INTERVAL', '10'))  # 전체 스냅샷 주기 (델타 체인 최대 길이 + 1)
+CCP_INDEX_TTL = int(os.getenv('CCP_INDEX_TTL', '60'))  # 버전 인덱스 캐시 유지 시간 (초); 다른 worker의 변경 반영 주기
+CCP_DB_CONCURRENCY = int(os.getenv('CCP_DB_CONCURRENCY', '4'))  # DB CSV 전송/복원 동시 실행 수 (1이면 기존 순차 방식)
+# 외래 키 의존성 순서; 같은 단계의 테이블은 병렬로 복원
+CSV_RESTORE_ORDER = [
+    ["student", "professor", "project"],
+    ["project_user", "permission", "work", "grade"],
+    ["progress", "doc_report", "doc_summary", "doc_require", "doc_meeting", "doc_test", "doc_other"],
+    ["doc_attach"]
+]
+CCP_SCRATCH_DEFAULT = int(os.getenv('CCP_SCRATCH_DEFAULT', str(256 * 1024 * 1024)))  # 기록된 버전이 없을 때 가정하는 작업 공간 크기 (bytes)
+
+version_index = {}  # pid -> 버전 인덱스 (fetch_csv_history 결과 캐시)
+
+def load_version_index(pid, refresh=False):
+    """프로젝트의 버전 인덱스를 반환 (캐시가 없거나 만료되었으면 DB에서 다시 읽음)"""
+    index = version_index.get(pid)
+    if refresh or index is None or time.time() - index["loaded"] > CCP_INDEX_TTL:
+        history = csv_DB.fetch_csv_history(pid)
+        history = history if isinstance(history, list) else []
+        # 보존 정책으로 정리된 버전은 목록과 복원 대상에서 제외
+        pruned = ccp_store.load_pruned(pid)
+        history = [record for record in history if int(record['ver']) not in pruned]
+        versions = {int(record['ver']): record for record in history}
+        index = {"loaded": time.time(), "history": history, "versions": versions, "latest": max(versions, default=None)}
+        version_index[pid] = index
+    return index
+
+def has_version(pid, ver):
+    """버전 존재 여부 확인 (캐시에 없으면 다른 worker에서 추가되었을 수 있으므로 한 번 다시 읽음)"""
+    if int(ver) in load_version_index(pid)["versions"]:
+        return True
+    return int(ver) in load_version_index(pid, refresh=True)["versions"]
 
-def encrypt_ccp_file(pid):
-    """CCP 파일을 tar 압축 후 암호화하는 함수"""
+def invalidate_version_index(pid):
+    """히스토리가 추가/삭제된 프로젝트의 버전 인덱스 캐시와 사용자 히스토리 뷰를 무효화"""
+    version_index.pop(pid, None)
+    ccp_history.notify_change()
+
+def work_path(*parts):
+    """현재 작업의 scratch 작업 공간 기준 경로 (작업 밖에서는 /data/ccp 기준)"""
+    return os.path.join(ccp_job.workspace_root(), *[str(part) for part in parts])
+
+def landing_path(pid):
+    """API 서버가 DB CSV 파일을 전달하는 고정 경로"""
+    return f'/data/ccp/{pid}/DATABASE'
+
+def adopt_database_csv(pid):
+    """고정 경로로 전달된 DB CSV 파일을 현재 작업 공간으로 옮긴다."""
+    source_dir = landing_path(pid)
+    target_dir = work_path(pid, 'DATABASE')
+    if os.path.realpath(source_dir) == os.path.realpath(target_dir) or not os.path.isdir(source_dir):
+        return
+    os.makedirs(target_dir, exist_ok=True)
+    for name in os.listdir(source_dir):
+        shutil.move(os.path.join(source_dir, name), os.path.join(target_dir, name))
+    shutil.rmtree(os.path.dirname(source_dir), ignore_errors=True)
+
+def estimate_scratch_size(pid):
+    """최근 버전 매니페스트를 기준으로 작업 공간에 필요한 용량을 추정"""
+    ver = ccp_store.latest_version(pid)
+    if ver is None:
+        return CCP_SCRATCH_DEFAULT
+    try:
+        manifest = ccp_store.read_manifest(ccp_store.manifest_cache_path(pid, ver), key)
+        files = ccp_store.resolve_chain(ccp_store.load_chain(pid, manifest, key))["files"]
+        # 원본 파일과 패킹/추출 결과가 작업 공간에 함께 존재하므로 2배로 계산
+        return 2 * sum(entry["size"] for entry in files)
+    except Exception as e:
+        logging.warning(f"Failed to estimate scratch size for project {pid}: {e}")
+        return CCP_SCRATCH_DEFAULT
+
+def encrypt_ccp_file(pid, codec=None):
+    """CCP 파일을 tar 스트림으로 묶어 청크 단위로 압축 및 암호화하는 함수"""
     try:
         logging.info(f"------ Start encryption process for PID {pid} ------")
-        input_dir = f'/data/ccp/{pid}/'
-        output_dir = f'/data/ccp/'
-        # 파일을 tar로 압축할 메모리 버퍼 생성
-        compressed_file = io.BytesIO()
-        # tar 파일로 압축
-        with tarfile.open(fileobj=compressed_file, mode='w|') as tar:
-            for root, dirs, files in os.walk(input_dir):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    arcname = os.path.relpath(file_path, input_dir)
-                    tar.add(file_path, arcname=arcname)
-        logging.info(f"Files in {input_dir} compressed successfully.")
-        # 압축된 데이터 가져오기
-        compressed_file.seek(0)
-        compressed_data = compressed_file.read()
-        # 파일 데이터 암호화
-        encrypted_data = cipher.encrypt(compressed_data)
-        logging.info(f"Data encryption completed for PID {pid}.")
-        # 헤더 작성
-        num_files = len(os.listdir(input_dir))  # 디렉터리 내 파일 개수
-        header = struct.pack('!I', num_files)  # 파일 개수 (4바이트)
-        # 각 파일의 메타데이터 기록
-        for file in os.listdir(input_dir):
-            file_path = os.path.join(input_dir, file)
-            file_size = os.path.getsize(file_path)
-            file_name_length = len(file)
-            header += struct.pack('!I', file_name_length)  # 파일 이름 길이 (4바이트)
-            header += file.encode('utf-8')  # 파일 이름 (UTF-8)
-            header += struct.pack('!I', file_size)  # 파일 크기 (4바이트)
-        logging.info(f"Header creation completed for PID {pid}. Number of files: {num_files}")
-        # 암호화된 ccp 파일 저장
+        input_dir = work_path(pid)
+        output_dir = work_path()
         encrypted_file_path = os.path.join(output_dir, f'{pid}.ccp')
+        codec_id = ccp_stream.resolve_codec(codec or CCP_CODEC)
+        # tar 스트림 → 청크 압축/암호화 → 파일 순서로 기록하여 메모리에는 작업 중인 청크만 유지
         with open(encrypted_file_path, 'wb') as encrypted_file:
-            encrypted_file.write(header)  # 헤더 기록
-            encrypted_file.write(encrypted_data)  # 암호화된 데이터 기록
+            with ccp_stream.CCPStreamWriter(encrypted_file, key, codec=codec_id, workers=CCP_WORKERS) as writer:
+                with tarfile.open(fileobj=writer, mode='w|') as tar:
+                    for root, dirs, files in os.walk(input_dir):
+                        for file in files:
+                            file_path = os.path.join(root, file)
+                            arcname = os.path.relpath(file_path, input_dir)
+                            tar.add(file_path, arcname=arcname)
+        logging.info(f"Files in {input_dir} archived and encrypted successfully ({writer.index} chunks, codec {codec or CCP_CODEC}).")
         logging.info(f"Encrypted CCP file saved successfully: {encrypted_file_path}")
         logging.info(f"------ End of encryption process for PID {pid} ------")
         return True
@@ -121,71 +194,93 @@ def encrypt_ccp_file(pid):
         logging.error(f"Error occurred during encryption process for PID {pid}: {str(e)}", exc_info=True)
         return False
 
+def decrypt_legacy_ccp_file(input_file_path):
+    """구 포맷(파일 메타데이터 헤더 + 단일 Fernet 블록) CCP 파일을 복호화하여 tar 데이터를 반환하는 함수"""
+    with open(input_file_path, 'rb') as encrypted_file:
+        # 헤더 읽기 (파일 개수 + 각 파일의 메타데이터)
+        header = encrypted_file.read(4)
+        if len(header) < 4:
+            raise Exception(f"Failed to read header, insufficient data. Read {len(header)} bytes")
+        num_files = struct.unpack('!I', header)[0]  # 파일 개수
+        logging.info(f"Number of files in CCP: {num_files}")
+        # 각 파일의 메타데이터 읽기 및 복원
+        files_metadata = []
+        for _ in range(num_files):
+            # 파일 이름 길이 읽기
+            file_name_length_data = encrypted_file.read(4)
+            if len(file_name_length_data) < 4:
+                raise Exception(f"Failed to read file name length, insufficient data. Read {len(file_name_length_data)} bytes")
+            file_name_length = struct.unpack('!I', file_name_length_data)[0]
+            # 파일 이름 읽기
+            file_name = encrypted_file.read(file_name_length).decode('utf-8')
+            # 파일 크기 읽기
+            file_size_data = encrypted_file.read(4)
+            if len(file_size_data) < 4:
+                raise Exception(f"Failed to read file size, insufficient data. Read {len(file_size_data)} bytes")
+            file_size = struct.unpack('!I', file_size_data)[0]
+            files_metadata.append((file_name, file_size))
+        logging.info(f"Metadata extraction completed for {num_files} files.")
+        # 남은 암호화된 데이터 읽기
+        encrypted_data = encrypted_file.read()
+    # 복호화 (단일 Fernet 블록은 분할 복호화가 불가능)
+    return cipher.decrypt(encrypted_data)
+
+def extract_ccp_tar(tar_fileobj, output_dir, mode='r|'):
+    """복호화된 tar 스트림을 순차적으로 읽어 각 파일을 고정 크기 버퍼로 복원하는 함수"""
+    output_root = os.path.realpath(output_dir)
+    with tarfile.open(fileobj=tar_fileobj, mode=mode) as tar:
+        for member in tar:
+            member_path = os.path.join(output_dir, member.name)
+            # 'OUTPUT' 폴더 내부만 경로 복원
+            if member.name.startswith('OUTPUT/'):
+                member_path = os.path.join(output_dir, 'OUTPUT', os.path.relpath(member.name, 'OUTPUT'))
+            elif member.name.startswith('DATABASE/'):
+                member_path = os.path.join(output_dir, 'DATABASE', os.path.relpath(member.name, 'DATABASE'))
+            if not os.path.realpath(member_path).startswith(output_root + os.sep):
+                logging.warning(f"Skipping CCP member outside of output directory: {member.name}")
+                continue
+            # 디렉터리 생성 및 파일 추출
+            if member.isdir():
+                os.makedirs(member_path, exist_ok=True)
+            elif member.isfile():
+                os.makedirs(os.path.dirname(member_path), exist_ok=True)
+                with open(member_path, 'wb') as f:
+                    shutil.copyfileobj(tar.extractfile(member), f, EXTRACT_BUFFER_SIZE)
+
+def extract_output_stream(pipe, output_dir):
+    """Storage 서버에서 내려받는 중인 OUTPUT 아카이브(gzip tar)를 순차적으로 추출하는 함수"""
+    try:
+        extract_ccp_tar(pipe, output_dir, 'r|gz')
+    finally:
+        pipe.close()
+
 def decrypt_ccp_file(pid):
     """CCP 파일을 복호화하여 원본 데이터를 복원하는 함수"""
     try:
         logging.info(f"------ Start decryption process for PID {pid} ------")
-        input_file_path = f'/data/ccp/{pid}.ccp'
-        output_dir = f'/data/ccp/{pid}/'
+        input_file_path = work_path(f'{pid}.ccp')
+        output_dir = work_path(pid)
         if not os.path.exists(input_file_path):
             raise Exception(f"CCP file {input_file_path} does not exist")
         logging.info(f"CCP file found: {input_file_path}")
-        # 파일 열기
-        with open(input_file_path, 'rb') as encrypted_file:
-            # 헤더 읽기 (파일 개수 + 각 파일의 메타데이터)
-            header = encrypted_file.read(4)
-            if len(header) < 4:
-                raise Exception(f"Failed to read header, insufficient data. Read {len(header)} bytes")
-            num_files = struct.unpack('!I', header)[0]  # 파일 개수
-            logging.info(f"Number of files in CCP: {num_files}")
-            # 디렉터리 생성
-            os.makedirs(output_dir, exist_ok=True)
-            os.makedirs(os.path.join(output_dir, 'DATABASE'), exist_ok=True)
-            os.makedirs(os.path.join(output_dir, 'OUTPUT'), exist_ok=True)
-            # 각 파일의 메타데이터 읽기 및 복원
-            files_metadata = []
-            for _ in range(num_files):
-                # 파일 이름 길이 읽기
-                file_name_length_data = encrypted_file.read(4)
-                if len(file_name_length_data) < 4:
-                    raise Exception(f"Failed to read file name length, insufficient data. Read {len(file_name_length_data)} bytes")
-                file_name_length = struct.unpack('!I', file_name_length_data)[0]
-                # 파일 이름 읽기
-                file_name = encrypted_file.read(file_name_length).decode('utf-8')
-                # 파일 크기 읽기
-                file_size_data = encrypted_file.read(4)
-                if len(file_size_data) < 4:
-                    raise Exception(f"Failed to read file size, insufficient data. Read {len(file_size_data)} bytes")
-                file_size = struct.unpack('!I', file_size_data)[0]
-                files_metadata.append((file_name, file_size))
-            logging.info(f"Metadata extraction completed for {num_files} files.")
-            # 남은 암호화된 데이터 읽기
-            encrypted_data = encrypted_file.read()
-        # 복호화
-        decrypted_data = cipher.decrypt(encrypted_data)
-        logging.info(f"Data decryption completed for PID {pid}")
-        # 복호화된 데이터 저장
-        decrypted_tar_path = os.path.join(output_dir, 'ccp_decrypted.tar')
-        with open(decrypted_tar_path, 'wb') as decrypted_file:
-            decrypted_file.write(decrypted_data)
-        logging.info(f"Decrypted tar file saved: {decrypted_tar_path}")
-        # 각 파일의 데이터를 복원
-        with open(decrypted_tar_path, 'rb') as decrypted_tar:
-            with tarfile.open(fileobj=decrypted_tar) as tar:
-                for member in tar.getmembers():
-                    member_path = os.path.join(output_dir, member.name)
-                    # 'OUTPUT' 폴더 내부만 경로 복원
-                    if member.name.startswith('OUTPUT/'):
-                        member_path = os.path.join(output_dir, 'OUTPUT', os.path.relpath(member.name, 'OUTPUT'))
-                    elif member.name.startswith('DATABASE/'):
-                        member_path = os.path.join(output_dir, 'DATABASE', os.path.relpath(member.name, 'DATABASE'))
-                    # 디렉터리 생성 및 파일 추출
-                    if member.isdir():
-                        os.makedirs(member_path, exist_ok=True)
-                    else:
-                        os.makedirs(os.path.dirname(member_path), exist_ok=True)
-                        with open(member_path, 'wb') as f:
-                            f.write(tar.extractfile(member).read())
+        # 디렉터리 생성
+        os.makedirs(output_dir, exist_ok=True)
+        os.makedirs(os.path.join(output_dir, 'DATABASE'), exist_ok=True)
+        os.makedirs(os.path.join(output_dir, 'OUTPUT'), exist_ok=True)
+        # 복호화 결과를 디스크에 기록하지 않고 tar 스트림으로 바로 추출
+        if ccp_store.is_manifest(input_file_path):
+            # 매니페스트 포맷: 저장소 객체로부터 파일 단위 복원
+            manifest = ccp_store.resolve_chain(ccp_store.load_chain(pid, ccp_store.read_manifest(input_file_path, key), key))
+            missing = ccp_store.missing_objects(pid, manifest)
+            if missing:
+                raise Exception(f"{len(missing)} objects referenced by the manifest are missing from the CCP store")
+            ccp_store.restore_manifest(pid, manifest, output_dir, key)
+        elif ccp_stream.is_stream_format(input_file_path):
+            with open(input_file_path, 'rb') as encrypted_file:
+                reader = ccp_stream.CCPStreamReader(encrypted_file, key)
+                extract_ccp_tar(reader, output_dir)
+        else:
+            extract_ccp_tar(io.BytesIO(decrypt_legacy_ccp_file(input_file_path)), output_dir)
         logging.info(f"Decryption and extraction completed for PID {pid}")
         logging.info(f"------ End of decryption process for PID {pid} ------")
         return {"RESULT_CODE": 200, "RESULT_MSG": f"Decryption successful for project {pid}"}
@@ -193,9 +288,114 @@ def decrypt_ccp_file(pid):
         logging.error(f"Error during decryption process for PID {pid}: {str(e)}", exc_info=True)
         return {"RESULT_CODE": 500, "RESULT_MSG": f"Decryption failed: {str(e)}"}
 
+def pack_ccp_manifest(pid, full=False, manifest=None):
+    """프로젝트 폴더를 중복 제거 저장소 객체와 매니페스트 CCP 파일로 변환하는 함수 (manifest: 미리 계산한 전체 매니페스트)"""
+    try:
+        logging.info(f"------ Start manifest packing process for PID {pid} ------")
+        input_dir = work_path(pid)
+        staging_dir = work_path(f'{pid}_objects')
+        codec_id = ccp_stream.resolve_codec(CCP_CODEC)
+        if manifest is None:
+            manifest = ccp_store.build_manifest(pid, input_dir)
+        fingerprint = ccp_store.state_fingerprint(manifest)
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        base_ver = ccp_store.latest_base(pid, load_version_index(pid, refresh=True)["versions"])
+        delta = None
+        if CCP_DELTA and not full and base_ver is not None:
+            try:
+                delta, new_digests = ccp_store.stage_delta_objects(pid, input_dir, manifest, base_ver, staging_dir, key, codec_id)
+                if delta["depth"] >= CCP_FULL_INTERVAL:
+                    # 주기마다 전체 스냅샷을 만들어 복원 체인 길이를 제한
+                    delta = None
+                    shutil.rmtree(staging_dir, ignore_errors=True)
+            except Exception as e:
+                logging.warning(f"Delta packing against version {base_ver} failed for PID {pid}, falling back to full snapshot: {e}")
+                delta = None
+                shutil.rmtree(staging_dir, ignore_errors=True)
+        if delta is None:
+            new_digests = ccp_store.stage_new_objects(pid, input_dir, manifest, staging_dir, key, codec_id)
+        else:
+            manifest = delta
+        manifest["fingerprint"] = fingerprint
+        ccp_store.write_manifest(manifest, work_path(f'{pid}.ccp'), key)
+        logging.info(f"{manifest['kind'].capitalize()} manifest for PID {pid} saved: {len(manifest['files'])} files, {len(new_digests)} new objects staged")
+        logging.info(f"------ End of manifest packing process for PID {pid} ------")
+        return True
+    except Exception as e:
+        logging.error(f"Error occurred during manifest packing process for PID {pid}: {str(e)}", exc_info=True)
+        return False
+
+def pack_ccp_file(pid, full=False, manifest=None):
+    """설정(CCP_DEDUP)에 따라 매니페스트 또는 tar 스트림 방식의 CCP 파일을 생성하는 함수"""
+    if CCP_DEDUP:
+        return pack_ccp_manifest(pid, full, manifest)
+    return encrypt_ccp_file(pid)
+
+def record_ccp_version(pid, ver):
+    """업로드가 끝난 매니페스트 버전을 다음 델타의 기준 버전으로 기록한다."""
+    ccp_file_path = work_path(f"{pid}.ccp")
+    if not ccp_store.is_manifest(ccp_file_path):
+        return
+    try:
+        record = load_version_index(pid, refresh=True)["versions"].get(int(ver))
+        ccp_store.record_version(pid, ver, ccp_file_path, work_path(pid), key, ccp_store.history_row_key(record))
+        logging.info(f"Version {ver} recorded as delta base for project {pid}")
+    except Exception as e:
+        # 기록에 실패해도 다음 저장이 전체 스냅샷이 될 뿐이므로 작업은 계속 진행
+        logging.warning(f"Failed to record version {ver} as delta base for project {pid}: {e}")
+
+def upload_ccp_objects(pid):
+    """staging 폴더의 새 저장소 객체를 Storage 서버에 업로드하고 로컬 저장소에 반영한다."""
+    staging_dir = work_path(f'{pid}_objects')
+    if not os.path.isdir(staging_dir):
+        return []
+    digests = [name for _, _, files in os.walk(staging_dir) for name in files]
+    ccp_transport.transport.upload_many("object", pid, [(digest, ccp_store.object_path(pid, digest, staging_dir)) for digest in digests])
+    # 업로드가 끝난 객체만 로컬 저장소에 반영하여, 저장소에 있는 객체는 항상 업로드된 상태를 유지
+    ccp_store.commit_objects(pid, staging_dir, digests)
+    logging.info(f"Uploaded {len(digests)} new CCP objects for project {pid}")
+    return digests
+
+async def fetch_version_manifest(pid: int, ver: int):
+    """버전 매니페스트를 로컬 캐시에 확보하고 경로를 반환 (매니페스트 포맷이 아니면 예외)"""
+    cache_path = ccp_store.manifest_cache_path(pid, ver)
+    if not os.path.exists(cache_path):
+        # 구 포맷(tar 스트림) 버전은 전체를 받기 전에 헤더만 읽고 거부
+        head = await ccp_transport.transport.read_head("ccp", {"pid": pid, "ver": ver}, ccp_store.HEAD_SIZE)
+        if not ccp_store.is_manifest_head(head):
+            raise Exception(f"Version {ver} of project {pid} is not stored in manifest format")
+        await ccp_transport.transport.download("ccp", {"pid": pid, "ver": ver}, cache_path)
+        if not ccp_store.is_manifest(cache_path):
+            os.remove(cache_path)
+            raise Exception(f"Version {ver} of project {pid} is not stored in manifest format")
+    return cache_path
+
+async def fetch_manifest_chain(pid: int, manifest: dict):
+    """델타 매니페스트라면 전체 매니페스트가 나올 때까지 기준 버전 매니페스트를 확보하고 체인을 반환"""
+    base = manifest
+    while base.get("kind", "full") == "delta":
+        cache_path = ccp_store.manifest_cache_path(pid, base["base"])
+        if not os.path.exists(cache_path):
+            await ccp_transport.transport.download("ccp", {"pid": pid, "ver": base["base"]}, cache_path)
+        base = ccp_store.read_manifest(cache_path, key)
+    return ccp_store.load_chain(pid, manifest, key)
+
+async def download_ccp_objects(pid: int, ver: int, manifest_path: str, paths=None):
+    """매니페스트 체인과, 체인이 참조하지만 로컬 저장소에 없는 객체를 Storage 서버에서 받아온다. (paths: 지정한 파일만)"""
+    if os.path.realpath(manifest_path) != os.path.realpath(ccp_store.manifest_cache_path(pid, ver)):
+        ccp_store.cache_manifest(pid, ver, manifest_path)
+    manifest = ccp_store.read_manifest(manifest_path, key)
+    resolved = ccp_store.resolve_chain(await fetch_manifest_chain(pid, manifest))
+    if paths is not None:
+        resolved["files"] = [entry for entry in resolved["files"] if entry["path"] in paths]
+    missing = ccp_store.missing_objects(pid, resolved)
+    await ccp_transport.transport.download_many("object", [({"pid": pid, "name": digest}, ccp_store.object_path(pid, digest)) for digest in missing])
+    logging.info(f"Downloaded {len(missing)} missing CCP objects for project {pid} (chain depth {resolved['depth']})")
+    return missing
+
 def build_csv_dict(pid):
     """CCP 데이터베이스 폴더에서 CSV 파일을 분석하여 매핑하는 함수"""
-    source_dir = f"/data/ccp/{pid}/DATABASE"
+    source_dir = work_path(pid, 'DATABASE')
     target_prefix = "/var/lib/mysql/csv/"
     prefix_mapping = {
         "project_user": "project_user",
@@ -237,20 +437,113 @@ def build_csv_dict(pid):
         logging.error(f"Error during CSV dictionary build for PID {pid}: {str(e)}", exc_info=True)
         raise
 
-@router.post("/ccp/import")
-async def api_project_import(payload: ccp_payload):
-    """프로젝트 복원 기능"""
+def push_ccp_version(pid, version):
+    """버전 파일(매니페스트)과 새 저장소 객체를 Storage 서버에 업로드하고 로컬 저장소에 기록한다."""
+    ccp_file_path = work_path(f"{pid}.ccp")
+    ccp_file_name = f"{pid}_{version}.ccp"
+    # 매니페스트가 참조하는 새 객체를 먼저 업로드한 뒤 매니페스트(버전 파일)를 업로드
+    upload_ccp_objects(pid)
+    ccp_transport.transport.upload("ccp", pid, ccp_file_name, ccp_file_path)
+    logging.info(f"Backup CCP file uploaded successfully: {ccp_file_name}")
+    record_ccp_version(pid, version)
+
+async def push_database_csv(pid):
+    """복원된 DATABASE CSV 파일들을 하나의 연결 풀로 DB 서버에 병렬 전송한다."""
+    db_push_url = "http://192.168.50.84:70/api/ccp/push_db"
+    database_dir = work_path(pid, 'DATABASE')
+    filenames = sorted(name for name in os.listdir(database_dir) if name.endswith(".csv"))
+    semaphore = asyncio.Semaphore(CCP_DB_CONCURRENCY)
+    limits = httpx.Limits(max_connections=CCP_DB_CONCURRENCY, max_keepalive_connections=CCP_DB_CONCURRENCY)
+
+    async def push(client, filename):
+        async with semaphore:
+            with open(os.path.join(database_dir, filename), "rb") as f:
+                files_payload = {"file": (filename, f, "application/octet-stream")}
+                response = await client.post(db_push_url, files=files_payload, data={"pid": str(pid)})
+            if response.status_code != 200:
+                raise Exception(f"Failed to push file {filename}: {response.text}")
+            return filename
+
+    async with httpx.AsyncClient(timeout=httpx.Timeout(15.0), limits=limits) as client:
+        results = await asyncio.gather(*[push(client, filename) for filename in filenames], return_exceptions=True)
+    errors = [result for result in results if isinstance(result, Exception)]
+    if errors:
+        raise errors[0]
+    return results
+
+def plan_csv_restore(csv_files):
+    """복원할 테이블을 의존성 단계별로 나눈다. (순서에 없는 테이블은 마지막 단계)"""
+    plan = [[table for table in level if table in csv_files] for level in CSV_RESTORE_ORDER]
+    known = {table for level in CSV_RESTORE_ORDER for table in level}
+    plan.append(sorted(table for table in csv_files if table not in known))
+    return [level for level in plan if level]
+
+async def restore_database_csv(pid):
+    """DB 서버로 전송된 CSV 파일들을 의존성 순서에 따라 단계별로 병렬 적용한다."""
+    csv_files = build_csv_dict(pid)
+    logging.info(f"CSV files to import: {csv_files}")
+    if CCP_DB_CONCURRENCY <= 1:
+        if await ccp_job.run_blocking(csv_DB.import_csv, csv_files, pid) is not True:
+            raise Exception("DB import_csv function returned failure")
+        return
+    semaphore = asyncio.Semaphore(CCP_DB_CONCURRENCY)
+
+    async def restore(table):
+        async with semaphore:
+            return await ccp_job.run_blocking(csv_DB.import_csv, {table: csv_files[table]}, pid)
+
+    for level in plan_csv_restore(csv_files):
+        results = await asyncio.gather(*[restore(table) for table in level], return_exceptions=True)
+        for table, result in zip(level, results):
+            if result is not True:
+                raise Exception(f"DB import_csv function returned failure for table {table}: {result}")
+        logging.info(f"Restored tables {level} for project {pid}")
+
+def pack_output_archive(pid):
+    """복원된 OUTPUT 파일들을 압축하여 아카이브 경로를 반환한다. (OUTPUT 파일이 없으면 None)"""
+    output_folder = work_path(pid, 'OUTPUT')
+    target_folder = os.path.join(output_folder, str(pid))
+    if not os.path.exists(target_folder):
+        logging.info("No OUTPUT files found, skipping restore process.")
+        return None
+    archive_path = work_path(f"{pid}_output.tar.gz")
+    with tarfile.open(archive_path, "w:gz") as tar:
+        for root, _, files in os.walk(target_folder):
+            for file in files:
+                full_path = os.path.join(root, file)
+                rel_path = os.path.relpath(full_path, target_folder)
+                tar.add(full_path, arcname=rel_path)
+    return archive_path
+
+async def push_output_archive(pid):
+    """복원된 OUTPUT 파일들을 압축하여 Storage 서버에 업로드한다."""
+    archive_path = await ccp_job.run_blocking(pack_output_archive, pid)
+    if archive_path is None:
+        return
+    with open(archive_path, "rb") as file:
+        multipart_form = {
+            "file": (f"{pid}_output.tar.gz", file, "application/gzip"),
+            "pid": (None, str(pid)),
+            "name": (None, f"{pid}_output.tar.gz")
+        }
+        response = await storage.post("/ccp/pull_output", op="upload", files=multipart_form)
+    if response.status_code != 200:
+        raise Exception("Failed to upload OUTPUT archive to Storage Server")
+    os.remove(archive_path)
+
+async def run_project_import(payload: ccp_payload):
+    """프로젝트 복원 작업 (블로킹 작업은 ccp_job 스레드 풀에서 실행)"""
     logging.info(f"------ Start project import process for PID {payload.pid} ------")
     try:
         # Step 1: Retrieve version history
         logging.info(f"Step 1: Retrieving version history for project {payload.pid}")
-        history = csv_DB.fetch_csv_history(payload.pid)
-        if not history:
+        ccp_job.set_step(1, "Retrieving version history")
+        index = await ccp_job.run_blocking(load_version_index, payload.pid)
+        if not index["history"]:
             raise Exception(f"No history records found for project {payload.pid}")
-        highest_ver = str(int(max(record['ver'] for record in history)) + 1)
+        highest_ver = str(index["latest"] + 1)
         logging.info(f"Highest version: {highest_ver}")
-        selected_version = next((record['ver'] for record in history if record['ver'] == payload.ver), None)
-        if selected_version is None:
+        if not await ccp_job.run_blocking(has_version, payload.pid, payload.ver):
             raise Exception(f"Version {payload.ver} not found in project history")
         logging.info(f"Selected version {payload.ver} found in history")
 
@@ -258,143 +551,114 @@ async def api_project_import(payload: ccp_payload):
         if payload.is_removed != 1:
             # Step 2: Backup current project
             logging.info(f"Step 2: Backing up current project {payload.pid}")
-            os.makedirs(f'/data/ccp/{payload.pid}/DATABASE', exist_ok=True)
-            os.makedirs(f'/data/ccp/{payload.pid}/OUTPUT', exist_ok=True)
-            result = csv_DB.export_csv(payload.pid)
+            ccp_job.set_step(2, "Backing up current project")
+            os.makedirs(landing_path(payload.pid), exist_ok=True)
+            os.makedirs(work_path(payload.pid, 'DATABASE'), exist_ok=True)
+            os.makedirs(work_path(payload.pid, 'OUTPUT'), exist_ok=True)
+            result = await ccp_job.run_blocking(csv_DB.export_csv, payload.pid)
             if not handle_db_result(result):
                 raise Exception("Failed to export DB during backup")
-            result = await pull_storage_server(payload.pid, f'/data/ccp/{payload.pid}/OUTPUT')
+            await ccp_job.run_blocking(adopt_database_csv, payload.pid)
+            result = await pull_storage_server(payload.pid, work_path(payload.pid, 'OUTPUT'))
             if result['RESULT_CODE'] != 200:
                 raise Exception(result['RESULT_MSG'])
-            if not encrypt_ccp_file(payload.pid):
-                raise Exception(f"Failed to encrypt project folder for backup")
-            # Step 3: Save backup history
-            logging.info("Saving backup record to DB history")
-            payload.msg = f"Revert {highest_ver} to {payload.ver}"
-            backup_ver = csv_DB.insert_csv_history(payload.pid, payload.univ_id, payload.msg)
-            if backup_ver is None:
-                raise Exception("Failed to insert backup history record")
-            logging.info(f"Backup history recorded as version {backup_ver}")
-            # Step 4: Upload backup to Storage Server
-            history = csv_DB.fetch_csv_history(payload.pid)
-            version = str(max(record['ver'] for record in history))
-            ccp_file_path = f"/data/ccp/{payload.pid}.ccp"
-            ccp_file_name = f"{payload.pid}_{version}.ccp"
-            storage_url = "http://192.168.50.84:10080/api/ccp/pull"
-            logging.info(f"Uploading backup CCP file to Storage Server: {ccp_file_name}")
-            with open(ccp_file_path, "rb") as file:
-                files = {"file": (ccp_file_name, file, "application/octet-stream")}
-                form_data = {"pid": str(payload.pid), "name": ccp_file_name}
-                response = requests.post(storage_url, files=files, data=form_data)
-            if response.status_code != 200:
-                raise Exception("Failed to upload backup CCP file")
+            # 현재 상태가 이미 저장된 버전과 같으면 암호화/히스토리 기록/업로드를 생략
+            manifest = await ccp_job.run_blocking(ccp_store.build_manifest, payload.pid, work_path(payload.pid))
+            versions = (await ccp_job.run_blocking(load_version_index, payload.pid, True))["versions"]
+            matched_ver = ccp_store.find_fingerprint(payload.pid, ccp_store.state_fingerprint(manifest), versions)
+            if matched_ver is not None:
+                logging.info(f"Current state of project {payload.pid} matches version {matched_ver}: skipping steps 3 to 4")
+            else:
+                if not await ccp_job.run_blocking(pack_ccp_file, payload.pid, False, manifest):
+                    raise Exception(f"Failed to encrypt project folder for backup")
+                # Step 3: Save backup history
+                logging.info("Saving backup record to DB history")
+                ccp_job.set_step(3, "Saving backup history")
+                payload.msg = f"Revert {highest_ver} to {payload.ver}"
+                backup_ver = await ccp_job.run_blocking(csv_DB.insert_csv_history, payload.pid, payload.univ_id, payload.msg)
+                invalidate_version_index(payload.pid)
+                if backup_ver is None:
+                    raise Exception("Failed to insert backup history record")
+                logging.info(f"Backup history recorded as version {backup_ver}")
+                # Step 4: Upload backup to Storage Server
+                ccp_job.set_step(4, "Uploading backup to Storage Server")
+                version = str(backup_ver)
+                logging.info(f"Uploading backup CCP file to Storage Server: {payload.pid}_{version}.ccp")
+                await ccp_job.run_blocking(push_ccp_version, payload.pid, version)
             # Step 5: Remove temporary backup files
-            shutil.rmtree(f'/data/ccp/{payload.pid}', ignore_errors=True)
-            os.remove(f'/data/ccp/{payload.pid}.ccp')
+            ccp_job.set_step(5, "Removing temporary backup files")
+            await ccp_job.run_blocking(cleanup_project_folder, payload.pid)
             logging.info("Backup completed and temporary files removed")
         else:
             logging.info("Export function is disabled (is_removed=1): skipping steps 2 to 5.")
         # Step 6: Download selected CCP version
         logging.info(f"Step 6: Downloading CCP file for version {payload.ver} from Storage Server")
-        selected_ccp_url = "http://192.168.50.84:10080/api/ccp/push_ccp"
-        timeout = httpx.Timeout(60.0, connect=5.0)
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.post(selected_ccp_url, params={"pid": payload.pid, "ver": payload.ver})
-            if response.status_code != 200:
-                raise Exception(f"Storage server returned status {response.status_code}")
-            selected_ccp_file_path = f"/data/ccp/{payload.pid}_{payload.ver}.ccp"
-            with open(selected_ccp_file_path, "wb") as f:
-                f.write(response.content)
+        ccp_job.set_step(6, f"Downloading CCP file for version {payload.ver}")
+        selected_ccp_file_path = work_path(f"{payload.pid}_{payload.ver}.ccp")
+        await ccp_transport.transport.download("ccp", {"pid": payload.pid, "ver": payload.ver}, selected_ccp_file_path)
         # Step 7: Decrypt and extract the CCP file
         logging.info("Step 7: Decrypting and extracting the downloaded CCP file")
-        os.rename(selected_ccp_file_path, f"/data/ccp/{payload.pid}.ccp")
-        result = decrypt_ccp_file(payload.pid)
+        ccp_job.set_step(7, "Decrypting and extracting the CCP file")
+        os.rename(selected_ccp_file_path, work_path(f"{payload.pid}.ccp"))
+        if ccp_store.is_manifest(work_path(f"{payload.pid}.ccp")):
+            await download_ccp_objects(payload.pid, payload.ver, work_path(f"{payload.pid}.ccp"))
+        result = await ccp_job.run_blocking(decrypt_ccp_file, payload.pid)
         if result.get("RESULT_CODE", 500) != 200:
             raise Exception(result.get("RESULT_MSG", "Unknown error during decryption"))
         # Step 8: Restore DATABASE CSV files
         logging.info(f"Step 8: Pushing DATABASE CSV files to DB server for project {payload.pid}")
-        db_push_url = "http://192.168.50.84:70/api/ccp/push_db"
-        database_dir = f"/data/ccp/{payload.pid}/DATABASE"
+        ccp_job.set_step(8, "Restoring DATABASE CSV files")
+        database_dir = work_path(payload.pid, 'DATABASE')
         if not os.path.exists(database_dir):
             raise Exception("DATABASE folder not found in extracted files")
         try:
-            files_transferred = []
-            for filename in os.listdir(database_dir):
-                if filename.endswith(".csv"):
-                    file_path = os.path.join(database_dir, filename)
-                    with open(file_path, "rb") as f:
-                        files_payload = {"file": (filename, f, "application/octet-stream")}
-                        data_payload = {"pid": str(payload.pid)}
-                        response = requests.post(db_push_url, files=files_payload, data=data_payload, timeout=15)
-                        if response.status_code != 200:
-                            raise Exception(f"Failed to push file {filename}: {response.text}")
-                        else:
-                            files_transferred.append(filename)
+            files_transferred = await push_database_csv(payload.pid)
             logging.info(f"Successfully pushed files to DB server: {files_transferred}")
         except Exception as e:
             logging.error(f"Failed to push DATABASE CSV files to DB server for project {payload.pid}: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Failed to push DATABASE CSV files to DB server: {str(e)}")
         logging.info(f"Step 8.5: Restoring DATABASE CSV files for project {payload.pid}")
         try:
-            csv_files = build_csv_dict(payload.pid)
-            logging.info(f"CSV files to import: {csv_files}")
-            import_result = csv_DB.import_csv(csv_files, payload.pid)
-            if import_result is not True:
-                raise Exception("DB import_csv function returned failure")
+            await restore_database_csv(payload.pid)
             logging.info("DATABASE CSV files restored successfully")
         except Exception as e:
             logging.error(f"Failed to restore DATABASE CSV files for project {payload.pid}: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Failed to restore DATABASE CSV files: {str(e)}")
         # Step 9: Restore OUTPUT files
         logging.info(f"Step 9: Restoring OUTPUT files for project {payload.pid}")
-        output_folder = f"/data/ccp/{payload.pid}/OUTPUT"
-        target_folder = os.path.join(output_folder, str(payload.pid))
-        if os.path.exists(target_folder):
-            archive_path = f"/data/ccp/{payload.pid}_output.tar.gz"
-            with tarfile.open(archive_path, "w:gz") as tar:
-                for root, _, files in os.walk(target_folder):
-                    for file in files:
-                        full_path = os.path.join(root, file)
-                        rel_path = os.path.relpath(full_path, target_folder)
-                        tar.add(full_path, arcname=rel_path)
-            pull_output_url = "http://192.168.50.84:10080/api/ccp/pull_output"
-            with open(archive_path, "rb") as file:
-                multipart_form = {
-                    "file": (f"{payload.pid}_output.tar.gz", file, "application/gzip"),
-                    "pid": (None, str(payload.pid)),
-                    "name": (None, f"{payload.pid}_output.tar.gz")
-                }
-                response = requests.post(pull_output_url, files=multipart_form)
-            if response.status_code != 200:
-                raise Exception("Failed to upload OUTPUT archive to Storage Server")
-            os.remove(archive_path)
-        else:
-            logging.info("No OUTPUT files found, skipping restore process.")
-        deleted_file = "deleted_project.json"
-        pid_str = str(payload.pid)
-        if os.path.exists(deleted_file):
-            try:
-                with open(deleted_file, "r", encoding="utf-8") as f:
-                    deleted_data = json.load(f)
-                if pid_str in deleted_data:
-                    del deleted_data[pid_str]
-                    with open(deleted_file, "w", encoding="utf-8") as f:
-                        json.dump(deleted_data, f, ensure_ascii=False, indent=2)
-                    logging.info(f"Deleted project entry for PID {payload.pid} removed from deleted_project.json")
-            except Exception as e:
-                logging.warning(f"Failed to clean up deleted_project.json for PID {payload.pid}: {e}")
+        ccp_job.set_step(9, "Restoring OUTPUT files")
+        await push_output_archive(payload.pid)
+        try:
+            if deleted_project.remove_deleted_project(payload.pid):
+                ccp_history.notify_change()
+                logging.info(f"Deleted project entry for PID {payload.pid} removed from deleted project store")
+        except Exception as e:
+            logging.warning(f"Failed to clean up deleted project entry for PID {payload.pid}: {e}")
         logging.info(f"------ Project import process completed successfully for PID {payload.pid} ------")
         return {"RESULT_CODE": 200, "RESULT_MSG": f"Project {payload.pid} imported successfully."}
     except Exception as e:
         logging.error(f"Error during project import process for PID {payload.pid}: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error during project import: {str(e)}")
 
+@router.post("/ccp/import")
+async def api_project_import(payload: ccp_payload):
+    """프로젝트 복원 기능"""
+    scratch_size = await ccp_job.run_blocking(estimate_scratch_size, payload.pid)
+    return await ccp_job.run("import", payload.pid, lambda: run_project_import(payload), scratch_size=scratch_size)
+
+@router.post("/ccp/import_job")
+async def api_project_import_job(payload: ccp_payload):
+    """프로젝트 복원 작업을 백그라운드로 등록"""
+    scratch_size = await ccp_job.run_blocking(estimate_scratch_size, payload.pid)
+    job = ccp_job.submit("import", payload.pid, lambda: run_project_import(payload), scratch_size=scratch_size)
+    return {"RESULT_CODE": 200, "RESULT_MSG": "Import job submitted", "PAYLOAD": {"job_id": job["job_id"]}}
+
 
 def initialize_folder(pid: int):
     """백업/추출을 위한 폴더를 초기화한다."""
     try:
-        os.makedirs(f'/data/ccp/{pid}/DATABASE', exist_ok=True)
-        os.makedirs(f'/data/ccp/{pid}/OUTPUT', exist_ok=True)
+        os.makedirs(work_path(pid, 'DATABASE'), exist_ok=True)
+        os.makedirs(work_path(pid, 'OUTPUT'), exist_ok=True)
         logging.info(f"Folder structure initialized successfully for project {pid}")
     except Exception as e:
         logging.error(f"Failed to initialize folder for project {pid}: {str(e)}", exc_info=True)
@@ -415,7 +679,7 @@ def export_database_csv(payload: ccp_payload):
 async def download_output_files(pid: int):
     """Storage 서버에서 OUTPUT 파일들을 다운로드 받아 지정 폴더에 저장한다."""
     try:
-        result = await pull_storage_server(pid, f'/data/ccp/{pid}/OUTPUT')
+        result = await pull_storage_server(pid, work_path(pid, 'OUTPUT'))
         if result['RESULT_CODE'] != 200:
             raise Exception(result['RESULT_MSG'])
         logging.info(f"OUTPUT files downloaded successfully for project {pid}")
@@ -427,7 +691,7 @@ async def download_output_files(pid: int):
 def encrypt_project_folder(pid: int):
     """지정 폴더를 암호화하여 CCP 파일로 생성한다."""
     try:
-        encryption_result = encrypt_ccp_file(pid)
+        encryption_result = pack_ccp_file(pid)
         if not encryption_result:
             raise Exception(f"Failed to encrypt project folder for pid {pid}")
         logging.info(f"Encryption successful for project {pid}")
@@ -440,6 +704,7 @@ def save_history_record(payload: ccp_payload) -> int:
     """DB 서버에 히스토리 레코드를 저장한다."""
     try:
         ver = csv_DB.insert_csv_history(payload.pid, payload.univ_id, payload.msg)
+        invalidate_version_index(payload.pid)
         if ver is None:
             raise Exception("Failed to insert history record")
         logging.info(f"History record saved successfully with version {ver} for project {payload.pid}")
@@ -451,25 +716,19 @@ def save_history_record(payload: ccp_payload) -> int:
 def upload_ccp_file(payload: ccp_payload, ver: int):
     """생성된 CCP 파일을 Storage 서버에 업로드한다."""
     logging.info(f"------ Starting CCP file upload for project {payload.pid} (version {ver}) ------")
-    ccp_file_path = f"/data/ccp/{payload.pid}.ccp"
+    ccp_file_path = work_path(f"{payload.pid}.ccp")
     ccp_file_name = f"{payload.pid}_{ver}.ccp"
-    storage_url = "http://192.168.50.84:10080/api/ccp/pull"
     try:
-        logging.info(f"Reading CCP file: {ccp_file_path}")
-        with open(ccp_file_path, "rb") as file:
-            files = {"file": (ccp_file_name, file, "application/octet-stream")}
-            form_data = {"pid": str(payload.pid), "name": ccp_file_name}
-            logging.info(f"Sending CCP file to Storage Server: {storage_url}")
-            response = requests.post(storage_url, files=files, data=form_data, timeout=30)
-        if response.status_code != 200:
-            logging.error(f"Failed to upload CCP file for project {payload.pid}: {response.text}", exc_info=True)
-            raise HTTPException(status_code=500, detail="Failed to upload CCP file to Storage Server")
+        upload_ccp_objects(payload.pid)
+        logging.info(f"Sending CCP file to Storage Server: {ccp_file_name}")
+        ccp_transport.transport.upload("ccp", payload.pid, ccp_file_name, ccp_file_path)
         logging.info(f"CCP file uploaded successfully: {ccp_file_name}")
+        record_ccp_version(payload.pid, ver)
         logging.info(f"------ CCP file upload completed for project {payload.pid} ------")
     except FileNotFoundError:
         logging.error(f"CCP file not found: {ccp_file_path}", exc_info=True)
         raise HTTPException(status_code=404, detail="CCP file not found")
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         logging.error(f"Request error during CCP file upload for project {payload.pid}: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Request to storage server failed: {str(e)}")
     except Exception as e:
@@ -479,30 +738,35 @@ def upload_ccp_file(payload: ccp_payload, ver: int):
 def cleanup_project_folder(pid: int):
     """작업 후 생성된 폴더와 파일들을 정리한다."""
     try:
-        shutil.rmtree(f'/data/ccp/{pid}', ignore_errors=True)
-        os.remove(f'/data/ccp/{pid}.ccp')
+        shutil.rmtree(work_path(pid), ignore_errors=True)
+        shutil.rmtree(work_path(f'{pid}_objects'), ignore_errors=True)
+        if os.path.realpath(work_path(pid)) != os.path.realpath(os.path.dirname(landing_path(pid))):
+            shutil.rmtree(os.path.dirname(landing_path(pid)), ignore_errors=True)
+        os.remove(work_path(f'{pid}.ccp'))
         logging.info(f"Cleanup completed successfully for project {pid}")
     except FileNotFoundError:
         logging.warning(f"Some files for project {pid} were not found during cleanup.")
     except Exception as e:
         logging.error(f"Failed to delete folder or CCP file for project {pid}: {str(e)}", exc_info=True)
 
-@router.post("/ccp/export")
-async def api_project_export(payload: ccp_payload):
-    """프로젝트 추출 기능"""
+async def run_project_export(payload: ccp_payload):
+    """프로젝트 추출 작업 (블로킹 작업은 ccp_job 스레드 풀에서 실행)"""
     logging.info(f"------ Start project export process for PID {payload.pid} ------")
     # Step 1: 폴더 초기화
+    ccp_job.set_step(1, "Initializing folder structure")
     try:
         logging.info(f"Initializing folder structure for project {payload.pid}")
-        os.makedirs(f'/data/ccp/{payload.pid}/DATABASE', exist_ok=True)
-        os.makedirs(f'/data/ccp/{payload.pid}/OUTPUT', exist_ok=True)
+        os.makedirs(landing_path(payload.pid), exist_ok=True)
+        os.makedirs(work_path(payload.pid, 'DATABASE'), exist_ok=True)
+        os.makedirs(work_path(payload.pid, 'OUTPUT'), exist_ok=True)
     except Exception as e:
         logging.error(f"Failed to initialize folder for project {payload.pid}: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to initialize folder: {str(e)}")
     # Step 2: 데이터베이스 내보내기
+    ccp_job.set_step(2, "Exporting database to CSV")
     try:
         logging.info(f"Exporting database to CSV for project {payload.pid}")
-        result = csv_DB.export_csv(payload.pid)
+        result = await ccp_job.run_blocking(csv_DB.export_csv, payload.pid)
         if not handle_db_result(result):
             raise Exception("Failed to export database")
         logging.info("Database exported successfully")
@@ -510,10 +774,11 @@ async def api_project_export(payload: ccp_payload):
         logging.error(f"Failed to export database for project {payload.pid}: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to export database: {str(e)}")
     # Step 3: CSV 파일 다운로드
+    ccp_job.set_step(3, "Downloading CSV files")
     try:
         logging.info("Downloading CSV files from API Server")
         api_url = "http://192.168.50.84:70/api/ccp/pull_db"
-        response = requests.post(api_url, json={"pid": payload.pid})
+        response = await ccp_job.run_blocking(requests.post, api_url, json={"pid": payload.pid})
         if response.status_code != 200:
             raise Exception(response.json().get("message", "Unknown error"))
         logging.info("CSV files downloaded successfully")
@@ -521,20 +786,23 @@ async def api_project_export(payload: ccp_payload):
         logging.error(f"Failed to download CSV files: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to download CSV files: {str(e)}")
     # Step 4: CSV 폴더 정리
+    ccp_job.set_step(4, "Cleaning up CSV folder")
     try:
         logging.info("Cleaning up the CSV folder from API Server")
         cleanup_url = "http://192.168.50.84:70/api/ccp/clean_db"
-        response = requests.post(cleanup_url, json={"pid": payload.pid})
+        response = await ccp_job.run_blocking(requests.post, cleanup_url, json={"pid": payload.pid})
         if response.status_code != 200:
             raise Exception(response.json().get("message", "Unknown error"))
         logging.info("CSV folder cleaned up successfully")
+        await ccp_job.run_blocking(adopt_database_csv, payload.pid)
     except Exception as e:
         logging.error(f"Failed to clean up CSV folder: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to clean up CSV folder: {str(e)}")
     # Step 5: OUTPUT 파일 다운로드
+    ccp_job.set_step(5, "Downloading OUTPUT files")
     try:
         logging.info("Downloading OUTPUT files from Storage Server")
-        result = await pull_storage_server(payload.pid, f'/data/ccp/{payload.pid}/OUTPUT')
+        result = await pull_storage_server(payload.pid, work_path(payload.pid, 'OUTPUT'))
         if result['RESULT_CODE'] != 200:
             raise Exception(result['RESULT_MSG'])
         logging.info("OUTPUT files downloaded successfully")
@@ -542,18 +810,21 @@ async def api_project_export(payload: ccp_payload):
         logging.error(f"Failed to download OUTPUT files: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to download OUTPUT files: {str(e)}")
     # Step 6: 프로젝트 폴더 암호화
+    ccp_job.set_step(6, "Encrypting project folder")
     try:
         logging.info("Encrypting project folder")
-        if not encrypt_ccp_file(payload.pid):
+        if not await ccp_job.run_blocking(pack_ccp_file, payload.pid, full=payload.full == 1):
             raise Exception("Failed to encrypt project folder")
         logging.info("Project folder encrypted successfully")
     except Exception as e:
         logging.error(f"Error during encryption: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error during encryption: {str(e)}")
     # Step 7: 히스토리 저장
+    ccp_job.set_step(7, "Saving backup history")
     try:
         logging.info("Saving backup history to DB")
-        backup_ver = csv_DB.insert_csv_history(payload.pid, payload.univ_id, payload.msg)
+        backup_ver = await ccp_job.run_blocking(csv_DB.insert_csv_history, payload.pid, payload.univ_id, payload.msg)
+        invalidate_version_index(payload.pid)
         if backup_ver is None:
             raise Exception("Failed to insert backup history record")
         logging.info(f"Backup history recorded successfully as version {backup_ver}")
@@ -561,46 +832,105 @@ async def api_project_export(payload: ccp_payload):
         logging.error(f"Failed to save backup history: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to save backup history: {str(e)}")
     # Step 8: CCP 파일 업로드
+    ccp_job.set_step(8, "Uploading CCP file")
     try:
         logging.info("Uploading backup CCP file to Storage Server")
-        history = csv_DB.fetch_csv_history(payload.pid)
-        version = str(max(record['ver'] for record in history))
-        ccp_file_path = f"/data/ccp/{payload.pid}.ccp"
-        ccp_file_name = f"{payload.pid}_{version}.ccp"
-        storage_url = "http://192.168.50.84:10080/api/ccp/pull"
-        with open(ccp_file_path, "rb") as file:
-            files = {"file": (ccp_file_name, file, "application/octet-stream")}
-            response = requests.post(storage_url, files=files, data={"pid": str(payload.pid), "name": ccp_file_name})
-        if response.status_code != 200:
-            raise Exception("Failed to upload backup CCP file")
-        logging.info(f"Backup CCP file uploaded successfully: {ccp_file_name}")
+        # insert_csv_history가 반환한 버전을 그대로 사용 (히스토리 재조회 불필요)
+        version = str(backup_ver)
+        await ccp_job.run_blocking(push_ccp_version, payload.pid, version)
     except FileNotFoundError:
-        logging.error(f"Backup CCP file not found: {ccp_file_path}", exc_info=True)
+        logging.error(f"Backup CCP file not found: {work_path(f'{payload.pid}.ccp')}", exc_info=True)
         raise HTTPException(status_code=404, detail="Backup CCP file not found")
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         logging.error(f"Request error during CCP file upload: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Request error during CCP file upload: {str(e)}")
     except Exception as e:
         logging.error(f"Unexpected error during CCP file upload: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error during CCP file upload: {str(e)}")
     # Step 9: 임시 폴더 정리
-    try:
-        logging.info("Cleaning up temporary project folder and CCP file")
-        shutil.rmtree(f'/data/ccp/{payload.pid}', ignore_errors=True)
-        os.remove(f'/data/ccp/{payload.pid}.ccp')
-        logging.info("Temporary files deleted successfully")
-    except FileNotFoundError:
-        logging.warning(f"Some files were already deleted, skipping cleanup.")
-    except Exception as e:
-        logging.error(f"Failed to clean up project folder: {str(e)}", exc_info=True)
+    ccp_job.set_step(9, "Cleaning up temporary files")
+    logging.info("Cleaning up temporary project folder and CCP file")
+    await ccp_job.run_blocking(cleanup_project_folder, payload.pid)
     logging.info(f"------ Project export process completed successfully for PID {payload.pid} ------")
     return {"RESULT_CODE": 200, "RESULT_MSG": f"Project {payload.pid} exported successfully."}
 
+def export_request_key(payload: ccp_payload):
+    """내용이 같은 Export 요청만 병합하기 위한 키 (요청자와 메시지가 다르면 각각 버전으로 기록)"""
+    return (payload.univ_id, payload.msg, payload.full)
+
+@router.post("/ccp/export")
+async def api_project_export(payload: ccp_payload):
+    """프로젝트 추출 기능"""
+    scratch_size = await ccp_job.run_blocking(estimate_scratch_size, payload.pid)
+    return await ccp_job.run("export", payload.pid, lambda: run_project_export(payload), coalesce=export_request_key(payload), scratch_size=scratch_size)
+
+@router.post("/ccp/export_job")
+async def api_project_export_job(payload: ccp_payload):
+    """프로젝트 추출 작업을 백그라운드로 등록"""
+    scratch_size = await ccp_job.run_blocking(estimate_scratch_size, payload.pid)
+    job = ccp_job.submit("export", payload.pid, lambda: run_project_export(payload), coalesce=export_request_key(payload), scratch_size=scratch_size)
+    return {"RESULT_CODE": 200, "RESULT_MSG": "Export job submitted", "PAYLOAD": {"job_id": job["job_id"]}}
+
+@router.post("/ccp/job_status")
+async def api_job_status(payload: ccp_job_payload):
+    """CCP Import/Export 작업 진행 상태 조회"""
+    job = ccp_job.get_job(payload.job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {payload.job_id} not found")
+    return {"RESULT_CODE": 200, "RESULT_MSG": "Job status loaded successfully", "PAYLOAD": job}
+
+@router.post("/ccp/list_files")
+async def api_list_version_files(payload: ccp_payload):
+    """버전에 포함된 파일 목록 조회 (보존 정책 정리, Import가 매니페스트 캐시를 바꾸지 않도록 pid 잠금을 보유한 상태로 읽음)"""
+    try:
+        async with ccp_job.hold(payload.pid):
+            cache_path = await fetch_version_manifest(payload.pid, payload.ver)
+            await download_ccp_objects(payload.pid, payload.ver, cache_path, paths=[])
+            manifest = ccp_store.read_manifest(cache_path, key)
+            files = ccp_store.resolve_chain(ccp_store.load_chain(payload.pid, manifest, key))["files"]
+        result = [{"path": entry["path"], "size": entry["size"], "hash": entry["hash"]} for entry in files]
+    except Exception as e:
+        logging.error(f"Error occurred while listing files of version {payload.ver} for project {payload.pid}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error during file list load: {str(e)}")
+    return {"RESULT_CODE": 200, "RESULT_MSG": "Version files loaded successfully", "PAYLOAD": result}
+
+@router.post("/ccp/pull_file")
+async def api_pull_version_file(payload: ccp_payload):
+    """버전에서 파일 하나만 복원하여 Next.js로 전송 (나머지 파일은 복호화하지 않음)"""
+    temp_file_path = None
+    try:
+        # 복원이 끝날 때까지 pid 잠금을 보유하고, 복원된 임시 파일의 전송은 잠금 없이 진행
+        async with ccp_job.hold(payload.pid):
+            cache_path = await fetch_version_manifest(payload.pid, payload.ver)
+            await download_ccp_objects(payload.pid, payload.ver, cache_path, paths=[payload.path])
+            manifest = ccp_store.read_manifest(cache_path, key)
+            resolved = ccp_store.resolve_chain(ccp_store.load_chain(payload.pid, manifest, key))
+            entry = next((entry for entry in resolved["files"] if entry["path"] == payload.path), None)
+            if entry is None:
+                raise HTTPException(status_code=404, detail=f"{payload.path} not found in version {payload.ver}")
+            os.makedirs(TEMP_DOWNLOAD_DIR, exist_ok=True)
+            file_name = os.path.basename(payload.path)
+            temp_file_path = os.path.join(TEMP_DOWNLOAD_DIR, f"ccp_{payload.pid}_{payload.ver}_{entry['hash'][:16]}")
+            await ccp_job.run_blocking(ccp_store.restore_file, payload.pid, entry, temp_file_path, key, resolved["patches"])
+        logging.info(f"Restored {payload.path} from version {payload.ver} of project {payload.pid}")
+        return await push.pusher.push_file(temp_file_path, file_name)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error occurred while pulling {payload.path} from version {payload.ver} for project {payload.pid}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error during file restore: {str(e)}")
+    finally:
+        if temp_file_path and os.path.exists(temp_file_path):
+            os.remove(temp_file_path)
+
 @router.post("/ccp/del_history")
 async def api_delete_history(payload: ccp_payload):
-    """프로젝트 히스토리 삭제"""
+    """프로젝트 히스토리 삭제 (진행 중인 Import/Export가 끝난 뒤 pid 잠금을 보유한 상태로 삭제)"""
     try:
-        result = csv_DB.delete_csv_history(payload.pid)
+        async with ccp_job.hold(payload.pid):
+            result = await ccp_job.run_blocking(csv_DB.delete_csv_history, payload.pid)
+            invalidate_version_index(payload.pid)
+            await ccp_job.run_blocking(ccp_store.remove_project, payload.pid)
         if not result:
             raise Exception(f"Failed to delete history for project {payload.pid}")
         logging.info(f"History successfully deleted for project {payload.pid}")
@@ -613,7 +943,8 @@ async def api_delete_history(payload: ccp_payload):
 async def api_load_history(payload: ccp_payload):
     """프로젝트 히스토리 로드"""
     try:
-        result = csv_DB.fetch_csv_history(payload.pid)
+        # 최신 목록을 읽으면서 버전 인덱스도 갱신 (DB 조회와 pruned 목록 읽기는 작업 스레드에서 실행)
+        result = (await ccp_job.run_blocking(load_version_index, payload.pid, True))["history"]
         if not result:
             raise Exception(f"Failed to load history for project {payload.pid}")
         logging.info(f"History successfully loaded for project {payload.pid}, total records: {len(result)}")
@@ -624,43 +955,10 @@ async def api_load_history(payload: ccp_payload):
 
 @router.post("/ccp/load_history_id")
 async def api_load_history_by_univid(payload: ccp_payload):
-    """프로젝트 복원용 히스토리 로드"""
+    """프로젝트 복원용 히스토리 로드 (offset/limit, updated_since 지정 시 해당 범위만 반환)"""
     try:
-        result = csv_DB.fetch_csv_history_by_univid(payload.univ_id)
-        if not result or not isinstance(result, list):
-            raise Exception(f"Failed to load history for user {payload.univ_id}")
-        deleted_file = "deleted_project.json"
-        deleted_data = {}
-        if os.path.exists(deleted_file):
-            try:
-                with open(deleted_file, "r", encoding="utf-8") as f:
-                    deleted_data = json.load(f)
-            except json.JSONDecodeError:
-                logging.warning("deleted_project.json is malformed or empty.")
-        try:
-            all_projects = project_DB.fetch_project_info(payload.univ_id)
-        except Exception as e:
-            all_projects = []
-            logging.warning(f"Failed to load active project info for univ_id {payload.univ_id}: {e}")
-        pname_lookup = {p["p_no"]: p["p_name"] for p in all_projects if "p_no" in p and "p_name" in p}
-        grouped = defaultdict(lambda: {"pname": None, "history": []})
-        for entry in result:
-            p_no = str(entry["p_no"])
-            history_item = {
-                "ver": entry["ver"],
-                "date": entry["date"],
-                "s_no": entry["s_no"],
-                "msg": entry["msg"]
-            }
-            if p_no in deleted_data:
-                grouped[p_no]["pname"] = deleted_data[p_no].get("pname")
-            elif entry["p_no"] in pname_lookup:
-                grouped[p_no]["pname"] = pname_lookup[entry["p_no"]]
-            else:
-                grouped[p_no]["pname"] = None
-            grouped[p_no]["history"].append(history_item)
-        for p_data in grouped.values():
-            p_data["history"].sort(key=lambda x: x["ver"], reverse=True)
+        grouped, next_offset, latest = await ccp_job.run_blocking(
+            ccp_history.query_view, payload.univ_id, payload.updated_since, payload.offset, payload.limit)
         logging.info(f"History successfully loaded for user {payload.univ_id}, total projects: {len(grouped)}")
     except Exception as e:
         logging.error(f"Error occurred while loading history for user {payload.univ_id}: {str(e)}", exc_info=True)
@@ -668,5 +966,7 @@ async def api_load_history_by_univid(payload: ccp_payload):
     return {
         "RESULT_CODE": 200,
         "RESULT_MSG": "History loaded successfully",
-        "PAYLOAD": grouped
-    }
\ No newline at end of file
+        "PAYLOAD": grouped,
+        "NEXT_OFFSET": next_offset,
+        "UPDATED": latest
+    }
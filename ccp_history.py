@@ -0,0 +1,143 @@
+"""
+   CodeCraft PMS Backend Project
+
+   파일명   : ccp_history.py
+   생성자   : 김창환
+
+   생성일   : 2026/10/18
+   업데이트 : 2026/10/18
+
+   설명     : 사용자별 CCP 히스토리 뷰(프로젝트별 그룹, 정렬, 이름 조회 완료)의 캐시 정의
+"""
+
+from datetime import datetime
+from logger import logger
+import os, sys, time
+
+sys.path.append(os.path.abspath('/data/Database Project'))  # Database Project와 연동하기 위해 사용
+
+import csv_DB
+import project_DB
+import ccp_store
+import deleted_project
+
+# 히스토리가 바뀌는 이벤트(Export, Import 백업, 히스토리 삭제, 보존 정책 정리, 프로젝트 삭제)가 발생하면
+# notify_change()가 HISTORY_STAMP의 수정 시각을 갱신한다. 캐시된 뷰는 만든 시각이 이 시각보다
+# 이전이면 다시 만들어지므로, 다른 uvicorn worker에서 발생한 변경도 다음 요청에 바로 반영된다.
+HISTORY_STAMP = "/data/ccp/history.stamp"
+VIEW_TTL = int(os.getenv('CCP_VIEW_TTL', '300'))  # 변경 이벤트가 없어도 뷰를 다시 만드는 주기 (초); DB 직접 수정 대비
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+views = {}  # univ_id -> 히스토리 뷰
+
+
+def parse_history_date(value):
+    """히스토리 레코드의 date 값을 datetime으로 변환 (알 수 없는 형식이면 None)"""
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "")).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+
+def _stamp():
+    try:
+        return os.stat(HISTORY_STAMP).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+def notify_change():
+    """히스토리 변경 이벤트를 기록하여 모든 worker의 캐시된 뷰를 무효화"""
+    views.clear()
+    try:
+        os.makedirs(os.path.dirname(HISTORY_STAMP), exist_ok=True)
+        with open(HISTORY_STAMP, "a"):
+            pass
+        os.utime(HISTORY_STAMP)
+    except OSError as e:
+        logger.warning(f"Failed to update CCP history stamp: {e}")
+
+
+def build_view(univ_id):
+    """사용자가 참여한 프로젝트의 히스토리를 프로젝트별로 묶고 최신 버전 순으로 정렬한 뷰를 생성"""
+    result = csv_DB.fetch_csv_history_by_univid(univ_id)
+    if not result or not isinstance(result, list):
+        raise Exception(f"Failed to load history for user {univ_id}")
+    pids = {int(entry["p_no"]) for entry in result}
+    deleted_data = deleted_project.fetch_deleted_projects(pids)
+    pname_lookup = {}
+    if pids - set(deleted_data):
+        # 삭제되지 않은 프로젝트가 있을 때만 프로젝트 이름을 조회
+        try:
+            all_projects = project_DB.fetch_project_info(univ_id)
+        except Exception as e:
+            all_projects = []
+            logger.warning(f"Failed to load active project info for univ_id {univ_id}: {e}")
+        pname_lookup = {int(p["p_no"]): p["p_name"] for p in all_projects if "p_no" in p and "p_name" in p}
+    pruned = {pid: ccp_store.load_pruned(pid) for pid in pids}
+    projects = {}
+    for entry in result:
+        pid = int(entry["p_no"])
+        if int(entry["ver"]) in pruned[pid]:
+            continue
+        if str(pid) not in projects:
+            pname = deleted_data[pid]["pname"] if pid in deleted_data else pname_lookup.get(pid)
+            projects[str(pid)] = {"pname": pname, "history": []}
+        projects[str(pid)]["history"].append({
+            "ver": entry["ver"],
+            "date": entry["date"],
+            "s_no": entry["s_no"],
+            "msg": entry["msg"]
+        })
+    entries = []
+    for p_no, p_data in projects.items():
+        p_data["history"].sort(key=lambda x: x["ver"], reverse=True)
+        for item in p_data["history"]:
+            entries.append((parse_history_date(item["date"]) or datetime.min, item["ver"], p_no, item))
+    # 페이지 단위 조회용: 모든 프로젝트의 버전을 저장 시각 최신순으로 나열
+    entries.sort(key=lambda x: (x[0], x[1]), reverse=True)
+    return {"projects": projects, "entries": entries, "latest": entries[0][0] if entries else None}
+
+
+def load_view(univ_id):
+    """캐시된 사용자 히스토리 뷰를 반환 (변경 이벤트 이후 만들어졌고 만료되지 않은 경우에만 재사용)"""
+    view = views.get(univ_id)
+    if view is not None and view["stamp"] == _stamp() and time.time() - view["loaded"] < VIEW_TTL:
+        return view
+    stamp = _stamp()
+    view = build_view(univ_id)
+    # 뷰를 만드는 동안 발생한 변경은 stamp가 달라지므로 다음 요청에서 다시 만들어진다
+    view.update(stamp=stamp, loaded=time.time())
+    views[univ_id] = view
+    return view
+
+
+def query_view(univ_id, updated_since=None, offset=None, limit=None):
+    """사용자 히스토리 뷰를 조회 (updated_since 시각 이후 저장된 버전만, offset/limit 단위로 나누어 반환)
+
+    반환값은 (프로젝트별 히스토리, 다음 offset 또는 None, 다음 updated_since로 사용할 최신 저장 시각)
+    저장 시각은 초 단위이므로 updated_since와 같은 초에 저장된 버전도 포함한다. (반환된 최신 시각과 같은 초에
+    나중에 저장된 버전이 빠지지 않도록) 이미 받은 버전이 다시 포함될 수 있으므로 클라이언트는 (p_no, ver)로 중복을 제거한다.
+    """
+    view = load_view(univ_id)
+    latest = view["latest"].strftime(DATE_FORMAT) if view["latest"] not in (None, datetime.min) else None
+    if updated_since is None and offset is None and limit is None:
+        return view["projects"], None, latest
+    entries = view["entries"]
+    if updated_since is not None:
+        since = parse_history_date(updated_since)
+        if since is None:
+            raise Exception(f"Invalid updated_since value: {updated_since}")
+        entries = [entry for entry in entries if entry[0] >= since]
+    start = offset or 0
+    end = len(entries) if limit is None else start + limit
+    grouped = {}
+    for _, _, p_no, item in entries[start:end]:
+        if p_no not in grouped:
+            grouped[p_no] = {"pname": view["projects"][p_no]["pname"], "history": []}
+        grouped[p_no]["history"].append(item)
+    for p_data in grouped.values():
+        p_data["history"].sort(key=lambda x: x["ver"], reverse=True)
+    return grouped, end if end < len(entries) else None, latest
@@ -0,0 +1,334 @@
+"""
+   CodeCraft PMS Backend Project
+
+   파일명   : ccp_job.py
+   생성자   : 김창환
+
+   생성일   : 2026/10/18
+   업데이트 : 2026/10/18
+
+   설명     : CCP Import/Export 작업의 백그라운드 실행 및 진행 상태 관리
+"""
+
+from fastapi import HTTPException
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from contextvars import ContextVar, copy_context
+from datetime import datetime
+from logger import logger
+import os, json, uuid, time, fcntl, shutil, asyncio, functools, threading
+
+JOB_DIR = "/data/ccp/jobs"  # 작업 상태 파일 (다른 uvicorn worker에서도 상태 조회가 가능하도록 기록)
+LOCK_DIR = "/data/ccp/locks"  # pid별 잠금 파일 (uvicorn worker 간 직렬화에 사용)
+LOCK_POLL_INTERVAL = 0.2  # 다른 worker가 잠금을 보유 중일 때 재시도 간격 (초)
+LEGACY_WORK_ROOT = "/data/ccp"  # 작업 밖에서 호출될 때 사용하는 기존 고정 경로
+SCRATCH_FAST = os.getenv('CCP_SCRATCH_FAST', '')  # tmpfs 등 빠른 작업 공간 (예: /dev/shm/ccp); 비어 있으면 사용 안 함
+SCRATCH_DIR = os.getenv('CCP_SCRATCH_DIR', '/data/ccp/work')  # 빠른 공간에 들어가지 않는 작업이 사용하는 디스크 작업 공간
+SCRATCH_RESERVE = int(os.getenv('CCP_SCRATCH_RESERVE', str(512 * 1024 * 1024)))  # 작업 공간 파일시스템에 항상 남겨둘 여유 공간 (bytes)
+JOB_WORKERS = int(os.getenv('CCP_JOB_WORKERS', '4'))  # 블로킹 작업(DB, 암호화, 업로드)을 처리할 스레드 수
+WORKSPACE_BUILDING_SUFFIX = ".building"  # 잠금을 걸기 전(생성 중)인 작업 공간 이름의 접미사
+WORKSPACE_GRACE = 60  # 잠금이 없는 작업 공간을 비정상 종료로 보고 정리하기까지의 시간 (초)
+JOB_TTL = 24 * 60 * 60  # 완료된 작업 상태를 보관하는 시간 (초)
+TOTAL_STEPS = 9  # Import/Export 모두 Step 1~9로 구성 (단계 수가 다른 작업은 submit의 total_steps로 지정)
+
+executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="ccp-job")
+jobs = {}  # job_id -> 작업 상태
+pid_locks = {}  # pid -> asyncio.Lock; 같은 프로젝트의 작업은 순서대로 실행
+futures = {}  # job_id -> 작업 결과 Future
+waiting = {}  # (kind, pid, coalesce 키) -> 아직 시작되지 않은 병합 가능 작업의 job_id
+reserved = {}  # 작업 공간 루트 -> 실행 중인 작업들이 예약한 용량 (bytes)
+reserved_lock = threading.Lock()
+tasks = set()  # 실행 중인 백그라운드 Task 참조 유지
+current_job = ContextVar("current_job", default=None)
+current_workspace = ContextVar("current_workspace", default=None)
+
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _save(job):
+    try:
+        os.makedirs(JOB_DIR, exist_ok=True)
+        job_path = os.path.join(JOB_DIR, f"{job['job_id']}.json")
+        with open(f"{job_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(job, f, ensure_ascii=False)
+        os.replace(f"{job_path}.tmp", job_path)
+    except Exception as e:
+        logger.warning(f"Failed to save CCP job state {job['job_id']}: {e}")
+
+
+def _prune():
+    """보관 시간이 지난 완료 작업의 상태를 정리"""
+    limit = time.time() - JOB_TTL
+    for job_id, job in list(jobs.items()):
+        if job["status"] in ("done", "failed") and job["finished_at"] < limit:
+            jobs.pop(job_id, None)
+            try:
+                os.remove(os.path.join(JOB_DIR, f"{job_id}.json"))
+            except FileNotFoundError:
+                pass
+
+
+def _create(kind, pid, total_steps=TOTAL_STEPS):
+    _prune()
+    job = {
+        "job_id": uuid.uuid4().hex,
+        "kind": kind,
+        "pid": pid,
+        "status": "queued",
+        "step": 0,
+        "total_steps": total_steps,
+        "message": "Waiting for previous job on this project",
+        "result": None,
+        "error": None,
+        "created": _now(),
+        "updated": _now(),
+        "finished_at": None
+    }
+    jobs[job["job_id"]] = job
+    _save(job)
+    return job
+
+
+def _scratch_roots():
+    return [root for root in (SCRATCH_FAST, SCRATCH_DIR) if root]
+
+
+def _available(root):
+    """작업 공간 루트의 사용 가능 용량 (여유 공간 - 예약분 - 다른 작업이 예약한 용량)"""
+    os.makedirs(root, exist_ok=True)
+    usage = shutil.disk_usage(root)
+    return usage.free - SCRATCH_RESERVE - reserved.get(root, 0)
+
+
+def _select_scratch_root(size):
+    """예상 용량이 들어가는 가장 빠른 작업 공간 루트를 선택 (없으면 None)"""
+    for root in _scratch_roots():
+        try:
+            if _available(root) >= size:
+                return root
+        except OSError as e:
+            logger.warning(f"CCP scratch root {root} is not usable: {e}")
+    return None
+
+
+def admit(size):
+    """예상 용량을 수용할 작업 공간이 없으면 작업 등록을 거부"""
+    if _select_scratch_root(size) is None:
+        raise HTTPException(status_code=503, detail=f"Not enough CCP scratch space for the job ({size} bytes required)")
+
+
+def sweep_workspaces():
+    """소유 프로세스가 종료되어 잠금이 풀린(비정상 종료 등) 작업 공간을 정리"""
+    for root in _scratch_roots():
+        if not os.path.isdir(root):
+            continue
+        for name in os.listdir(root):
+            workspace = os.path.join(root, name)
+            lock_path = os.path.join(workspace, ".lock")
+            if not os.path.isdir(workspace):
+                continue
+            if name.endswith(WORKSPACE_BUILDING_SUFFIX) or not os.path.exists(lock_path):
+                # 아직 잠금을 걸기 전인 생성 중 작업 공간일 수 있으므로 오래된 경우에만 정리
+                try:
+                    if time.time() - os.path.getmtime(workspace) > WORKSPACE_GRACE:
+                        shutil.rmtree(workspace, ignore_errors=True)
+                except FileNotFoundError:
+                    pass
+                continue
+            try:
+                fd = os.open(lock_path, os.O_RDWR)
+            except FileNotFoundError:
+                continue
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            shutil.rmtree(workspace, ignore_errors=True)
+            _release_file_lock(fd)
+            logger.info(f"Removed orphaned CCP workspace {workspace}")
+
+
+def _open_workspace(job, size):
+    """작업 전용 scratch 작업 공간을 만들고 작업이 끝날 때까지 잠금을 유지"""
+    sweep_workspaces()
+    with reserved_lock:
+        root = _select_scratch_root(size)
+        if root is None:
+            raise Exception(f"Not enough CCP scratch space for the job ({size} bytes required)")
+        reserved[root] = reserved.get(root, 0) + size
+    workspace = os.path.join(root, job["job_id"])
+    # 임시 이름으로 만들고 잠금을 건 뒤 이름을 바꿔, sweep_workspaces가 잠금 전의 작업 공간을 정리하지 못하게 함
+    building = workspace + WORKSPACE_BUILDING_SUFFIX
+    fd = None
+    try:
+        os.makedirs(building)
+        fd = os.open(os.path.join(building, ".lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        os.rename(building, workspace)
+    except Exception:
+        shutil.rmtree(building, ignore_errors=True)
+        if fd is not None:
+            _release_file_lock(fd)
+        with reserved_lock:
+            reserved[root] -= size
+        raise
+    job["workspace"] = workspace
+    return root, workspace, fd
+
+
+def _close_workspace(root, workspace, fd, size):
+    shutil.rmtree(workspace, ignore_errors=True)
+    _release_file_lock(fd)
+    with reserved_lock:
+        reserved[root] -= size
+
+
+def workspace_root():
+    """현재 작업의 scratch 작업 공간 경로 (작업 밖에서는 기존 /data/ccp)"""
+    return current_workspace.get() or LEGACY_WORK_ROOT
+
+
+def set_step(step, message):
+    """현재 실행 중인 작업의 진행 단계를 기록 (작업 밖에서 호출되면 무시)"""
+    job = current_job.get()
+    if job is None:
+        return
+    job["step"] = step
+    job["message"] = message
+    job["updated"] = _now()
+    _save(job)
+
+
+async def run_blocking(func, *args, **kwargs):
+    """블로킹 함수를 작업 스레드 풀에서 실행하여 이벤트 루프가 멈추지 않도록 한다."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(copy_context().run, func, *args, **kwargs))
+
+
+async def _acquire_file_lock(pid):
+    """pid 잠금 파일에 배타적 잠금을 건다. (다른 worker가 보유 중이면 해제될 때까지 대기)"""
+    os.makedirs(LOCK_DIR, exist_ok=True)
+    fd = os.open(os.path.join(LOCK_DIR, f"{pid}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+    while True:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return fd
+        except BlockingIOError:
+            await asyncio.sleep(LOCK_POLL_INTERVAL)
+        except Exception:
+            os.close(fd)
+            raise
+
+
+def _release_file_lock(fd):
+    try:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+
+@asynccontextmanager
+async def hold(pid):
+    """pid의 작업 잠금을 보유 (worker 안에서는 asyncio.Lock, worker 간에는 잠금 파일로 직렬화)"""
+    lock = pid_locks.setdefault(pid, asyncio.Lock())
+    async with lock:
+        fd = await _acquire_file_lock(pid)
+        try:
+            yield
+        finally:
+            _release_file_lock(fd)
+
+
+async def _execute(job, factory, scratch_size):
+    async with hold(job["pid"]):
+        # 실행이 시작된 작업에는 더 이상 새 요청을 병합하지 않음 (이미 DB를 읽기 시작했을 수 있으므로)
+        for waiting_key, job_id in list(waiting.items()):
+            if job_id == job["job_id"]:
+                del waiting[waiting_key]
+        token = current_job.set(job)
+        workspace = None
+        job["status"] = "running"
+        job["updated"] = _now()
+        try:
+            workspace = await run_blocking(_open_workspace, job, scratch_size)
+            workspace_token = current_workspace.set(workspace[1])
+            _save(job)
+            result = await factory()
+            job["status"] = "done"
+            job["result"] = result
+            return result
+        except HTTPException as e:
+            job["status"] = "failed"
+            job["error"] = e.detail
+            raise
+        except Exception as e:
+            job["status"] = "failed"
+            job["error"] = str(e)
+            raise
+        finally:
+            if workspace is not None:
+                current_workspace.reset(workspace_token)
+                await run_blocking(_close_workspace, *workspace, scratch_size)
+            current_job.reset(token)
+            job["updated"] = _now()
+            job["finished_at"] = time.time()
+            _save(job)
+
+
+async def _execute_background(job, factory, scratch_size):
+    future = futures[job["job_id"]]
+    try:
+        future.set_result(await _execute(job, factory, scratch_size))
+    except Exception as e:
+        logger.error(f"CCP {job['kind']} job {job['job_id']} for PID {job['pid']} failed: {e}")
+        future.set_exception(e)
+    finally:
+        futures.pop(job["job_id"], None)
+
+
+def submit(kind, pid, factory, coalesce=None, scratch_size=0, total_steps=TOTAL_STEPS):
+    """작업을 백그라운드로 등록하고 즉시 작업 상태를 반환
+
+    coalesce는 요청 내용을 나타내는 키이며, 같은 pid에 아직 시작되지 않은 같은 종류의 작업이
+    같은 키로 등록되어 있으면 새 작업을 만들지 않고 그 작업을 반환한다. (요청 내용이 다르면 병합하지 않음)
+    scratch_size는 작업 공간에 필요한 예상 용량이며, 수용할 수 있는 작업 공간이 없으면 등록을 거부한다.
+    total_steps는 작업 상태에 표시되는 전체 단계 수이다.
+    """
+    job_id = waiting.get((kind, pid, coalesce)) if coalesce is not None else None
+    if job_id in futures:
+        logger.info(f"CCP {kind} request for PID {pid} coalesced into job {job_id}")
+        return jobs[job_id]
+    admit(scratch_size)
+    job = _create(kind, pid, total_steps)
+    future = asyncio.get_running_loop().create_future()
+    # 결과를 기다리는 호출자가 없어도 예외가 "never retrieved"로 기록되지 않도록 처리
+    future.add_done_callback(lambda f: f.cancelled() or f.exception())
+    futures[job["job_id"]] = future
+    if coalesce is not None:
+        waiting[(kind, pid, coalesce)] = job["job_id"]
+    task = asyncio.create_task(_execute_background(job, factory, scratch_size))
+    tasks.add(task)
+    task.add_done_callback(tasks.discard)
+    logger.info(f"CCP {kind} job {job['job_id']} submitted for PID {pid}")
+    return job
+
+
+async def run(kind, pid, factory, coalesce=None, scratch_size=0, total_steps=TOTAL_STEPS):
+    """작업을 등록하고 완료될 때까지 기다려 결과를 반환 (기존 동기식 API용)"""
+    job = submit(kind, pid, factory, coalesce, scratch_size, total_steps)
+    return await asyncio.shield(futures[job["job_id"]])
+
+
+def get_job(job_id):
+    """작업 상태 조회 (다른 worker에서 실행된 작업은 상태 파일에서 읽음)"""
+    job = jobs.get(job_id)
+    if job is not None:
+        return job
+    job_path = os.path.join(JOB_DIR, f"{os.path.basename(job_id)}.json")
+    if not os.path.exists(job_path):
+        return None
+    with open(job_path, "r", encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,239 @@
+"""
+   CodeCraft PMS Backend Project
+
+   파일명   : ccp_retention.py
+   생성자   : 김창환
+
+   생성일   : 2026/10/18
+   업데이트 : 2026/10/18
+
+   설명     : CCP 버전 히스토리의 단계별 보존 정책 및 정리(compaction) 스케줄러 정의
+"""
+
+from datetime import datetime
+from logger import logger
+import os, sys, fcntl, asyncio
+
+sys.path.append(os.path.abspath('/data/Database Project'))  # Database Project와 연동하기 위해 사용
+
+import batch_DB
+import ccp
+import ccp_job
+import ccp_history
+import ccp_store
+import ccp_stream
+import ccp_transport
+
+# 보존 정책 (버전 저장 시각 기준)
+#   KEEP_ALL_DAYS 이내       : 모든 버전 보존
+#   KEEP_DAILY_DAYS 이내     : 하루에 가장 최근 버전 1개
+#   KEEP_WEEKLY_DAYS 이내    : 주(ISO week)마다 가장 최근 버전 1개
+#   그 이전                  : 월마다 가장 최근 버전 1개
+# 최신 KEEP_MIN개 버전과 델타 기준 버전(latest)은 항상 보존한다.
+# 정리된 버전을 기준으로 하는 델타 버전은 전체 매니페스트로 다시 기록(compaction)하고,
+# 남은 버전이 참조하지 않는 객체는 Storage 서버와 로컬 저장소에서 삭제한다.
+RETENTION_INTERVAL = int(os.getenv('CCP_RETENTION_INTERVAL', str(6 * 60 * 60)))  # 정리 주기 (초); 0이면 스케줄러 비활성화
+KEEP_MIN = int(os.getenv('CCP_KEEP_MIN', '10'))
+KEEP_ALL_DAYS = int(os.getenv('CCP_KEEP_ALL_DAYS', '7'))
+KEEP_DAILY_DAYS = int(os.getenv('CCP_KEEP_DAILY_DAYS', '30'))
+KEEP_WEEKLY_DAYS = int(os.getenv('CCP_KEEP_WEEKLY_DAYS', '180'))
+RETENTION_STEPS = 4  # 보존 정책 작업 단계 수 (Step 1~4)
+RETENTION_LOCK = os.path.join(ccp_job.LOCK_DIR, "retention.lock")  # 여러 worker 중 하나만 정리 주기를 실행
+
+legacy_versions = set()  # (pid, ver); 매니페스트가 아닌 기존 tar 포맷 버전 (다시 내려받지 않도록 기록)
+scheduler_task = None
+
+
+def select_versions(history, now=None):
+    """보존 정책에 따라 히스토리를 보존할 버전과 정리할 버전으로 분류"""
+    now = now or datetime.now()
+    records = sorted(history, key=lambda record: int(record['ver']), reverse=True)
+    keep, drop = [], []
+    buckets = set()
+    for position, record in enumerate(records):
+        ver = int(record['ver'])
+        date = ccp_history.parse_history_date(record.get('date'))
+        if position < KEEP_MIN or date is None:
+            keep.append(ver)
+            continue
+        age = (now - date).days
+        if age < KEEP_ALL_DAYS:
+            keep.append(ver)
+            continue
+        if age < KEEP_DAILY_DAYS:
+            bucket = ("day", date.date())
+        elif age < KEEP_WEEKLY_DAYS:
+            bucket = ("week",) + tuple(date.isocalendar()[:2])
+        else:
+            bucket = ("month", date.year, date.month)
+        # 버전은 최신순으로 순회하므로 구간마다 처음 만난 버전이 그 구간의 가장 최근 버전
+        if bucket in buckets:
+            drop.append(ver)
+        else:
+            buckets.add(bucket)
+            keep.append(ver)
+    return sorted(keep), sorted(drop)
+
+
+async def load_version_chain(pid, ver):
+    """버전의 매니페스트 체인을 확보하여 반환 (기존 tar 포맷 버전이면 None)"""
+    if (pid, ver) in legacy_versions:
+        return None
+    cache_path = ccp_store.manifest_cache_path(pid, ver)
+    if not os.path.exists(cache_path):
+        download_path = ccp.work_path(f"{pid}_{ver}.ccp")
+        await ccp_transport.transport.download("ccp", {"pid": pid, "ver": ver}, download_path)
+        if not ccp_store.is_manifest(download_path):
+            os.remove(download_path)
+            legacy_versions.add((pid, ver))
+            return None
+        ccp_store.cache_manifest(pid, ver, download_path)
+        os.remove(download_path)
+    manifest = await ccp_job.run_blocking(ccp_store.read_manifest, cache_path, ccp.key)
+    return await ccp.fetch_manifest_chain(pid, manifest)
+
+
+def chain_versions(chain):
+    """체인이 기준으로 참조하는 버전 번호 목록"""
+    return [manifest["base"] for manifest in chain if manifest.get("kind", "full") == "delta"]
+
+
+def compact_version(pid, ver, chain):
+    """델타 버전을 전체 매니페스트로 다시 기록하고 Storage 서버에 업로드 (필요한 객체는 미리 로컬에 있어야 함)"""
+    resolved = ccp_store.resolve_chain(chain)
+    staging_dir = ccp.work_path(f"{pid}_objects")
+    codec_id = ccp_stream.resolve_codec(ccp.CCP_CODEC)
+    manifest, new_digests = ccp_store.stage_full_manifest(pid, resolved, staging_dir, ccp.key, codec_id)
+    if chain[-1].get("fingerprint"):
+        manifest["fingerprint"] = chain[-1]["fingerprint"]
+    manifest_path = ccp.work_path(f"{pid}.ccp")
+    ccp_store.write_manifest(manifest, manifest_path, ccp.key)
+    ccp.upload_ccp_objects(pid)
+    ccp_transport.transport.upload("ccp", pid, f"{pid}_{ver}.ccp", manifest_path)
+    ccp_store.cache_manifest(pid, ver, manifest_path)
+    os.remove(manifest_path)
+    logger.info(f"Version {ver} of PID {pid} compacted into a full manifest ({len(new_digests)} objects materialized)")
+    return manifest
+
+
+def forget_history(pid, drop):
+    """정리된 버전을 히스토리 목록에서 제외하고 DB의 히스토리 행을 삭제
+
+    pruned 목록에 먼저 기록하므로 DB 삭제가 실패해도 정리된 버전은 목록과 복원 대상에서 제외되며,
+    삭제 실패는 예외로 작업을 중단시켜 Storage 서버의 파일은 삭제하지 않는다.
+    """
+    ccp_store.forget_versions(pid, drop)
+    try:
+        deleted = batch_DB.delete_history_versions(pid, drop)
+    finally:
+        ccp.invalidate_version_index(pid)
+    if deleted != len(drop):
+        logger.warning(f"Expected to delete {len(drop)} history rows of PID {pid}, deleted {deleted}")
+
+
+async def run_project_retention(pid):
+    """프로젝트 하나의 버전 히스토리에 보존 정책을 적용 (ccp_job 작업으로 실행)"""
+    ccp_job.set_step(1, "Selecting versions to keep")
+    index = await ccp_job.run_blocking(ccp.load_version_index, pid, True)
+    keep, drop = select_versions(index["history"])
+    if not drop:
+        return {"RESULT_CODE": 200, "RESULT_MSG": "Nothing to prune", "PAYLOAD": {"kept": len(keep), "pruned": 0}}
+    latest = ccp_store.latest_version(pid)
+    if latest is not None and latest not in keep:
+        # 다음 델타 저장의 기준 버전은 히스토리와 관계없이 보존
+        if latest in drop:
+            drop.remove(latest)
+        keep.append(latest)
+        keep.sort()
+    logger.info(f"Retention for PID {pid}: keeping {len(keep)} versions, pruning {len(drop)}")
+
+    # 정리할 버전의 체인을 먼저 확보 (남은 버전과 공유하지 않는 객체를 찾기 위해 사용)
+    ccp_job.set_step(2, "Loading version manifests")
+    dropped_objects = set()
+    for ver in drop:
+        try:
+            chain = await load_version_chain(pid, ver)
+        except Exception as e:
+            logger.warning(f"Failed to load manifest of pruned version {ver} for PID {pid}, its objects are kept: {e}")
+            continue
+        if chain is not None:
+            dropped_objects |= ccp_store.referenced_objects(ccp_store.resolve_chain(chain))
+
+    # 정리된 버전을 기준으로 하는 버전은 전체 매니페스트로 다시 기록
+    # (오래된 순으로 처리하므로 이후 버전은 이미 다시 기록된 버전까지만 체인을 따라감)
+    ccp_job.set_step(3, "Compacting surviving versions")
+    kept_objects = set()
+    compacted = []
+    for ver in keep:
+        chain = await load_version_chain(pid, ver)
+        if chain is None:
+            continue
+        if any(base not in keep for base in chain_versions(chain)):
+            resolved = ccp_store.resolve_chain(chain)
+            missing = ccp_store.missing_objects(pid, resolved)
+            await ccp_transport.transport.download_many("object", [({"pid": pid, "name": digest}, ccp_store.object_path(pid, digest)) for digest in missing])
+            chain = [await ccp_job.run_blocking(compact_version, pid, ver, chain)]
+            compacted.append(ver)
+        kept_objects |= ccp_store.referenced_objects(ccp_store.resolve_chain(chain))
+
+    # 목록에서 먼저 제외한 뒤 파일을 삭제하므로, 중간에 실패해도 복원할 수 없는 버전이 목록에 남지 않음
+    ccp_job.set_step(4, "Removing pruned versions")
+    await ccp_job.run_blocking(forget_history, pid, drop)
+    await ccp_job.run_blocking(ccp_transport.transport.delete_many, "ccp", pid, [f"{pid}_{ver}.ccp" for ver in drop])
+    garbage = sorted(dropped_objects - kept_objects)
+    await ccp_job.run_blocking(ccp_transport.transport.delete_many, "object", pid, garbage)
+    local_garbage = [digest for digest in await ccp_job.run_blocking(ccp_store.local_objects, pid) if digest not in kept_objects]
+    await ccp_job.run_blocking(ccp_store.remove_objects, pid, local_garbage)
+    logger.info(f"Retention for PID {pid} done: {len(drop)} versions pruned, {len(compacted)} compacted, "
+                f"{len(garbage)} objects removed from Storage Server, {len(local_garbage)} from local store")
+    return {
+        "RESULT_CODE": 200,
+        "RESULT_MSG": f"Pruned {len(drop)} versions",
+        "PAYLOAD": {"kept": len(keep), "pruned": len(drop), "compacted": compacted, "objects_removed": len(garbage)}
+    }
+
+
+def stored_projects():
+    """로컬 CCP 저장소에 기록된 프로젝트 번호 목록"""
+    if not os.path.isdir(ccp_store.STORE_ROOT):
+        return []
+    return sorted(int(name) for name in os.listdir(ccp_store.STORE_ROOT) if name.isdigit())
+
+
+async def run_retention_cycle():
+    """모든 프로젝트에 보존 정책을 적용 (다른 worker가 실행 중이면 건너뜀)"""
+    os.makedirs(ccp_job.LOCK_DIR, exist_ok=True)
+    fd = os.open(RETENTION_LOCK, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        logger.info("CCP retention cycle is already running in another worker")
+        return
+    try:
+        for pid in stored_projects():
+            try:
+                await ccp_job.run("retention", pid, lambda pid=pid: run_project_retention(pid), total_steps=RETENTION_STEPS)
+            except Exception as e:
+                logger.warning(f"CCP retention failed for PID {pid}: {e}")
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+async def retention_loop():
+    while True:
+        await asyncio.sleep(RETENTION_INTERVAL)
+        try:
+            await run_retention_cycle()
+        except Exception as e:
+            logger.error(f"CCP retention cycle failed: {e}", exc_info=True)
+
+
+def start_scheduler():
+    """서버 시작 시 보존 정책 스케줄러를 백그라운드 Task로 실행"""
+    global scheduler_task
+    if RETENTION_INTERVAL <= 0 or scheduler_task is not None:
+        return
+    scheduler_task = asyncio.create_task(retention_loop())
+    logger.info(f"CCP retention scheduler started (interval {RETENTION_INTERVAL}s)")
@@ -0,0 +1,578 @@
+"""
+   CodeCraft PMS Backend Project
+
+   파일명   : ccp_store.py
+   생성자   : 김창환
+
+   생성일   : 2026/10/18
+   업데이트 : 2026/10/18
+
+   설명     : CCP 버전의 콘텐츠 주소 기반(중복 제거) 객체 저장소 정의
+"""
+
+from logger import logger
+import os, json, shutil, hashlib
+import ccp_stream
+import ccp_transport
+
+# 저장소 구조
+#   /data/ccp_store/{pid}/objects/{hash[:2]}/{hash}  : 파일 단위로 암호화된 객체 (SHA-256 기준, 업로드 완료분)
+#   /data/ccp_store/{pid}/manifests/{ver}.ccp        : 버전별 매니페스트 사본 (델타 체인 복원용)
+#   /data/ccp_store/{pid}/base/{hash}                : 최신 버전 DATABASE CSV 사본 (델타 계산용, 업로드하지 않음)
+#   /data/ccp_store/{pid}/latest                     : 로컬에 기록된 최신 버전 번호와 히스토리 행 식별 값
+#   /data/ccp_store/{pid}/fingerprints.json          : 버전별 프로젝트 상태 fingerprint와 히스토리 행 식별 값 (Import 백업 생략 판단용)
+#   /data/ccp_store/{pid}/pruned.json                : 보존 정책(ccp_retention)으로 정리된 버전 번호 목록
+# 버전 파일({pid}_{ver}.ccp)은 tar 대신 매니페스트(경로 → 객체 해시)만 담고,
+# 이전 버전에서 이미 업로드된 객체는 다시 저장하거나 업로드하지 않는다.
+# 델타 매니페스트는 기준 버전(base) 대비 변경된 파일만 기록하며, DATABASE CSV는
+# 변경된 행만 담은 패치 객체로 저장한다. CCP_FULL_INTERVAL 번째마다 전체 매니페스트를 만들어
+# 복원 시 적용해야 하는 델타 체인의 길이를 제한한다.
+# 히스토리를 삭제하면 버전 번호가 다시 1부터 시작하므로, fingerprint와 델타 기준 버전은 기록할 때의
+# 히스토리 행 식별 값(history_row_key)이 현재 히스토리의 같은 버전 행과 일치할 때만 사용한다.
+STORE_ROOT = "/data/ccp_store"
+MANIFEST_FORMAT = 1
+HASH_BUFFER_SIZE = 1024 * 1024
+PATCH_FORMAT = 1
+HEAD_SIZE = len(ccp_stream.MANIFEST_MAGIC)  # 버전 파일 포맷(매니페스트/tar) 확인에 필요한 앞부분 크기
+
+
+def object_dir(pid):
+    return os.path.join(STORE_ROOT, str(pid), "objects")
+
+
+def manifest_cache_path(pid, ver):
+    return os.path.join(STORE_ROOT, str(pid), "manifests", f"{ver}.ccp")
+
+
+def base_path(pid, digest):
+    return os.path.join(STORE_ROOT, str(pid), "base", digest)
+
+
+def object_path(pid, digest, root=None):
+    return os.path.join(root or object_dir(pid), digest[:2], digest)
+
+
+def has_object(pid, digest):
+    return os.path.exists(object_path(pid, digest))
+
+
+def hash_file(file_path):
+    """파일의 SHA-256 해시를 고정 크기 버퍼로 계산"""
+    sha = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BUFFER_SIZE), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def build_manifest(pid, source_dir):
+    """프로젝트 폴더의 파일 목록과 각 파일의 해시로 매니페스트를 생성"""
+    files = []
+    for root, dirs, names in os.walk(source_dir):
+        dirs.sort()
+        for name in sorted(names):
+            file_path = os.path.join(root, name)
+            files.append({
+                "path": os.path.relpath(file_path, source_dir),
+                "hash": hash_file(file_path),
+                "size": os.path.getsize(file_path)
+            })
+    return {"format": MANIFEST_FORMAT, "pid": pid, "kind": "full", "depth": 0, "files": files}
+
+
+def state_fingerprint(manifest):
+    """전체 매니페스트의 (경로, 해시) 목록으로 프로젝트 상태 fingerprint를 계산"""
+    sha = hashlib.sha256()
+    for entry in sorted(manifest["files"], key=lambda entry: entry["path"]):
+        sha.update(f"{entry['path']}\0{entry['hash']}\n".encode("utf-8"))
+    return sha.hexdigest()
+
+
+def history_row_key(record):
+    """히스토리 행 식별 값 (번호가 다시 사용된 버전과 구분하기 위해 저장 시각을 사용, 없으면 None)"""
+    if not record or not record.get("date"):
+        return None
+    return str(record["date"])
+
+
+def _same_row(row, record):
+    return row is not None and row == history_row_key(record)
+
+
+def _fingerprints_path(pid):
+    return os.path.join(STORE_ROOT, str(pid), "fingerprints.json")
+
+
+def load_fingerprints(pid):
+    """기록된 버전별 fingerprint ({버전: {"fingerprint", "row"}}; 행 식별 값이 없는 기존 기록은 row가 None)"""
+    try:
+        with open(_fingerprints_path(pid), "r", encoding="utf-8") as f:
+            return {int(ver): value if isinstance(value, dict) else {"fingerprint": value, "row": None}
+                    for ver, value in json.load(f).items()}
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _save_fingerprints(pid, fingerprints):
+    path = _fingerprints_path(pid)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump({str(ver): value for ver, value in sorted(fingerprints.items())}, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def find_fingerprint(pid, fingerprint, versions):
+    """fingerprint가 같은 가장 최근 버전 번호 (없으면 None)
+
+    versions는 현재 히스토리({버전: 히스토리 행})이며, 기록 당시의 행과 같은 행이 남아 있는 버전만 인정한다.
+    """
+    matches = [ver for ver, value in load_fingerprints(pid).items()
+               if value["fingerprint"] == fingerprint and _same_row(value["row"], versions.get(ver))]
+    return max(matches, default=None)
+
+
+def _record_fingerprint(pid, ver, fingerprint, row):
+    fingerprints = load_fingerprints(pid)
+    fingerprints[int(ver)] = {"fingerprint": fingerprint, "row": row}
+    _save_fingerprints(pid, fingerprints)
+
+
+def _pruned_path(pid):
+    return os.path.join(STORE_ROOT, str(pid), "pruned.json")
+
+
+def load_pruned(pid):
+    """보존 정책으로 정리된 버전 번호 집합"""
+    try:
+        with open(_pruned_path(pid), "r", encoding="utf-8") as f:
+            return {int(ver) for ver in json.load(f)}
+    except (FileNotFoundError, ValueError):
+        return set()
+
+
+def forget_versions(pid, versions):
+    """정리된 버전을 pruned 목록에 기록하고, 해당 버전의 fingerprint와 매니페스트 사본을 제거"""
+    versions = {int(ver) for ver in versions}
+    path = _pruned_path(pid)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(sorted(load_pruned(pid) | versions), f)
+    os.replace(f"{path}.tmp", path)
+    fingerprints = load_fingerprints(pid)
+    if any(ver in fingerprints for ver in versions):
+        _save_fingerprints(pid, {ver: value for ver, value in fingerprints.items() if ver not in versions})
+    for ver in versions:
+        if os.path.exists(manifest_cache_path(pid, ver)):
+            os.remove(manifest_cache_path(pid, ver))
+
+
+def remove_project(pid):
+    """히스토리가 모두 삭제된 프로젝트의 저장소 전체 삭제
+
+    버전 번호가 다시 1부터 시작하므로 최신 버전, fingerprint, 매니페스트 사본, 델타 기준 CSV, pruned 목록이
+    새 버전과 섞이지 않도록 모두 제거한다. (객체는 다음 저장 시 다시 업로드됨)
+    받는 중이던 버전 파일도 같은 이름의 새 버전에 이어받지 않도록 함께 삭제한다.
+    """
+    shutil.rmtree(os.path.join(STORE_ROOT, str(pid)), ignore_errors=True)
+    ccp_transport.remove_parts(pid)
+
+
+def _write_object(src_path, dst_path, key, codec):
+    os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+    tmp_path = f"{dst_path}.tmp"
+    with open(src_path, "rb") as src, open(tmp_path, "wb") as dst:
+        with ccp_stream.CCPStreamWriter(dst, key, codec=codec) as writer:
+            shutil.copyfileobj(src, writer, ccp_stream.DEFAULT_CHUNK_SIZE)
+    os.replace(tmp_path, dst_path)
+
+
+def stage_new_objects(pid, source_dir, manifest, staging_dir, key, codec=ccp_stream.CODEC_GZIP):
+    """저장소에 없는 객체만 암호화하여 staging 폴더에 기록하고, 새 객체 해시 목록을 반환"""
+    new_digests = []
+    seen = set()
+    for entry in manifest["files"]:
+        digest = entry["hash"]
+        if digest in seen or has_object(pid, digest):
+            continue
+        seen.add(digest)
+        _write_object(os.path.join(source_dir, entry["path"]), object_path(pid, digest, staging_dir), key, codec)
+        new_digests.append(digest)
+    logger.info(f"CCP store for PID {pid}: {len(manifest['files'])} files, {len(new_digests)} new objects")
+    return new_digests
+
+
+def commit_objects(pid, staging_dir, digests):
+    """업로드가 끝난 staging 객체를 저장소로 이동"""
+    for digest in digests:
+        dst_path = object_path(pid, digest)
+        os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+        # staging 폴더가 tmpfs 등 다른 파일시스템에 있을 수 있으므로 임시 파일로 복사 후 교체
+        shutil.move(object_path(pid, digest, staging_dir), f"{dst_path}.tmp")
+        os.replace(f"{dst_path}.tmp", dst_path)
+
+
+def split_csv_records(data):
+    """CSV 데이터를 레코드 단위로 분리 (따옴표 안의 줄바꿈은 레코드 경계로 보지 않음)"""
+    records = []
+    start = 0
+    scan = 0
+    quotes = 0
+    while True:
+        pos = data.find(b"\n", scan)
+        if pos == -1:
+            break
+        quotes += data.count(b'"', scan, pos)
+        scan = pos + 1
+        if quotes % 2 == 0:
+            records.append(data[start:scan])
+            start = scan
+            quotes = 0
+    if start < len(data):
+        records.append(data[start:])
+    return records
+
+
+def make_csv_patch(base_data, data):
+    """기준 CSV 대비 현재 CSV를 재구성하는 패치 생성
+
+    ops의 각 항목은 [시작, 개수](기준 CSV 레코드 복사) 또는 문자열(새 레코드)이며,
+    적용 결과는 현재 CSV와 바이트 단위로 동일하다.
+    """
+    positions = {}
+    for index, record in enumerate(split_csv_records(base_data)):
+        positions.setdefault(record, []).append(index)
+    for queue in positions.values():
+        queue.reverse()
+    ops = []
+    for record in split_csv_records(data):
+        queue = positions.get(record)
+        if queue:
+            index = queue.pop()
+            last = ops[-1] if ops else None
+            if isinstance(last, list) and last[0] + last[1] == index:
+                last[1] += 1
+            else:
+                ops.append([index, 1])
+        else:
+            ops.append(record.decode("utf-8", "surrogateescape"))
+    return {"format": PATCH_FORMAT, "ops": ops}
+
+
+def apply_csv_patch(base_data, patch):
+    """make_csv_patch로 만든 패치를 기준 CSV에 적용"""
+    if patch.get("format") != PATCH_FORMAT:
+        raise Exception(f"Unsupported CSV patch format: {patch.get('format')}")
+    base_records = split_csv_records(base_data)
+    parts = []
+    for op in patch["ops"]:
+        if isinstance(op, list):
+            parts.extend(base_records[op[0]:op[0] + op[1]])
+        else:
+            parts.append(op.encode("utf-8", "surrogateescape"))
+    return b"".join(parts)
+
+
+def _encrypt_bytes(data, dst_path, key, codec):
+    os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+    tmp_path = f"{dst_path}.tmp"
+    with open(tmp_path, "wb") as dst:
+        with ccp_stream.CCPStreamWriter(dst, key, codec=codec) as writer:
+            writer.write(data)
+    os.replace(tmp_path, dst_path)
+
+
+def _decrypt_bytes(src_path, key):
+    with open(src_path, "rb") as src:
+        return ccp_stream.CCPStreamReader(src, key).read()
+
+
+def write_manifest(manifest, file_path, key):
+    """매니페스트를 암호화하여 CCP 파일로 기록"""
+    with open(file_path, "wb") as f:
+        with ccp_stream.CCPStreamWriter(f, key, codec=ccp_stream.CODEC_GZIP, magic=ccp_stream.MANIFEST_MAGIC) as writer:
+            writer.write(json.dumps(manifest, ensure_ascii=False).encode("utf-8"))
+
+
+def read_manifest(file_path, key):
+    """매니페스트 CCP 파일을 복호화하여 반환"""
+    with open(file_path, "rb") as f:
+        reader = ccp_stream.CCPStreamReader(f, key)
+        if reader.magic != ccp_stream.MANIFEST_MAGIC:
+            raise Exception(f"{file_path} is not a CCP manifest")
+        manifest = json.loads(reader.read().decode("utf-8"))
+    if manifest.get("format") != MANIFEST_FORMAT:
+        raise Exception(f"Unsupported CCP manifest format: {manifest.get('format')}")
+    return manifest
+
+
+def is_manifest(file_path):
+    return ccp_stream.read_magic(file_path) == ccp_stream.MANIFEST_MAGIC
+
+
+def is_manifest_head(data):
+    """파일 앞부분(HEAD_SIZE바이트)이 매니페스트 CCP의 헤더인지 확인"""
+    return data[:HEAD_SIZE] == ccp_stream.MANIFEST_MAGIC
+
+
+def cache_manifest(pid, ver, file_path):
+    """업로드하거나 내려받은 버전 매니페스트를 델타 체인 복원용으로 보관"""
+    cache_path = manifest_cache_path(pid, ver)
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    shutil.copyfile(file_path, f"{cache_path}.tmp")
+    os.replace(f"{cache_path}.tmp", cache_path)
+
+
+def _load_latest(pid):
+    """로컬에 기록된 최신 버전 ({"ver", "row"}; 행 식별 값이 없는 기존 기록은 row가 None, 없으면 None)"""
+    try:
+        with open(os.path.join(STORE_ROOT, str(pid), "latest"), "r") as f:
+            data = f.read().strip()
+    except FileNotFoundError:
+        return None
+    try:
+        latest = json.loads(data)
+        return latest if isinstance(latest, dict) else {"ver": int(latest), "row": None}
+    except ValueError:
+        return None
+
+
+def latest_version(pid):
+    """로컬에 기록된 최신 버전 번호 (없으면 None)"""
+    latest = _load_latest(pid)
+    return int(latest["ver"]) if latest else None
+
+
+def latest_base(pid, versions):
+    """델타 기준으로 사용할 수 있는 최신 버전 번호 (기록 당시의 히스토리 행이 versions에 그대로 있을 때만, 아니면 None)"""
+    latest = _load_latest(pid)
+    if latest is None or not _same_row(latest["row"], versions.get(int(latest["ver"]))):
+        return None
+    return int(latest["ver"])
+
+
+def load_chain(pid, manifest, key):
+    """델타 매니페스트부터 기준 버전을 따라가 전체 매니페스트까지의 체인을 반환 (오래된 순)"""
+    chain = [manifest]
+    while chain[0].get("kind", "full") == "delta":
+        cache_path = manifest_cache_path(pid, chain[0]["base"])
+        if not os.path.exists(cache_path):
+            raise Exception(f"Base manifest for version {chain[0]['base']} is not cached")
+        chain.insert(0, read_manifest(cache_path, key))
+    return chain
+
+
+def resolve_chain(chain):
+    """매니페스트 체인을 적용하여 최종 파일 목록과 CSV 패치 정보를 계산"""
+    files = {}
+    patches = {}
+    for manifest in chain:
+        if manifest.get("kind", "full") == "full":
+            files = {}
+        for path in manifest.get("removed", []):
+            files.pop(path, None)
+        for entry in manifest["files"]:
+            files[entry["path"]] = entry
+            if "patch" in entry:
+                patches[entry["hash"]] = entry["patch"]
+    return {"files": [files[path] for path in sorted(files)], "patches": patches, "depth": chain[-1].get("depth", 0)}
+
+
+def _required_objects(pid, digest, patches):
+    needed = []
+    while not has_object(pid, digest):
+        patch = patches.get(digest)
+        if patch is None:
+            needed.append(digest)
+            break
+        if not has_object(pid, patch["object"]):
+            needed.append(patch["object"])
+        digest = patch["base"]
+    return needed
+
+
+def missing_objects(pid, manifest):
+    """로컬 저장소에 없어 Storage 서버에서 받아와야 하는 객체 해시 목록"""
+    patches = manifest.get("patches", {})
+    needed = set()
+    for entry in manifest["files"]:
+        needed.update(_required_objects(pid, entry["hash"], patches))
+    return sorted(needed)
+
+
+def read_content(pid, digest, patches, key):
+    """객체 또는 CSV 패치 체인으로부터 파일 내용을 복원"""
+    if has_object(pid, digest):
+        return _decrypt_bytes(object_path(pid, digest), key)
+    patch = patches.get(digest)
+    if patch is None:
+        raise Exception(f"Object {digest} is missing from the CCP store")
+    base_data = read_content(pid, patch["base"], patches, key)
+    return apply_csv_patch(base_data, json.loads(_decrypt_bytes(object_path(pid, patch["object"]), key)))
+
+
+def restore_file(pid, entry, target_path, key, patches=None):
+    """객체 하나를 복호화하여 target_path에 기록하고 해시를 검증"""
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    sha = hashlib.sha256()
+    if has_object(pid, entry["hash"]):
+        with open(object_path(pid, entry["hash"]), "rb") as src, open(target_path, "wb") as dst:
+            reader = ccp_stream.CCPStreamReader(src, key)
+            for block in iter(lambda: reader.read(ccp_stream.DEFAULT_CHUNK_SIZE), b""):
+                sha.update(block)
+                dst.write(block)
+    else:
+        data = read_content(pid, entry["hash"], patches or {}, key)
+        sha.update(data)
+        with open(target_path, "wb") as dst:
+            dst.write(data)
+    if sha.hexdigest() != entry["hash"]:
+        raise Exception(f"Hash mismatch while restoring {entry['path']}")
+
+
+def restore_manifest(pid, manifest, output_dir, key):
+    """매니페스트(또는 resolve_chain 결과)에 기록된 모든 파일을 저장소 객체로부터 복원"""
+    output_root = os.path.realpath(output_dir)
+    patches = manifest.get("patches", {})
+    for entry in manifest["files"]:
+        target_path = os.path.join(output_dir, entry["path"])
+        if not os.path.realpath(target_path).startswith(output_root + os.sep):
+            logger.warning(f"Skipping manifest entry outside of output directory: {entry['path']}")
+            continue
+        restore_file(pid, entry, target_path, key, patches)
+    logger.info(f"Restored {len(manifest['files'])} files for PID {pid} from CCP store")
+
+
+def referenced_objects(manifest):
+    """resolve_chain 결과가 복원에 사용할 수 있는 모든 객체 해시 (패치 체인의 기준 객체 포함)"""
+    patches = manifest.get("patches", {})
+    referenced = set()
+    for entry in manifest["files"]:
+        digest = entry["hash"]
+        while digest not in referenced:
+            referenced.add(digest)
+            patch = patches.get(digest)
+            if patch is None:
+                break
+            referenced.add(patch["object"])
+            digest = patch["base"]
+    return referenced
+
+
+def stage_full_manifest(pid, resolved, staging_dir, key, codec=ccp_stream.CODEC_GZIP):
+    """resolve_chain 결과를 기준 버전 없이 복원 가능한 전체 매니페스트로 변환
+
+    CSV 패치로만 존재하는 파일은 내용을 복원하여 전체 객체로 staging 폴더에 기록한다.
+    """
+    files = []
+    new_digests = []
+    for entry in resolved["files"]:
+        entry = {field: entry[field] for field in ("path", "hash", "size")}
+        if not has_object(pid, entry["hash"]) and entry["hash"] not in new_digests:
+            data = read_content(pid, entry["hash"], resolved["patches"], key)
+            _encrypt_bytes(data, object_path(pid, entry["hash"], staging_dir), key, codec)
+            new_digests.append(entry["hash"])
+        files.append(entry)
+    manifest = {"format": MANIFEST_FORMAT, "pid": pid, "kind": "full", "depth": 0, "files": files}
+    return manifest, new_digests
+
+
+def local_objects(pid):
+    """로컬 저장소에 있는 객체 해시 목록"""
+    root = object_dir(pid)
+    if not os.path.isdir(root):
+        return []
+    return [name for _, _, names in os.walk(root) for name in names if not name.endswith(".tmp")]
+
+
+def remove_objects(pid, digests):
+    """로컬 저장소에서 객체 삭제"""
+    for digest in digests:
+        if has_object(pid, digest):
+            os.remove(object_path(pid, digest))
+
+
+def _is_database_csv(path):
+    return path.startswith("DATABASE/") and path.endswith(".csv")
+
+
+def _load_base_csv(pid, digest, patches, key):
+    """델타 계산에 사용할 기준 CSV 내용 (로컬에서 구할 수 없으면 None)"""
+    try:
+        if os.path.exists(base_path(pid, digest)):
+            return _decrypt_bytes(base_path(pid, digest), key)
+        return read_content(pid, digest, patches, key)
+    except Exception as e:
+        logger.warning(f"Base CSV {digest} for PID {pid} is not available locally: {e}")
+        return None
+
+
+def stage_delta_objects(pid, source_dir, manifest, base_ver, staging_dir, key, codec=ccp_stream.CODEC_GZIP):
+    """기준 버전 대비 변경분만 담은 델타 매니페스트를 만들고, 필요한 새 객체를 staging 폴더에 기록"""
+    base = resolve_chain(load_chain(pid, read_manifest(manifest_cache_path(pid, base_ver), key), key))
+    base_files = {entry["path"]: entry for entry in base["files"]}
+    changed = []
+    new_digests = []
+    seen = set()
+
+    def stage(digest, write):
+        if digest in seen or has_object(pid, digest):
+            return
+        seen.add(digest)
+        write(object_path(pid, digest, staging_dir))
+        new_digests.append(digest)
+
+    for entry in manifest["files"]:
+        base_entry = base_files.get(entry["path"])
+        if base_entry and base_entry["hash"] == entry["hash"]:
+            continue
+        src_path = os.path.join(source_dir, entry["path"])
+        if base_entry and _is_database_csv(entry["path"]) and not has_object(pid, entry["hash"]):
+            base_data = _load_base_csv(pid, base_entry["hash"], base["patches"], key)
+            if base_data is not None:
+                with open(src_path, "rb") as f:
+                    data = f.read()
+                patch_data = json.dumps(make_csv_patch(base_data, data)).encode("utf-8")
+                # 변경 행이 많아 패치가 원본보다 크면 전체 파일 객체로 저장
+                if len(patch_data) < len(data):
+                    patch_digest = hashlib.sha256(patch_data).hexdigest()
+                    stage(patch_digest, lambda dst: _encrypt_bytes(patch_data, dst, key, codec))
+                    changed.append(dict(entry, patch={"base": base_entry["hash"], "object": patch_digest}))
+                    continue
+        stage(entry["hash"], lambda dst: _write_object(src_path, dst, key, codec))
+        changed.append(entry)
+    current_paths = {entry["path"] for entry in manifest["files"]}
+    delta = {
+        "format": MANIFEST_FORMAT,
+        "pid": pid,
+        "kind": "delta",
+        "base": base_ver,
+        "depth": base["depth"] + 1,
+        "files": changed,
+        "removed": sorted(path for path in base_files if path not in current_paths)
+    }
+    logger.info(f"CCP delta for PID {pid} against version {base_ver}: {len(changed)} changed, "
+                f"{len(delta['removed'])} removed, {len(new_digests)} new objects")
+    return delta, new_digests
+
+
+def record_version(pid, ver, manifest_file_path, source_dir, key, row=None):
+    """업로드가 끝난 버전을 최신 버전으로 기록하고, 다음 델타 계산을 위한 CSV 사본을 갱신
+
+    row는 버전의 히스토리 행 식별 값(history_row_key)이다.
+    """
+    cache_manifest(pid, ver, manifest_file_path)
+    fingerprint = read_manifest(manifest_file_path, key).get("fingerprint")
+    if fingerprint:
+        _record_fingerprint(pid, ver, fingerprint, row)
+    base_dir = os.path.dirname(base_path(pid, "x"))
+    shutil.rmtree(base_dir, ignore_errors=True)
+    database_dir = os.path.join(source_dir, "DATABASE")
+    if os.path.isdir(database_dir):
+        for name in os.listdir(database_dir):
+            if name.endswith(".csv"):
+                file_path = os.path.join(database_dir, name)
+                _write_object(file_path, base_path(pid, hash_file(file_path)), key, ccp_stream.CODEC_GZIP)
+    latest_path = os.path.join(STORE_ROOT, str(pid), "latest")
+    with open(f"{latest_path}.tmp", "w") as f:
+        json.dump({"ver": int(ver), "row": row}, f)
+    os.replace(f"{latest_path}.tmp", latest_path)
@@ -0,0 +1,326 @@
+"""
+   CodeCraft PMS Backend Project
+
+   파일명   : ccp_stream.py
+   생성자   : 김창환
+
+   생성일   : 2026/10/18
+   업데이트 : 2026/10/18
+
+   설명     : CCP 파일의 청크 단위 스트리밍 암호화/복호화 컨테이너 정의
+"""
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.hazmat.primitives import hashes
+from concurrent.futures import ThreadPoolExecutor
+import os, struct, base64, zlib, queue, asyncio
+
+try:
+    import zstandard  # 선택 의존성; 설치되지 않은 경우 zstd 코덱만 비활성화
+except ImportError:
+    zstandard = None
+
+# CCP 스트리밍 포맷 구조
+#   [MAGIC 4B][VERSION 1B][CODEC 1B][CHUNK_SIZE 4B][NONCE_PREFIX 7B]
+#   ([CHUNK_LEN 4B; 최상위 비트는 마지막 청크 표시][AES-GCM 암호문 + TAG 16B]) * N
+# 각 청크의 nonce는 NONCE_PREFIX + 청크 번호(4B) + 마지막 청크 여부(1B)로 구성되므로
+# 청크의 순서 변경, 누락, 잘림이 모두 복호화 단계에서 검출된다.
+# CODEC이 none이 아니면 각 청크는 독립적으로 압축되며, 평문 맨 앞 1바이트가
+# 압축 여부(1: 압축, 0: 원본 저장)를 나타낸다. 청크끼리 의존성이 없으므로 병렬 처리가 가능하다.
+CCP_MAGIC = b"CCP2"  # 평문이 프로젝트 tar 스트림인 CCP
+MANIFEST_MAGIC = b"CCPM"  # 평문이 버전 매니페스트(JSON)인 CCP
+CCP_FORMAT_VERSION = 1
+CODEC_NONE = 0
+CODEC_GZIP = 1  # 청크별 deflate(zlib) 프레임
+CODEC_ZSTD = 2  # 청크별 zstd 프레임 (zstandard 패키지 필요)
+CODECS = {"none": CODEC_NONE, "gzip": CODEC_GZIP, "zstd": CODEC_ZSTD}
+DEFAULT_CHUNK_SIZE = 1024 * 1024  # 1 MiB; 메모리에 동시에 올라가는 평문 최대 크기
+HEADER_FORMAT = "!4sBBI7s"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+TAG_SIZE = 16
+LAST_CHUNK_FLAG = 0x80000000
+
+
+def derive_stream_key(fernet_key):
+    """Fernet 키(CCP_KEY)로부터 AES-GCM 스트림 암호화용 키를 유도"""
+    if isinstance(fernet_key, str):
+        fernet_key = fernet_key.encode()
+    raw_key = base64.urlsafe_b64decode(fernet_key)
+    return HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=b"codecraft-ccp-stream").derive(raw_key)
+
+
+def read_magic(file_path):
+    """CCP 파일의 앞 4바이트(포맷 식별자)를 반환"""
+    with open(file_path, "rb") as f:
+        return f.read(len(CCP_MAGIC))
+
+
+def is_stream_format(file_path):
+    """CCP 파일이 tar 스트리밍 포맷인지 확인 (구 포맷은 파일 개수 4바이트로 시작)"""
+    return read_magic(file_path) == CCP_MAGIC
+
+
+def _nonce(prefix, index, last):
+    return prefix + struct.pack("!IB", index, 1 if last else 0)
+
+
+def resolve_codec(name):
+    """코덱 이름(none/gzip/zstd)을 헤더에 기록할 코덱 번호로 변환"""
+    if name not in CODECS:
+        raise Exception(f"Unknown CCP codec: {name}")
+    if CODECS[name] == CODEC_ZSTD and zstandard is None:
+        raise Exception("zstd codec requires the zstandard package")
+    return CODECS[name]
+
+
+def _compress(codec, data, level):
+    if codec == CODEC_GZIP:
+        return zlib.compress(data, level)
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    raise Exception(f"Unknown CCP codec: {codec}")
+
+
+def _decompress(codec, data):
+    if codec == CODEC_GZIP:
+        return zlib.decompress(data)
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise Exception("zstd codec requires the zstandard package")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise Exception(f"Unknown CCP codec: {codec}")
+
+
+class CCPStreamWriter:
+    """tarfile 스트림 모드의 fileobj로 사용되는 청크 단위 압축/암호화 writer
+
+    workers가 2 이상이면 최대 workers개의 청크를 모아 스레드 풀에서 병렬로 압축/암호화한다.
+    (zlib, zstd, AES-GCM 모두 처리 중 GIL을 해제) 메모리 사용량은 약 workers * chunk_size로 제한된다.
+    """
+
+    def __init__(self, fileobj, key, chunk_size=DEFAULT_CHUNK_SIZE, codec=CODEC_NONE, level=3, workers=1, magic=CCP_MAGIC):
+        self.fileobj = fileobj
+        self.chunk_size = chunk_size
+        self.codec = codec
+        self.level = level
+        self.workers = max(1, workers)
+        self.aead = AESGCM(derive_stream_key(key))
+        self.prefix = os.urandom(7)
+        self.header = struct.pack(HEADER_FORMAT, magic, CCP_FORMAT_VERSION, codec, chunk_size, self.prefix)
+        self.buffer = bytearray()
+        self.pending = []
+        self.index = 0
+        self.closed = False
+        self.executor = ThreadPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+        self.fileobj.write(self.header)
+
+    def _seal(self, index, data, last):
+        if self.codec != CODEC_NONE:
+            compressed = _compress(self.codec, data, self.level)
+            # 압축 효과가 없는 청크(이미 압축된 docx, pdf 등)는 원본으로 저장
+            data = b"\x01" + compressed if len(compressed) < len(data) else b"\x00" + data
+        return self.aead.encrypt(_nonce(self.prefix, index, last), data, self.header)
+
+    def _drain(self, last=False):
+        if not self.pending:
+            return
+        if self.index + len(self.pending) > 0xFFFFFFFF:
+            raise Exception("CCP stream exceeded the maximum number of chunks")
+        indexes = range(self.index, self.index + len(self.pending))
+        flags = [last and i == len(self.pending) - 1 for i in range(len(self.pending))]
+        if self.executor:
+            tokens = self.executor.map(self._seal, indexes, self.pending, flags)
+        else:
+            tokens = map(self._seal, indexes, self.pending, flags)
+        for token, flag in zip(tokens, flags):
+            self.fileobj.write(struct.pack("!I", len(token) | (LAST_CHUNK_FLAG if flag else 0)))
+            self.fileobj.write(token)
+        self.index += len(self.pending)
+        self.pending = []
+
+    def write(self, data):
+        self.buffer += data
+        while len(self.buffer) > self.chunk_size:
+            self.pending.append(bytes(self.buffer[:self.chunk_size]))
+            del self.buffer[:self.chunk_size]
+            if len(self.pending) >= self.workers:
+                self._drain()
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        """남은 버퍼를 마지막 청크로 기록 (빈 스트림도 마지막 청크 1개를 기록)"""
+        if self.closed:
+            return
+        try:
+            self.pending.append(bytes(self.buffer))
+            self.buffer = bytearray()
+            self._drain(last=True)
+            self.closed = True
+        finally:
+            self._shutdown()
+
+    def _shutdown(self):
+        if self.executor:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._shutdown()
+
+
+class CCPStreamReader:
+    """스트리밍 포맷 CCP 파일을 청크 단위로 복호화하여 읽는 reader"""
+
+    def __init__(self, fileobj, key):
+        self.fileobj = fileobj
+        self.aead = AESGCM(derive_stream_key(key))
+        self.header = fileobj.read(HEADER_SIZE)
+        if len(self.header) < HEADER_SIZE:
+            raise Exception(f"Failed to read CCP stream header, insufficient data. Read {len(self.header)} bytes")
+        self.magic, version, self.codec, self.chunk_size, self.prefix = struct.unpack(HEADER_FORMAT, self.header)
+        if self.magic not in (CCP_MAGIC, MANIFEST_MAGIC):
+            raise Exception("Not a CCP stream file")
+        if version != CCP_FORMAT_VERSION:
+            raise Exception(f"Unsupported CCP stream version: {version}")
+        self.buffer = b""
+        self.offset = 0
+        self.index = 0
+        self.finished = False
+
+    def _next_chunk(self):
+        length_data = self.fileobj.read(4)
+        if len(length_data) < 4:
+            raise Exception("CCP stream is truncated: final chunk is missing")
+        length = struct.unpack("!I", length_data)[0]
+        last = bool(length & LAST_CHUNK_FLAG)
+        length &= ~LAST_CHUNK_FLAG
+        if length < TAG_SIZE or length > self.chunk_size + TAG_SIZE + 1:
+            raise Exception(f"Invalid CCP chunk length: {length}")
+        token = self.fileobj.read(length)
+        if len(token) < length:
+            raise Exception("CCP stream is truncated inside a chunk")
+        data = self.aead.decrypt(_nonce(self.prefix, self.index, last), token, self.header)
+        if self.codec != CODEC_NONE:
+            data = _decompress(self.codec, data[1:]) if data[:1] == b"\x01" else data[1:]
+        self.index += 1
+        self.finished = last
+        return data
+
+    def read(self, size=-1):
+        chunks = []
+        remaining = size
+        while size < 0 or remaining > 0:
+            if self.offset >= len(self.buffer):
+                if self.finished:
+                    break
+                self.buffer = self._next_chunk()
+                self.offset = 0
+                continue
+            end = len(self.buffer) if size < 0 else min(len(self.buffer), self.offset + remaining)
+            chunks.append(self.buffer[self.offset:end])
+            if size >= 0:
+                remaining -= end - self.offset
+            self.offset = end
+        return b"".join(chunks)
+
+
+_END = object()  # StreamPipe 대기열의 종료 표시
+
+
+class StreamPipe:
+    """이벤트 루프에서 받은 데이터를 작업 스레드의 read()로 전달하는 파이프
+
+    다운로드(async)와 tar 추출(작업 스레드)을 겹쳐 실행하기 위해 사용한다.
+    대기열은 max_chunks개로 제한되어 추출이 느리면 다운로드 쪽이 대기한다.
+    읽는 쪽은 대기열에서 blocking으로 기다리며, finish()/abort()가 넣는 종료 표시로 깨어난다.
+    보내는 쪽이 중단되면(오류, 요청 취소) 반드시 abort()를 호출해야 읽는 스레드가 종료된다.
+    """
+
+    def __init__(self, max_chunks=16):
+        self.queue = queue.Queue(max_chunks)
+        self.buffer = b""
+        self.offset = 0
+        self.ended = False
+        self.error = None
+        self.closed = False
+
+    async def _put(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            # 대기열이 가득 차면 작업 스레드에서 자리가 날 때까지 대기 (읽는 쪽이 close()하면 대기열을 비워 깨움)
+            await asyncio.to_thread(self.queue.put, item)
+
+    async def feed(self, data):
+        """데이터를 대기열에 넣는다. (읽는 쪽이 종료되었으면 False 반환)"""
+        if self.closed:
+            return False
+        if data:
+            await self._put(data)
+        return not self.closed
+
+    async def finish(self):
+        """더 이상 보낼 데이터가 없음을 알림"""
+        if not self.closed:
+            await self._put(_END)
+
+    def abort(self, error):
+        """보내는 쪽에서 오류가 발생했음을 알림 (대기 중인 데이터는 버리고, 읽는 쪽의 read()가 예외를 발생)"""
+        self.error = error
+        while True:
+            try:
+                self.queue.put_nowait(_END)
+                return
+            except queue.Full:
+                self._drain()
+
+    def _drain(self):
+        try:
+            while True:
+                self.queue.get_nowait()
+        except queue.Empty:
+            pass
+
+    def _next(self):
+        if self.ended:
+            return b""
+        item = self.queue.get()
+        if self.error is not None:
+            self.ended = True
+            raise Exception(f"Stream aborted: {self.error}")
+        if item is _END:
+            self.ended = True
+            return b""
+        return item
+
+    def read(self, size=-1):
+        chunks = []
+        remaining = size
+        while size < 0 or remaining > 0:
+            if self.offset >= len(self.buffer):
+                self.buffer = self._next()
+                self.offset = 0
+                if not self.buffer:
+                    break
+                continue
+            end = len(self.buffer) if size < 0 else min(len(self.buffer), self.offset + remaining)
+            chunks.append(self.buffer[self.offset:end])
+            if size >= 0:
+                remaining -= end - self.offset
+            self.offset = end
+        return b"".join(chunks)
+
+    def close(self):
+        """읽는 쪽이 종료되었음을 알림 (이후 feed()는 False 반환, 대기 중인 보내는 쪽을 깨움)"""
+        self.closed = True
+        self._drain()
@@ -0,0 +1,342 @@
+"""
+   CodeCraft PMS Backend Project
+
+   파일명   : ccp_transport.py
+   생성자   : 김창환
+
+   생성일   : 2026/10/18
+   업데이트 : 2026/10/18
+
+   설명     : CCP 파일(버전 매니페스트, 저장소 객체)의 Storage 서버 전송 인터페이스 정의
+"""
+
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from logger import logger
+from storage_client import storage, StorageUnavailable
+import os, json, shutil, hashlib, asyncio
+
+# 청크 전송 프로토콜 (Storage 서버)
+#   POST /ccp/chunk_status   (pid, kind, name, size, chunk_size, sha256) → {"received": [이미 받은 청크 번호]}
+#   POST /ccp/chunk_upload   (pid, kind, name, index, sha256, file)       : 청크 하나 업로드 (청크 SHA-256 검증)
+#   POST /ccp/chunk_complete (pid, kind, name, size, chunks, sha256)      : 청크를 합쳐 기존 업로드와 같은 위치에 저장
+# 같은 (pid, kind, name, sha256)로 다시 업로드하면 이미 받은 청크는 건너뛰므로 중단된 위치부터 이어서 전송한다.
+# chunk_status가 404이면 청크 프로토콜을 지원하지 않는 서버로 보고 기존 단일 multipart 업로드를 사용한다.
+# 보존 정책으로 정리된 버전 CCP와 객체는 POST /ccp/delete (pid, kind, name)로 삭제하며, 404는 이미 없는 파일로 본다.
+# 다운로드는 Range 요청으로 청크를 병렬로 받으며, 실패한 청크는 RETRIES번까지 다시 요청한다. 받는 중인 파일과 받은 청크 목록은
+# 작업 공간(작업이 끝나면 삭제됨)이 아닌 PART_DIR/{pid}에 두므로, 다음 작업에서 같은 파일을 받으면 받은 청크는 건너뛰고 이어받는다.
+# 받은 청크 목록에는 파일 크기와 ETag를 함께 기록하여, 둘 중 하나라도 달라진 파일은 이어받지 않고 처음부터 받는다.
+# (CCP 파일은 청크마다 AES-GCM 인증 태그가 있으므로 손상된 다운로드는 복호화 단계에서 검출된다.)
+STORAGE_PREFIX = "/ccp"  # storage_client.STORAGE_URL 기준 CCP API 경로
+CHUNK_SIZE = int(os.getenv('CCP_TRANSFER_CHUNK', str(8 * 1024 * 1024)))  # 청크 전송 단위 (bytes); 이보다 작은 파일은 단일 요청으로 전송
+STREAMS = int(os.getenv('CCP_TRANSFER_STREAMS', '4'))  # 동시에 전송하는 청크(또는 파일) 수
+RETRIES = 3  # 청크 업로드 재개 / 실패한 다운로드 구간 재요청 시도 횟수 (요청 단위 재시도는 storage_client가 처리)
+PART_DIR = os.getenv('CCP_PART_DIR', '/data/ccp/parts')  # 받는 중인 파일(.part)과 받은 청크 목록(.part.json)을 보관하는 경로
+UPLOAD_ENDPOINTS = {"ccp": "pull", "object": "pull_object"}  # 종류별 기존 단일 업로드 엔드포인트
+DOWNLOAD_ENDPOINTS = {"ccp": "push_ccp", "object": "push_object"}  # 종류별 다운로드 엔드포인트
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _hash_file(file_path):
+    sha = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def _read_chunk(file_path, index):
+    with open(file_path, "rb") as f:
+        f.seek(index * CHUNK_SIZE)
+        return f.read(CHUNK_SIZE)
+
+
+class StorageTransport(ABC):
+    """Storage 서버와 CCP 파일을 주고받는 인터페이스
+
+    kind는 "ccp"(버전 매니페스트/CCP 파일) 또는 "object"(저장소 객체),
+    다운로드 params는 Storage 서버 조회 인자 ({"pid", "ver"} 또는 {"pid", "name"})이다.
+    """
+
+    @abstractmethod
+    def upload(self, kind, pid, name, file_path):
+        """파일 하나를 업로드"""
+
+    @abstractmethod
+    async def download(self, kind, params, dst_path):
+        """파일 하나를 dst_path로 다운로드"""
+
+    @abstractmethod
+    def delete(self, kind, pid, name):
+        """파일 하나를 삭제 (없는 파일은 무시)"""
+
+    @abstractmethod
+    async def read_head(self, kind, params, size):
+        """파일 전체를 받지 않고 앞 size바이트만 읽어 반환 (포맷 확인용)"""
+
+    def upload_many(self, kind, pid, items):
+        """(name, file_path) 목록을 최대 STREAMS개씩 병렬 업로드"""
+        with ThreadPoolExecutor(max_workers=STREAMS) as executor:
+            list(executor.map(lambda item: self.upload(kind, pid, *item), items))
+
+    def delete_many(self, kind, pid, names):
+        """name 목록을 최대 STREAMS개씩 병렬 삭제"""
+        with ThreadPoolExecutor(max_workers=STREAMS) as executor:
+            list(executor.map(lambda name: self.delete(kind, pid, name), names))
+
+    async def download_many(self, kind, items):
+        """(params, dst_path) 목록을 최대 STREAMS개씩 병렬 다운로드"""
+        semaphore = asyncio.Semaphore(STREAMS)
+
+        async def fetch(params, dst_path):
+            async with semaphore:
+                await self.download(kind, params, dst_path)
+
+        results = await asyncio.gather(*[fetch(params, dst_path) for params, dst_path in items], return_exceptions=True)
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            raise errors[0]
+
+
+class HttpStorageTransport(StorageTransport):
+    """Storage 서버 HTTP API를 사용하는 청크 단위 재개 가능 전송
+
+    모든 요청은 storage_client의 공유 연결 풀로 보내며, 연결 오류와 5xx 재시도는 공유 클라이언트가 처리한다.
+    동기 메서드(upload, delete)는 작업 스레드에서 호출되므로 공유 클라이언트의 이벤트 루프에서 실행한다.
+    """
+
+    def __init__(self, prefix=STORAGE_PREFIX):
+        self.prefix = prefix
+        self.chunked = True  # 서버가 청크 프로토콜을 지원하지 않으면 False로 전환
+
+    async def _upload_single(self, kind, pid, name, file_path):
+        with open(file_path, "rb") as file:
+            files = {"file": (name, file, "application/octet-stream")}
+            response = await storage.post(f"{self.prefix}/{UPLOAD_ENDPOINTS[kind]}", op="upload", files=files,
+                                          data={"pid": str(pid), "name": name})
+        if response.status_code != 200:
+            raise Exception(f"Failed to upload {name} to Storage Server: {response.text}")
+
+    async def _upload_chunk(self, kind, pid, name, file_path, index):
+        data = await asyncio.to_thread(_read_chunk, file_path, index)
+        form = {"pid": str(pid), "kind": kind, "name": name, "index": str(index), "sha256": _sha256(data)}
+        response = await storage.post(f"{self.prefix}/chunk_upload", op="upload", data=form,
+                                      files={"file": (f"{name}.{index}", data, "application/octet-stream")})
+        if response.status_code != 200:
+            raise Exception(f"Failed to upload chunk {index} of {name}: status {response.status_code}")
+
+    async def upload_async(self, kind, pid, name, file_path):
+        size = os.path.getsize(file_path)
+        if not self.chunked or size <= CHUNK_SIZE:
+            return await self._upload_single(kind, pid, name, file_path)
+        chunks = (size + CHUNK_SIZE - 1) // CHUNK_SIZE
+        info = {"pid": str(pid), "kind": kind, "name": name, "size": str(size), "sha256": await asyncio.to_thread(_hash_file, file_path)}
+        for attempt in range(1, RETRIES + 1):
+            try:
+                response = await storage.post(f"{self.prefix}/chunk_status", data={**info, "chunk_size": str(CHUNK_SIZE)})
+                if response.status_code == 404:
+                    logger.warning("Storage server does not support chunked transfer, using single uploads")
+                    self.chunked = False
+                    return await self._upload_single(kind, pid, name, file_path)
+                if response.status_code != 200:
+                    raise Exception(f"chunk_status returned {response.status_code}: {response.text}")
+                received = set(response.json().get("received", []))
+                pending = [index for index in range(chunks) if index not in received]
+                semaphore = asyncio.Semaphore(STREAMS)
+
+                async def send(index):
+                    async with semaphore:
+                        await self._upload_chunk(kind, pid, name, file_path, index)
+
+                results = await asyncio.gather(*[send(index) for index in pending], return_exceptions=True)
+                errors = [result for result in results if isinstance(result, Exception)]
+                if errors:
+                    raise errors[0]
+                response = await storage.post(f"{self.prefix}/chunk_complete", op="upload", data={**info, "chunks": str(chunks)})
+                if response.status_code != 200:
+                    raise Exception(f"chunk_complete returned {response.status_code}: {response.text}")
+                logger.info(f"Uploaded {name} in {chunks} chunks ({len(received)} already on server)")
+                return
+            except StorageUnavailable:
+                raise
+            except Exception as e:
+                # 다음 시도에서 chunk_status로 받은 청크를 확인하고 나머지만 이어서 전송
+                if attempt == RETRIES:
+                    raise Exception(f"Failed to upload {name} to Storage Server: {e}")
+                logger.warning(f"Upload of {name} interrupted (attempt {attempt}/{RETRIES}), resuming: {e}")
+
+    def upload(self, kind, pid, name, file_path):
+        return storage.call(self.upload_async(kind, pid, name, file_path))
+
+    def upload_many(self, kind, pid, items):
+        async def upload_all():
+            semaphore = asyncio.Semaphore(STREAMS)
+
+            async def send(name, file_path):
+                async with semaphore:
+                    await self.upload_async(kind, pid, name, file_path)
+
+            results = await asyncio.gather(*[send(name, file_path) for name, file_path in items], return_exceptions=True)
+            errors = [result for result in results if isinstance(result, Exception)]
+            if errors:
+                raise errors[0]
+
+        return storage.call(upload_all())
+
+    def delete(self, kind, pid, name):
+        response = storage.call(storage.post(f"{self.prefix}/delete", data={"pid": str(pid), "kind": kind, "name": name}))
+        if response.status_code not in (200, 404):
+            raise Exception(f"Failed to delete {name} from Storage Server: {response.text}")
+
+    async def read_head(self, kind, params, size):
+        path = f"{self.prefix}/{DOWNLOAD_ENDPOINTS[kind]}"
+        head = b""
+        async with storage.stream(path, params=params, headers={"Range": f"bytes=0-{size - 1}"}) as response:
+            if response.status_code not in (200, 206):
+                raise Exception(f"Storage server returned status {response.status_code} for {params}")
+            # Range를 지원하지 않아 200으로 전체를 보내는 경우에도 앞부분만 읽고 연결을 닫음
+            async for block in response.aiter_bytes():
+                head += block
+                if len(head) >= size:
+                    break
+        return head[:size]
+
+    async def _fetch_range(self, path, params, fd, index, size, etag=None):
+        start = index * CHUNK_SIZE
+        end = min(size, start + CHUNK_SIZE) - 1
+        headers = {"Range": f"bytes={start}-{end}"}
+        if etag and not etag.startswith("W/"):
+            # 받는 도중 파일이 바뀌면 서버가 206 대신 전체(200)를 보내므로 다른 파일의 구간이 섞이지 않음
+            headers["If-Range"] = etag
+        response = await storage.post(path, op="download", params=params, headers=headers)
+        if response.status_code != 206 or len(response.content) != end - start + 1:
+            raise Exception(f"Failed to download range {start}-{end} of {params}: status {response.status_code}")
+        os.pwrite(fd, response.content, start)
+
+    def _part_path(self, kind, params):
+        """받는 중인 파일 경로 (작업 공간과 무관하게 같은 파일이면 항상 같은 경로)"""
+        name = params["name"] if kind == "object" else f"{params['pid']}_{params['ver']}.ccp"
+        return os.path.join(PART_DIR, str(params["pid"]), kind, f"{name}.part")
+
+    async def download(self, kind, params, dst_path):
+        path = f"{self.prefix}/{DOWNLOAD_ENDPOINTS[kind]}"
+        os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+        async with storage.stream(path, params=params, headers={"Range": f"bytes=0-{CHUNK_SIZE - 1}"}) as response:
+            if response.status_code == 200:
+                # Range를 지원하지 않거나 파일이 작은 경우: 단일 스트림으로 저장
+                with open(f"{dst_path}.tmp", "wb") as f:
+                    async for block in response.aiter_bytes():
+                        f.write(block)
+                os.replace(f"{dst_path}.tmp", dst_path)
+                return
+            if response.status_code != 206:
+                raise Exception(f"Storage server returned status {response.status_code} for {params}")
+            size = int(response.headers["Content-Range"].rsplit("/", 1)[1])
+            etag = response.headers.get("ETag")
+            first = await response.aread()
+        part_path = self._part_path(kind, params)
+        state_path = f"{part_path}.json"
+        os.makedirs(os.path.dirname(part_path), exist_ok=True)
+        chunks = (size + CHUNK_SIZE - 1) // CHUNK_SIZE
+        key = {k: str(v) for k, v in params.items()}
+        done = set()
+        if os.path.exists(part_path) and os.path.exists(state_path):
+            with open(state_path, "r") as f:
+                state = json.load(f)
+            # 크기나 ETag가 다르면 같은 이름의 다른 파일(예: 히스토리 삭제 후 다시 만든 버전)이므로 처음부터 받음
+            if state.get("size") == size and state.get("etag") == etag and state.get("params") == key:
+                done = set(state["done"])
+            else:
+                logger.info(f"Discarding stale partial download of {params} (size/ETag changed)")
+        fd = os.open(part_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.ftruncate(fd, size)
+            os.pwrite(fd, first, 0)
+            done.add(0)
+            semaphore = asyncio.Semaphore(STREAMS)
+
+            async def fetch(index):
+                async with semaphore:
+                    await self._fetch_range(path, params, fd, index, size, etag)
+                done.add(index)
+                with open(state_path, "w") as f:
+                    json.dump({"size": size, "etag": etag, "params": key, "done": sorted(done)}, f)
+
+            for attempt in range(1, RETRIES + 1):
+                pending = [index for index in range(chunks) if index not in done]
+                results = await asyncio.gather(*[fetch(index) for index in pending], return_exceptions=True)
+                errors = [result for result in results if isinstance(result, Exception)]
+                if not errors:
+                    break
+                if attempt == RETRIES:
+                    # 받은 청크는 PART_DIR에 남겨 다음 다운로드에서 이어받음
+                    raise Exception(f"Failed to download {len(errors)} of {chunks} ranges of {params}: {errors[0]}")
+                logger.warning(f"Download of {params} missing {len(errors)} ranges (attempt {attempt}/{RETRIES}), retrying: {errors[0]}")
+        finally:
+            os.close(fd)
+        shutil.move(part_path, dst_path)
+        if os.path.exists(state_path):
+            os.remove(state_path)
+
+
+def remove_parts(pid):
+    """프로젝트의 받는 중인 파일을 모두 삭제 (히스토리 삭제 후 같은 이름의 새 버전에 이어받지 않도록)"""
+    shutil.rmtree(os.path.join(PART_DIR, str(pid)), ignore_errors=True)
+
+
+class LocalStorageTransport(StorageTransport):
+    """로컬 폴더를 Storage 서버 대신 사용하는 전송 (테스트 및 단일 서버 환경용)
+
+    {root}/{pid}/{name} 구조로 저장하며, 버전 CCP는 {pid}_{ver}.ccp, 객체는 objects/{name}에 둔다.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, kind, pid, name):
+        if kind == "object":
+            return os.path.join(self.root, str(pid), "objects", name)
+        return os.path.join(self.root, str(pid), name)
+
+    def upload(self, kind, pid, name, file_path):
+        dst_path = self._path(kind, pid, name)
+        os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+        shutil.copyfile(file_path, f"{dst_path}.tmp")
+        os.replace(f"{dst_path}.tmp", dst_path)
+
+    def delete(self, kind, pid, name):
+        dst_path = self._path(kind, pid, name)
+        if os.path.exists(dst_path):
+            os.remove(dst_path)
+
+    def _source(self, kind, params):
+        name = params["name"] if kind == "object" else f"{params['pid']}_{params['ver']}.ccp"
+        src_path = self._path(kind, params["pid"], name)
+        if not os.path.exists(src_path):
+            raise Exception(f"{name} not found in local storage {self.root}")
+        return src_path
+
+    async def read_head(self, kind, params, size):
+        with open(self._source(kind, params), "rb") as f:
+            return f.read(size)
+
+    async def download(self, kind, params, dst_path):
+        src_path = self._source(kind, params)
+        os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+        shutil.copyfile(src_path, f"{dst_path}.tmp")
+        os.replace(f"{dst_path}.tmp", dst_path)
+
+
+def create_transport(spec):
+    """CCP_TRANSPORT 설정값으로 전송 객체 생성 (http 또는 local:{폴더})"""
+    if spec.startswith("local:"):
+        return LocalStorageTransport(spec[len("local:"):])
+    if spec == "http":
+        return HttpStorageTransport()
+    raise Exception(f"Unknown CCP transport: {spec}")
+
+
+transport = create_transport(os.getenv('CCP_TRANSPORT', 'http'))
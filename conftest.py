@@ -0,0 +1,87 @@
+"""
+   CodeCraft PMS Backend Project
+
+   파일명   : conftest.py
+   생성자   : 김창환
+
+   생성일   : 2026/10/18
+   업데이트 : 2026/10/18
+
+   설명     : pytest 공통 설정 (CCP 암호화 키, Database Project 모듈 연결, 테스트용 DB 연결)
+"""
+
+from cryptography.fernet import Fernet
+import os, sys, types, importlib, pytest
+
+sys.path.append(os.path.abspath('/data/Database Project'))  # Database Project와 연동하기 위해 사용
+
+# ccp.py는 import 시점에 CCP_KEY로 Fernet을 만들므로 테스트용 키를 미리 지정
+os.environ.setdefault('CCP_KEY', Fernet.generate_key().decode())
+
+# Database Project가 없는 환경에서도 라우터 모듈을 import할 수 있도록 빈 모듈을 등록
+# (테스트는 사용하는 DB 함수를 monkeypatch로 지정하며, 지정하지 않은 함수를 호출하면 AttributeError)
+for name in ("mysql_connection", "csv_DB", "project_DB", "output_DB"):
+    try:
+        importlib.import_module(name)
+    except ImportError:
+        sys.modules[name] = types.ModuleType(name)
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = 0
+
+    def execute(self, query, args=None):
+        self._run(query, [list(args or [])])
+
+    def executemany(self, query, args):
+        self._run(query, [list(row) for row in args])
+
+    def _run(self, query, rows):
+        if self.connection.error is not None:
+            raise self.connection.error
+        self.connection.queries.append((query, rows))
+        self.rowcount = self.connection.rowcount
+
+    def fetchall(self):
+        rows = self.connection.rows
+        return rows(*self.connection.queries[-1]) if callable(rows) else rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """batch_DB 테스트용 DB 연결 (실행한 쿼리와 인자 행을 기록, error를 지정하면 실행 시 발생)
+
+    rows는 조회 결과이며, 함수이면 (쿼리, 인자 행 목록)으로 호출한 결과를 반환한다.
+    """
+
+    def __init__(self):
+        self.error = None
+        self.rowcount = 0  # 쿼리가 반환할 영향받은 행 수
+        self.rows = []
+        self.queries = []
+        self.committed = False
+        self.rolled_back = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        self.rolled_back = True
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def db_connection(monkeypatch):
+    """batch_DB가 사용하는 Database Project 연결을 FakeConnection으로 대체"""
+    connection = FakeConnection()
+    monkeypatch.setattr(sys.modules["mysql_connection"], "db_connect", lambda: connection, raising=False)
+    return connection
@@ -0,0 +1,120 @@
+"""
+   CodeCraft PMS Backend Project
+
+   파일명   : deleted_project.py
+   생성자   : 김창환
+
+   생성일   : 2026/10/18
+   업데이트 : 2026/10/18
+
+   설명     : 삭제된 프로젝트 정보(pname, 삭제 시각, CCP 존재 여부)를 저장하는 SQLite 저장소 정의
+"""
+
+from logger import logger
+import os, json, sqlite3, threading
+
+# 기존 deleted_project.json({pid: {"pname", "deleted_time", "ccp"}})을 대체하는 저장소
+# pid를 기본 키로 사용하므로 조회/갱신/삭제가 파일 전체를 읽고 쓰지 않으며,
+# WAL 모드를 사용하여 여러 uvicorn worker가 동시에 읽고 쓸 수 있다.
+# 서버 시작 시(initialize) 기존 JSON 파일을 가져오고 deleted_project.json.migrated로 이름을 바꾼다.
+DB_PATH = os.getenv('DELETED_PROJECT_DB', 'deleted_project.db')
+LEGACY_JSON_PATH = "deleted_project.json"
+BUSY_TIMEOUT = 10  # 다른 worker가 쓰기 잠금을 보유 중일 때 대기하는 시간 (초)
+
+local = threading.local()  # 스레드별 SQLite 연결
+migrate_lock = threading.Lock()
+migrated = False
+
+
+def _connect():
+    conn = getattr(local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS deleted_project (
+                pid INTEGER PRIMARY KEY,
+                pname TEXT,
+                deleted_time TEXT,
+                ccp INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        local.conn = conn
+    if not migrated:
+        _migrate_json(conn)
+    return conn
+
+
+def _migrate_json(conn):
+    """기존 deleted_project.json의 내용을 저장소로 가져온다. (이미 있는 pid는 유지)"""
+    global migrated
+    with migrate_lock:
+        if migrated:
+            return
+        try:
+            with open(LEGACY_JSON_PATH, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            data = None
+        except json.JSONDecodeError:
+            logger.warning(f"{LEGACY_JSON_PATH} is malformed or empty, skipping migration.")
+            data = {}
+        if data is not None:
+            rows = [(int(pid), entry.get("pname"), entry.get("deleted_time"), 1 if entry.get("ccp") else 0)
+                    for pid, entry in data.items() if str(pid).isdigit()]
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany("INSERT OR IGNORE INTO deleted_project (pid, pname, deleted_time, ccp) VALUES (?, ?, ?, ?)", rows)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            try:
+                os.replace(LEGACY_JSON_PATH, f"{LEGACY_JSON_PATH}.migrated")
+            except FileNotFoundError:
+                pass  # 다른 worker가 먼저 이전을 마친 경우
+            logger.info(f"Migrated {len(rows)} deleted project entries from {LEGACY_JSON_PATH} to {DB_PATH}")
+        migrated = True
+
+
+def initialize():
+    """저장소 테이블을 만들고 기존 JSON 파일을 이전 (서버 시작 시 호출)"""
+    _connect()
+
+
+def _to_dict(row):
+    return {"pname": row["pname"], "deleted_time": row["deleted_time"], "ccp": bool(row["ccp"])}
+
+
+def save_deleted_project(pid, pname, ccp_found, deleted_time):
+    """삭제된 프로젝트 정보를 저장 (같은 pid가 있으면 덮어씀)"""
+    _connect().execute(
+        "INSERT OR REPLACE INTO deleted_project (pid, pname, deleted_time, ccp) VALUES (?, ?, ?, ?)",
+        (int(pid), pname, deleted_time, 1 if ccp_found else 0)
+    )
+
+
+def fetch_deleted_project(pid):
+    """pid의 삭제된 프로젝트 정보 (없으면 None)"""
+    row = _connect().execute("SELECT * FROM deleted_project WHERE pid = ?", (int(pid),)).fetchone()
+    return _to_dict(row) if row else None
+
+
+def fetch_deleted_projects(pids):
+    """여러 pid의 삭제된 프로젝트 정보를 한 번에 조회 ({pid: 정보}, 삭제되지 않은 pid는 제외)"""
+    pids = sorted({int(pid) for pid in pids})
+    result = {}
+    conn = _connect()
+    # SQLite의 바인딩 변수 개수 제한을 넘지 않도록 나누어 조회
+    for start in range(0, len(pids), 500):
+        batch = pids[start:start + 500]
+        query = f"SELECT * FROM deleted_project WHERE pid IN ({', '.join('?' * len(batch))})"
+        for row in conn.execute(query, batch):
+            result[row["pid"]] = _to_dict(row)
+    return result
+
+
+def remove_deleted_project(pid):
+    """복원된 프로젝트의 삭제 정보를 제거 (제거된 항목이 있으면 True)"""
+    return _connect().execute("DELETE FROM deleted_project WHERE pid = ?", (int(pid),)).rowcount > 0
@@ -5,7 +5,7 @@
    생성자   : 김창환                                                          
                                                                                
    생성일   : 2024/11/26                                                      
-   업데이트 : 2024/12/14                                                   
+   업데이트 : 2026/10/18                                                   
                                                                                
    설명     : DB로부터 정보를 받아와 산출물을 문서화 해주는 기능 정의
 """
@@ -13,12 +13,13 @@
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
+from typing import List
 from docx import Document
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
 from datetime import datetime, date
 from urllib.parse import quote
 from logger import logger
-import pymysql, os, sys, traceback
+import pymysql, os, sys, traceback, asyncio
 import logging, requests
 import re  # 정규식 사용
 
@@ -32,6 +33,11 @@ class ConverterPayload(BaseModel):
     doc_type: int
     doc_s_no: int
 
+class ConverterBatchPayload(BaseModel):
+    """여러 산출물을 문서화하여 하나의 tar 파일로 전송하는 요청 모델"""
+    docs: List[ConverterPayload]
+    pid: int = None  # 압축 파일 이름에 사용
+
 def replace_placeholder_in_cell(cell, placeholder, replacement):
     for paragraph in cell.paragraphs:
         if placeholder in paragraph.text:
@@ -41,7 +47,7 @@ def replace_placeholder_in_cell(cell, placeholder, replacement):
             paragraph.runs[0].text = new_text
         paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
 
-def process_meeting_minutes(doc_s_no):
+def render_meeting_minutes(doc_s_no):
     """
     회의록 문서를 생성하는 기능을 처리합니다.
     """
@@ -91,11 +97,17 @@ def process_meeting_minutes(doc_s_no):
     output_path = f"doc_conv/회의록_{doc_s_no}.docx"
     doc.save(output_path)
 
-    push.push_to_nextjs(output_path, f"회의록_{doc_s_no}.docx")
+    return output_path, f"회의록_{doc_s_no}.docx"
 
+def process_meeting_minutes(doc_s_no):
+    """
+    render_meeting_minutes로 생성한 문서를 Next.js로 전송합니다. (작업 스레드에서 호출)
+    """
+    output_path, file_name = render_meeting_minutes(doc_s_no)
+    push.push_to_nextjs(output_path, file_name)
     return {"RESULT_CODE": 200, "RESULT_MSG": "Done!"}
 
-def process_summary(doc_s_no):
+def render_summary(doc_s_no):
     """
     프로젝트 개요서 문서를 생성하는 기능을 처리합니다.
     """
@@ -144,12 +156,18 @@ def process_summary(doc_s_no):
     output_path = f"doc_conv/개요서_{doc_s_no}.docx"
     doc.save(output_path)
 
-    push.push_to_nextjs(output_path, f"개요서_{doc_s_no}.docx")
+    return output_path, f"개요서_{doc_s_no}.docx"
 
+def process_summary(doc_s_no):
+    """
+    render_summary로 생성한 문서를 Next.js로 전송합니다. (작업 스레드에서 호출)
+    """
+    output_path, file_name = render_summary(doc_s_no)
+    push.push_to_nextjs(output_path, file_name)
     return {"RESULT_CODE": 200, "RESULT_MSG": "Done!"}
 
 
-def process_reqspec(doc_r_no):
+def render_reqspec(doc_r_no):
     """
     요구사항 명세서 문서를 생성하는 기능을 처리합니다.
     """
@@ -190,12 +208,18 @@ def process_reqspec(doc_r_no):
     output_path = f"doc_conv/요구사항_{doc_r_no}.docx"
     doc.save(output_path)
 
-    push.push_to_nextjs(output_path, f"요구사항_{doc_r_no}.docx")
+    return output_path, f"요구사항_{doc_r_no}.docx"
 
+def process_reqspec(doc_r_no):
+    """
+    render_reqspec로 생성한 문서를 Next.js로 전송합니다. (작업 스레드에서 호출)
+    """
+    output_path, file_name = render_reqspec(doc_r_no)
+    push.push_to_nextjs(output_path, file_name)
     return {"RESULT_CODE": 200, "RESULT_MSG": "Done!"}
 
 
-def process_testcase(doc_t_no):
+def render_testcase(doc_t_no):
     """
     특정 테스트 케이스 문서를 생성하는 기능을 처리합니다.
     """
@@ -240,12 +264,18 @@ def process_testcase(doc_t_no):
     output_path = f"doc_conv/테스트케이스_{doc_t_no}.docx"
     doc.save(output_path)
 
-    push.push_to_nextjs(output_path, f"테스트케이스_{doc_t_no}.docx")
+    return output_path, f"테스트케이스_{doc_t_no}.docx"
 
+def process_testcase(doc_t_no):
+    """
+    render_testcase로 생성한 문서를 Next.js로 전송합니다. (작업 스레드에서 호출)
+    """
+    output_path, file_name = render_testcase(doc_t_no)
+    push.push_to_nextjs(output_path, file_name)
     return {"RESULT_CODE": 200, "RESULT_MSG": "Done!", "OUTPUT_PATH": output_path}
 
 
-def process_report(doc_rep_no):
+def render_report(doc_rep_no):
     """
     보고서 문서를 생성하는 기능을 처리합니다.
     """
@@ -293,27 +323,63 @@ def process_report(doc_rep_no):
     output_path = f"doc_conv/보고서_{doc_rep_no}.docx"
     doc.save(output_path)
 
-    push.push_to_nextjs(output_path, f"보고서_{doc_rep_no}.docx")
+    return output_path, f"보고서_{doc_rep_no}.docx"
 
+def process_report(doc_rep_no):
+    """
+    render_report로 생성한 문서를 Next.js로 전송합니다. (작업 스레드에서 호출)
+    """
+    output_path, file_name = render_report(doc_rep_no)
+    push.push_to_nextjs(output_path, file_name)
     return {"RESULT_CODE": 200, "RESULT_MSG": "Done!", "OUTPUT_PATH": output_path}
 
 
+RENDERERS = {
+    0: render_summary,           # 프로젝트 개요서
+    1: render_meeting_minutes,   # 회의록
+    3: render_reqspec,           # 요구사항 명세서
+    4: render_report             # 보고서
+}
+
+
 @router.post("/docs/convert")
 async def docs_convert(payload: ConverterPayload):
+    # 문서 생성과 Next.js 전송은 블로킹 작업이므로 작업 스레드에서 실행
     try:
         if payload.doc_type == 0: # 프로젝트 개요서
-            return process_summary(payload.doc_s_no)
+            return await asyncio.to_thread(process_summary, payload.doc_s_no)
         elif payload.doc_type == 1:  # 회의록
-            return process_meeting_minutes(payload.doc_s_no)
+            return await asyncio.to_thread(process_meeting_minutes, payload.doc_s_no)
         elif payload.doc_type == 2: # 테스트 케이스
             # return process_testcase(payload.doc_s_no) # 테스트 케이스 컨셉 변경에 따라 문서 변환 기능 비활성화 (25.03.23)
             return {"RESULT_CODE": 410, "RESULT_MSG": "테스트 케이스의 문서 변환 기능은 지원이 종료됐습니다."}
         elif payload.doc_type == 3: # 요구사항 명세서
-            return process_reqspec(payload.doc_s_no)
+            return await asyncio.to_thread(process_reqspec, payload.doc_s_no)
         elif payload.doc_type == 4: # 보고서
-            return process_report(payload.doc_s_no)
+            return await asyncio.to_thread(process_report, payload.doc_s_no)
         else:
             raise HTTPException(status_code=400, detail="Unsupported document type")
     except Exception:
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail="Unexpected error occurred")
+
+
+@router.post("/docs/convert_batch")
+async def docs_convert_batch(payload: ConverterBatchPayload):
+    """여러 산출물을 문서화한 뒤 하나의 tar 파일로 묶어 Next.js로 전송"""
+    unsupported = [doc.doc_type for doc in payload.docs if doc.doc_type not in RENDERERS]
+    if not payload.docs or unsupported:
+        raise HTTPException(status_code=400, detail=f"Unsupported document type: {unsupported}" if unsupported else "No documents requested")
+    try:
+        files = []
+        for doc in payload.docs:
+            files.append(await asyncio.to_thread(RENDERERS[doc.doc_type], doc.doc_s_no))
+        archive_name = f"산출물_{payload.pid}.tar" if payload.pid is not None else "산출물.tar"
+        logger.info(f"Converted {len(files)} documents, pushing them to Next.js as {archive_name}")
+        result = await push.pusher.push_batch([(output_path, file_name) for output_path, file_name in files], archive_name)
+        return dict(result, FILE_NAME=archive_name, FILES=[file_name for _, file_name in files])
+    except HTTPException:
+        raise
+    except Exception:
+        print(traceback.format_exc())
+        raise HTTPException(status_code=500, detail="Unexpected error occurred")
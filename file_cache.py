@@ -0,0 +1,254 @@
+"""
+   CodeCraft PMS Backend Project
+
+   파일명   : file_cache.py
+   생성자   : 김창환
+
+   생성일   : 2026/10/18
+   업데이트 : 2026/10/18
+
+   설명     : Storage 서버에서 내려받은 산출물/첨부파일의 로컬 디스크 LRU 캐시 정의
+"""
+
+from logger import logger
+import os, json, time, uuid, hashlib, asyncio
+
+# 기타 산출물/첨부파일 다운로드 시 Storage 서버의 파일을 CACHE_DIR에 저장하고, 같은 file_path를 다시 요청하면
+# Storage 서버를 거치지 않고 로컬 파일로 응답한다.
+#   CACHE_DIR/objects/<key>        파일 내용 (key = file_path의 sha256, 수정 시각 = 마지막 사용 시각)
+#   CACHE_DIR/objects/<key>.json   file_path, 크기, 내용의 sha256, 응답에 사용한 ETag, Content-Type, 저장 시각
+#   CACHE_DIR/refs/<kind>_<id>     DB 레코드(otherdoc file_no, attach doc_a_no)가 가리키는 캐시 key
+#   CACHE_DIR/tmp/                 저장 중인 파일 (전체를 받은 뒤에만 objects로 이동)
+# Storage 서버의 파일 경로는 업로드마다 새로 만들어지므로 같은 경로의 내용은 바뀌지 않는다.
+# 경로/삭제 API는 레코드가 가리키던 항목을 지워(invalidate_record) 더 이상 쓰이지 않는 파일이 남지 않게 하고,
+# 전체 크기가 MAX_BYTES를 넘으면 가장 오래 사용하지 않은 항목부터 삭제한다.
+# 캐시는 디스크에 있으므로 모든 uvicorn worker가 공유하며, 조회 통계(stats)는 worker별로 집계된다.
+CACHE_DIR = os.getenv('FILE_CACHE_DIR', '/data/cache/output')
+MAX_BYTES = int(os.getenv('FILE_CACHE_MAX_BYTES', str(2 * 1024 * 1024 * 1024)))  # 캐시 전체 크기 제한 (bytes); 0이면 캐시 비활성화
+MAX_FILE_BYTES = int(os.getenv('FILE_CACHE_MAX_FILE_BYTES', str(256 * 1024 * 1024)))  # 이보다 큰 파일은 캐시하지 않음
+TTL = int(os.getenv('FILE_CACHE_TTL', str(7 * 24 * 60 * 60)))  # 저장 후 항목을 사용할 수 있는 시간 (초)
+CHUNK_SIZE = 256 * 1024
+
+stats = {"hits": 0, "misses": 0, "fills": 0, "evictions": 0, "invalidations": 0}
+
+
+def enabled():
+    return MAX_BYTES > 0
+
+
+def _key(file_path):
+    return hashlib.sha256(file_path.encode("utf-8")).hexdigest()
+
+
+def _object_path(key):
+    return os.path.join(CACHE_DIR, "objects", key)
+
+
+def _ref_path(kind, record_id):
+    return os.path.join(CACHE_DIR, "refs", f"{kind}_{record_id}")
+
+
+def _remove_entry(key):
+    """캐시 항목의 파일을 삭제 (삭제된 항목이 있으면 True)"""
+    removed = False
+    for path in (_object_path(key), f"{_object_path(key)}.json"):
+        try:
+            os.remove(path)
+            removed = True
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def lookup(file_path):
+    """file_path의 캐시 항목을 반환 (없거나 만료되었으면 None)
+
+    항목의 파일은 조회 시점에 열어 entry["file"]로 반환하므로, 전송 도중 LRU 정리로 삭제되어도 끝까지 읽을 수 있다.
+    사용이 끝나면 release(entry)로 닫아야 한다.
+    """
+    if not enabled():
+        return None
+    key = _key(file_path)
+    try:
+        f = open(_object_path(key), "rb")
+    except FileNotFoundError:
+        stats["misses"] += 1
+        return None
+    try:
+        with open(f"{_object_path(key)}.json", "r", encoding="utf-8") as meta:
+            entry = json.load(meta)
+        size = os.fstat(f.fileno()).st_size
+    except (FileNotFoundError, json.JSONDecodeError):
+        f.close()
+        stats["misses"] += 1
+        return None
+    if entry.get("file_path") != file_path or entry.get("size") != size or time.time() - entry.get("stored", 0) >= TTL:
+        f.close()
+        _remove_entry(key)
+        stats["misses"] += 1
+        return None
+    os.utime(f.fileno())  # LRU 순서를 위해 마지막 사용 시각 갱신
+    stats["hits"] += 1
+    return dict(entry, path=_object_path(key), file=f)
+
+
+def release(entry):
+    """lookup이 연 캐시 파일을 닫음"""
+    f = entry.get("file")
+    if f is not None:
+        f.close()
+
+
+def _write(f, digest, block):
+    f.write(block)
+    digest.update(block)
+
+
+def _open_tmp():
+    tmp_dir = os.path.join(CACHE_DIR, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    tmp_path = os.path.join(tmp_dir, uuid.uuid4().hex)
+    return tmp_path, open(tmp_path, "wb")
+
+
+async def tee(file_path, chunks, refs=(), etag=None, content_type=None, expected_size=None):
+    """Storage 서버 응답 스트림을 그대로 전달하면서 캐시에 저장 (끝까지 받은 경우에만 저장)
+
+    refs는 이 파일을 가리키는 DB 레코드 목록 ((kind, id), ...)이다.
+    """
+    if not enabled() or (expected_size is not None and expected_size > MAX_FILE_BYTES):
+        async for block in chunks:
+            yield block
+        return
+    # 디스크 쓰기는 이벤트 루프를 멈추지 않도록 스레드에서 실행
+    tmp_path, f = await asyncio.to_thread(_open_tmp)
+    digest = hashlib.sha256()
+    size = 0
+    writing = True
+    try:
+        async for block in chunks:
+            if writing:
+                try:
+                    await asyncio.to_thread(_write, f, digest, block)
+                    size += len(block)
+                    if size > MAX_FILE_BYTES:
+                        raise OSError(f"exceeds FILE_CACHE_MAX_FILE_BYTES ({MAX_FILE_BYTES} bytes)")
+                except OSError as e:
+                    # 저장에 실패하거나 길이를 알 수 없던 큰 파일이면 저장을 멈추고 전달만 계속
+                    logger.warning(f"Not caching {file_path}: {e}")
+                    writing = False
+                    f.close()
+            yield block
+        if writing:
+            f.close()
+            if expected_size is None or size == expected_size:
+                try:
+                    await asyncio.to_thread(_commit, file_path, tmp_path, refs, {
+                        "file_path": file_path,
+                        "size": size,
+                        "sha256": digest.hexdigest(),
+                        "etag": etag or f'"{digest.hexdigest()[:32]}"',
+                        "content_type": content_type,
+                        "stored": time.time()
+                    })
+                except OSError as e:
+                    logger.warning(f"Failed to cache {file_path}: {e}")
+    finally:
+        if not f.closed:
+            f.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _commit(file_path, tmp_path, refs, entry):
+    """저장을 마친 파일을 캐시 항목으로 등록하고 크기 제한을 적용"""
+    key = _key(file_path)
+    os.makedirs(os.path.join(CACHE_DIR, "objects"), exist_ok=True)
+    os.makedirs(os.path.join(CACHE_DIR, "refs"), exist_ok=True)
+    os.replace(tmp_path, _object_path(key))
+    meta_tmp = f"{_object_path(key)}.{uuid.uuid4().hex}.tmp"
+    with open(meta_tmp, "w", encoding="utf-8") as f:
+        json.dump(entry, f)
+    os.replace(meta_tmp, f"{_object_path(key)}.json")
+    for kind, record_id in refs:
+        with open(_ref_path(kind, record_id), "w", encoding="utf-8") as f:
+            f.write(key)
+    stats["fills"] += 1
+    logger.info(f"Cached {file_path} ({entry['size']} bytes)")
+    evict()
+
+
+def usage():
+    """캐시 항목 목록 [(마지막 사용 시각, 크기, key)]"""
+    objects_dir = os.path.join(CACHE_DIR, "objects")
+    if not os.path.isdir(objects_dir):
+        return []
+    entries = []
+    for name in os.listdir(objects_dir):
+        if "." in name:
+            continue
+        try:
+            stat = os.stat(os.path.join(objects_dir, name))
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, name))
+    return entries
+
+
+def evict():
+    """전체 크기가 MAX_BYTES를 넘으면 가장 오래 사용하지 않은 항목부터 삭제"""
+    entries = usage()
+    total = sum(size for _, size, _ in entries)
+    for _, size, key in sorted(entries):
+        if total <= MAX_BYTES:
+            break
+        if _remove_entry(key):
+            stats["evictions"] += 1
+        total -= size
+
+
+def invalidate_path(file_path):
+    """file_path의 캐시 항목을 삭제"""
+    if _remove_entry(_key(file_path)):
+        stats["invalidations"] += 1
+        logger.info(f"Invalidated cached file {file_path}")
+
+
+def invalidate_record(kind, record_id):
+    """DB 레코드가 가리키던 캐시 항목을 삭제 (경로 변경, 삭제 시 호출)"""
+    ref_path = _ref_path(kind, record_id)
+    try:
+        with open(ref_path, "r", encoding="utf-8") as f:
+            key = f.read().strip()
+        os.remove(ref_path)
+    except FileNotFoundError:
+        return
+    if _remove_entry(key):
+        stats["invalidations"] += 1
+        logger.info(f"Invalidated cached file of {kind} {record_id}")
+
+
+async def read_range(entry, start, end):
+    """lookup이 연 캐시 파일의 [start, end] 구간을 CHUNK_SIZE 단위로 전달 (위치를 지정해 읽으므로 여러 번 읽을 수 있음)"""
+    fd = entry["file"].fileno()
+    position = start
+    while position <= end:
+        block = await asyncio.to_thread(os.pread, fd, min(CHUNK_SIZE, end - position + 1), position)
+        if not block:
+            break
+        position += len(block)
+        yield block
+
+
+def snapshot():
+    """캐시 조회 통계와 디스크 사용량"""
+    entries = usage()
+    requests = stats["hits"] + stats["misses"]
+    return dict(
+        stats,
+        hit_ratio=round(stats["hits"] / requests, 4) if requests else None,
+        entries=len(entries),
+        bytes=sum(size for _, size, _ in entries),
+        max_bytes=MAX_BYTES,
+        ttl=TTL
+    )
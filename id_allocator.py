@@ -0,0 +1,156 @@
+"""
+   CodeCraft PMS Backend Project
+
+   파일명   : id_allocator.py
+   생성자   : 김창환
+
+   생성일   : 2026/10/18
+   업데이트 : 2026/10/18
+
+   설명     : 프로젝트 번호, 파일 고유 ID를 중복 없이 발급하는 블록 단위 시퀀스 발급기 정의
+"""
+
+from collections import deque
+from logger import logger
+import os, math, sqlite3, asyncio, threading
+import batch_DB
+
+# 시퀀스의 다음 값은 SQLite(WAL)에 저장하고, 각 worker는 BEGIN IMMEDIATE 트랜잭션으로 블록 단위(block개)를
+# 예약한 뒤 메모리에서 하나씩 발급한다. 블록은 worker마다 겹치지 않으므로 발급 시 DB 조회가 필요 없다.
+# 기존 방식(random + is_uid_exists)으로 이미 사용된 번호와 겹치지 않도록 블록을 예약할 때 IN (...) 조회 한 번으로 확인하고,
+# 남은 번호가 블록의 절반 이하가 되면 다음 블록을 백그라운드 스레드에서 미리 준비하므로 요청 처리 중에는 대기하지 않는다.
+# 비동기 핸들러는 allocate_async()를 사용하며, 준비된 번호가 없어 블록 예약을 기다려야 할 때만 작업 스레드에서 대기한다.
+# 시퀀스가 최대값에 도달하면 최소값부터 다시 확인하며, 범위 전체에 사용 가능한 번호가 없으면 Exception을 발생시킨다.
+DB_PATH = os.getenv('ID_ALLOCATOR_DB', 'id_allocator.db')
+BUSY_TIMEOUT = 10  # 다른 worker가 쓰기 잠금을 보유 중일 때 대기하는 시간 (초)
+MAX_WINDOW = 4096  # 한 번에 예약하여 DB에서 확인하는 번호 수의 최대값
+
+
+def _connect():
+    conn = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS id_sequence (
+            name TEXT PRIMARY KEY,
+            next INTEGER NOT NULL
+        )
+    """)
+    return conn
+
+
+class IdAllocator:
+    """[low, high] 범위의 번호를 블록 단위로 예약하여 발급하는 시퀀스 (sources: 번호를 사용하는 (테이블, 컬럼) 목록)"""
+
+    def __init__(self, name, low, high, block, sources):
+        self.name = name
+        self.low = low
+        self.high = high
+        self.block = block
+        self.sources = sources
+        self.pending = deque()
+        self.recent = deque(maxlen=block * 4)  # 최근 발급한 번호 (아직 DB에 저장되지 않았을 수 있음)
+        self.prefetch = None
+        self.error = None
+        self.lock = threading.Lock()
+
+    def _reserve(self, conn, size):
+        """시퀀스에서 다음 size개의 범위를 예약 (최대값에 도달하면 최소값부터 다시 시작)"""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT next FROM id_sequence WHERE name = ?", (self.name,)).fetchone()
+            start = row[0] if row else self.low
+            if start < self.low or start > self.high:
+                start = self.low
+            end = min(start + size - 1, self.high)
+            conn.execute("INSERT OR REPLACE INTO id_sequence (name, next) VALUES (?, ?)", (self.name, end + 1))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return range(start, end + 1)
+
+    def _held(self):
+        """이 worker가 발급 대기 중이거나 방금 발급하여 아직 DB에 저장되지 않았을 수 있는 번호"""
+        with self.lock:
+            return set(self.pending) | set(self.recent)
+
+    def _next_block(self):
+        """사용 가능한 번호를 block개까지 예약하여 반환 (범위를 한 바퀴 돌 때까지 찾지 못하면 있는 만큼)"""
+        conn = _connect()
+        try:
+            # 시퀀스가 한 바퀴 돌았을 때 아직 DB에 저장되지 않은 번호를 다시 발급하지 않도록 제외
+            held = self._held()
+            free = []
+            scanned = 0
+            window = self.block
+            while len(free) < self.block and scanned <= self.high - self.low:
+                # 범위를 한 바퀴 넘게 예약하면 같은 번호를 두 번 반환하므로 아직 확인하지 않은 개수까지만 예약
+                candidates = self._reserve(conn, min(window, self.high - self.low + 1 - scanned))
+                scanned += len(candidates)
+                used = batch_DB.fetch_existing_ids(self.sources, candidates)
+                free.extend(uid for uid in candidates if uid not in used and uid not in held)
+                if used:
+                    logger.info(f"{self.name} id block {candidates.start}-{candidates.stop - 1}: skipped {len(used)} ids already in use")
+                # 이미 사용 중인 번호가 많은 구간이면 지금까지의 비율로 남은 개수를 채울 만큼 다음 예약 범위를 넓힘
+                if free:
+                    window = min(MAX_WINDOW, math.ceil((self.block - len(free)) * scanned / len(free)))
+                else:
+                    window = min(MAX_WINDOW, window * 2)
+            if not free:
+                raise Exception(f"No free {self.name} id left in range {self.low}-{self.high}")
+            return free
+        finally:
+            conn.close()
+
+    def _prefetch(self):
+        try:
+            ids = self._next_block()
+            with self.lock:
+                # 확인하는 동안 발급된 번호도 제외
+                held = set(self.pending) | set(self.recent)
+                self.pending.extend(uid for uid in ids if uid not in held)
+        except Exception as e:
+            logger.error(f"Failed to reserve {self.name} id block: {e}", exc_info=True)
+            self.error = e
+        finally:
+            with self.lock:
+                self.prefetch = None
+
+    def _start_prefetch(self):
+        self.prefetch = threading.Thread(target=self._prefetch, name=f"id-prefetch-{self.name}", daemon=True)
+        self.prefetch.start()
+        return self.prefetch
+
+    def _take(self):
+        """준비된 번호를 하나 꺼냄 (없으면 블록 예약을 시작하고 None 반환)"""
+        with self.lock:
+            if self.pending:
+                uid = self.pending.popleft()
+                self.recent.append(uid)
+                if len(self.pending) <= self.block // 2 and self.prefetch is None:
+                    self._start_prefetch()
+                return uid
+            if self.error is not None:
+                error, self.error = self.error, None
+                raise Exception(f"Failed to allocate {self.name} id: {error}")
+            if self.prefetch is None:
+                self._start_prefetch()
+            return None
+
+    def allocate(self):
+        """중복되지 않는 번호 하나를 발급 (작업 스레드용; 준비된 번호가 없으면 블록 예약을 기다림)"""
+        while True:
+            uid = self._take()
+            if uid is not None:
+                return uid
+            # 준비된 번호가 없을 때만 (서버 시작 직후 등) 블록 예약을 기다림
+            prefetch = self.prefetch
+            if prefetch is not None:
+                prefetch.join()
+
+    async def allocate_async(self):
+        """중복되지 않는 번호 하나를 발급 (비동기 핸들러용; 블록 예약을 기다리는 동안 이벤트 루프를 막지 않음)"""
+        uid = self._take()
+        if uid is not None:
+            return uid
+        return await asyncio.to_thread(self.allocate)
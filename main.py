@@ -5,7 +5,7 @@
    생성자   : 김창환                                                         
                                                                               
    생성일   : 2024/10/14                                                       
-   업데이트 : 2025/03/08
+   업데이트 : 2026/10/18
                                                                               
    설명     : FastAPI 서버 설정 및 계정, 프로젝트, 업무, 산출물 관리 라우터 포함                  
 """
@@ -24,7 +24,7 @@ from dotenv import load_dotenv
 from pathlib import Path
 from logger import logger
 from datetime import datetime
-import os
+import os, asyncio
 
 # 라우터 추가 파트
 from account import router as account_router
@@ -39,6 +39,11 @@ from permission import router as permission_router
 from docs_converter import router as docs_router
 from subject import router as subject_router
 from professor import router as professor_router
+import ccp_retention  # CCP 버전 히스토리 보존 정책 스케줄러
+import deleted_project  # 삭제된 프로젝트 정보 저장소
+import batch_DB  # Database Project 연결을 사용하는 일괄 쿼리
+from storage_client import storage  # Storage 서버 공유 클라이언트
+from push import pusher  # Next.js 파일 전송 공유 클라이언트
 #from test import router as test_router  # Frontend Axios에서 API 통신 테스트를 위한 라우터
 
 # Database Project와의 연동을 위해 각 Router에 sys.path 경로 정의 필요
@@ -125,6 +130,20 @@ async def startup_event():
     logger.info("------------------------------------------------------------")
     logger.info(f"CodeCraft PMS Backend Server started at {server_start_time}")
     logger.info("------------------------------------------------------------")
+    await storage.start()
+    await pusher.start()
+    deleted_project.initialize()
+    try:
+        await asyncio.to_thread(batch_DB.verify_schema)
+    except Exception as e:
+        # 일괄 쿼리를 사용하는 API만 실패하므로 서버는 시작하되 원인을 바로 알 수 있도록 기록
+        logger.error(f"batch_DB schema check failed: {e}")
+    ccp_retention.start_scheduler()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await storage.aclose()
+    await pusher.aclose()
 
 @app.get("/")
 async def root():
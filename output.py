@@ -5,25 +5,30 @@
     생성자   : 김창환
 
     생성일   : 2024/10/20
-    업데이트 : 2025/04/26
+    업데이트 : 2026/10/18
 
     설명     : 산출물의 생성, 수정, 조회, 삭제, 업로드를 위한 API 엔드포인트 정의
 """
 
-from fastapi import APIRouter, HTTPException, File, UploadFile, Form
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, File, UploadFile, Form, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from starlette.background import BackgroundTask
 from pydantic import BaseModel
 from dotenv import load_dotenv
 from datetime import datetime
 from urllib.parse import quote
+from contextlib import asynccontextmanager
 from logger import logger
 from typing import List
-import sys, os, random, requests, json, logging, shutil, subprocess
+from storage_client import storage, StorageUnavailable
+import sys, os, json, logging, shutil, subprocess, hashlib, re, time, zipfile, asyncio, httpx
 
 sys.path.append(os.path.abspath('/data/Database Project'))  # Database Project와 연동하기 위해 사용
 import output_DB
+import batch_DB
 import push
+import file_cache
+import id_allocator
 
 router = APIRouter()
 
@@ -155,11 +160,485 @@ class OtherDocDownloadPayload(BaseModel):
     기타 산출물 다운로드 요청 모델
     """
     file_no: int
+    direct: bool = False  # True이면 Next.js로 push하지 않고 응답 본문으로 파일을 바로 전송
+
+
+class ProjectArchivePayload(BaseModel):
+    """프로젝트 파일 전체 다운로드 요청 모델"""
+    pid: int
+    doc_types: List[int] = None  # 첨부파일을 포함할 산출물 종류 (None이면 전체)
+    include_other: bool = True  # 기타 산출물 포함 여부
+    direct: bool = True  # False이면 응답 대신 Next.js로 push
 
 
 TEMP_DOWNLOAD_DIR = "/data/tmp"
 STORAGE_API_KEY = os.getenv('ST_KEY')
-STORAGE_SERVER_URL = "http://192.168.50.84:10080/api/output"
+STORAGE_SERVER_URL = "/output"  # storage_client.STORAGE_URL 기준 산출물 API 경로
+UPLOAD_REQUEST_LIMIT = int(os.getenv('UPLOAD_REQUEST_LIMIT', str(1024 * 1024 * 1024)))  # 요청 하나로 업로드할 수 있는 파일 크기 합 (bytes)
+UPLOAD_BUDGET = int(os.getenv('UPLOAD_BUDGET', str(512 * 1024 * 1024)))  # worker에서 동시에 Storage 서버로 전송 중인 업로드 크기 합 (bytes)
+OTHERDOC_UPLOAD_CONCURRENCY = int(os.getenv('OTHERDOC_UPLOAD_CONCURRENCY', '4'))  # 기타 산출물 요청 하나에서 동시에 업로드하는 파일 수
+UPLOAD_QUEUE_TIMEOUT = float(os.getenv('UPLOAD_QUEUE_TIMEOUT', '60'))  # 예산이 빌 때까지 업로드가 대기하는 최대 시간 (초)
+ARCHIVE_CONCURRENCY = int(os.getenv('ARCHIVE_CONCURRENCY', '4'))  # 프로젝트 압축 파일을 만들 때 Storage 서버에서 미리 받아 두는 파일 수
+ARCHIVE_QUEUE_CHUNKS = 16  # 미리 받는 파일마다 메모리에 보관하는 최대 블록 수
+# 첨부파일이 연결된 산출물 종류 (docs_converter와 같은 doc_type 번호): 산출물 목록 조회 함수와 번호 필드
+ATTACHMENT_DOCUMENTS = {
+    0: "doc_s_no",    # 프로젝트 개요서
+    1: "doc_m_no",    # 회의록
+    3: "doc_r_no",    # 요구사항 명세서
+    4: "doc_rep_no"   # 보고서
+}
+RANGE_PATTERN = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+# 기타 산출물/첨부파일 업로드는 파일 내용을 메모리로 읽지 않고, 요청 파싱 시 만들어진 임시 파일(UploadFile.file)을
+# multipart 본문으로 나누어 읽으며 Storage 서버로 전송한다. 재시도할 때는 storage 클라이언트가 파일 위치를 처음으로 되돌린다.
+# 업로드 크기는 두 단계로 제한한다.
+#   - 요청 하나의 파일 크기 합이 UPLOAD_REQUEST_LIMIT를 넘으면 전송 전에 413으로 거부
+#   - 동시에 전송 중인 업로드 크기 합이 UPLOAD_BUDGET을 넘으면 예산이 빌 때까지 대기하고,
+#     UPLOAD_QUEUE_TIMEOUT 안에 전송을 시작하지 못하면 503으로 거부
+class UploadBudget:
+    """동시에 전송 중인 업로드 크기 합을 제한하는 예산"""
+
+    def __init__(self, limit=UPLOAD_BUDGET):
+        self.limit = limit
+        self.in_use = 0
+        self.condition = None
+
+    @asynccontextmanager
+    async def reserve(self, size):
+        """size만큼 예산을 확보하고 블록을 벗어나면 반환 (예산이 부족하면 대기)"""
+        if size > self.limit:
+            raise HTTPException(status_code=413, detail=f"Upload of {size} bytes exceeds the upload budget ({self.limit} bytes)")
+        if self.condition is None:
+            self.condition = asyncio.Condition()
+        async with self.condition:
+            try:
+                await asyncio.wait_for(self.condition.wait_for(lambda: self.in_use + size <= self.limit), UPLOAD_QUEUE_TIMEOUT)
+            except asyncio.TimeoutError:
+                raise HTTPException(status_code=503, detail="Upload queue is full, try again later")
+            self.in_use += size
+        try:
+            yield
+        finally:
+            async with self.condition:
+                self.in_use -= size
+                self.condition.notify_all()
+
+
+upload_budget = UploadBudget()
+
+
+def upload_size(file):
+    """UploadFile의 크기 (bytes)"""
+    if file.size is not None:
+        return file.size
+    position = file.file.tell()
+    file.file.seek(0, os.SEEK_END)
+    size = file.file.tell()
+    file.file.seek(position)
+    return size
+
+
+def check_upload_request(files):
+    """요청 하나의 업로드 크기 합이 제한을 넘으면 거부"""
+    total = sum(upload_size(file) for file in files)
+    if total > UPLOAD_REQUEST_LIMIT:
+        raise HTTPException(status_code=413, detail=f"Upload of {total} bytes exceeds the per-request limit ({UPLOAD_REQUEST_LIMIT} bytes)")
+    return total
+
+
+async def upload_to_storage(path, file, data, headers):
+    """UploadFile을 메모리에 읽지 않고 Storage 서버로 나누어 전송"""
+    size = upload_size(file)
+    async with upload_budget.reserve(size):
+        logger.info(f"Streaming {size} bytes of {file.filename} to storage server: {path}")
+        file.file.seek(0)
+        files_payload = {"file": (file.filename, file.file, file.content_type)}
+        return await storage.post(path, op="upload", files=files_payload, data=data, headers=headers)
+
+
+# 기타 산출물/첨부파일 다운로드는 Storage 서버의 응답 스트림을 디스크에 저장하지 않고 그대로 전달한다.
+#   - direct=False (기존 동작): 스트림을 Next.js 파일 수신 API로 바로 전송 (push.push_stream_to_nextjs)
+#   - direct=True: 스트림을 StreamingResponse로 요청한 클라이언트에 전송
+#     Range(단일 구간), If-Range, If-None-Match를 지원하며 Content-Length, Content-Range, ETag를 함께 보낸다.
+#     Range는 Storage 서버로 전달하고, Storage 서버가 구간을 지원하지 않으면(200) 전송 중에 필요한 구간만 잘라 보낸다.
+def download_etag(response, file_path):
+    """다운로드 응답의 ETag (Storage 서버가 보내지 않으면 파일 경로와 크기로 생성)"""
+    etag = response.headers.get("etag")
+    if etag:
+        return etag
+    total = response_total_size(response)
+    digest = hashlib.sha256(f"{file_path}:{total}".encode()).hexdigest()[:32]
+    return f'W/"{digest}"'
+
+
+def response_total_size(response):
+    """Storage 서버 응답이 나타내는 파일 전체 크기 (알 수 없으면 None)"""
+    if response.headers.get("content-encoding", "identity") != "identity":
+        return None
+    content_range = response.headers.get("content-range", "")
+    if "/" in content_range and content_range.rsplit("/", 1)[1].isdigit():
+        return int(content_range.rsplit("/", 1)[1])
+    if response.status_code == 200 and response.headers.get("content-length", "").isdigit():
+        return int(response.headers["content-length"])
+    return None
+
+
+def parse_range(range_header, total):
+    """Range 헤더를 (시작, 끝) 바이트 구간으로 변환 (지원하지 않는 형식이면 None, 범위를 벗어나면 Exception)"""
+    match = RANGE_PATTERN.match(range_header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    start, end = match.groups()
+    if start == "":
+        length = int(end)
+        if length == 0:
+            raise Exception(f"Unsatisfiable range: {range_header}")
+        return max(total - length, 0), total - 1
+    start = int(start)
+    end = min(int(end), total - 1) if end != "" else total - 1
+    if start >= total or start > end:
+        raise Exception(f"Unsatisfiable range: {range_header}")
+    return start, end
+
+
+def etag_matches(header, etag):
+    """If-None-Match 헤더 값이 ETag와 일치하는지 확인 (약한 비교)"""
+    if not header:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
+def if_range_matches(header, etag):
+    """If-Range 헤더 값이 ETag와 일치하는지 확인 (강한 비교; 약한 ETag는 일치하지 않음, RFC 9110 13.1.5)"""
+    header = header.strip()
+    return not header.startswith("W/") and not etag.startswith("W/") and header == etag
+
+
+async def slice_stream(chunks, start, end):
+    """바이트 스트림에서 [start, end] 구간만 전달"""
+    position = 0
+    async for block in chunks:
+        block_end = position + len(block)
+        if block_end > start:
+            yield block[max(start - position, 0):end + 1 - position]
+        position = block_end
+        if position > end:
+            break
+
+
+def download_headers(etag, file_name, accept_ranges=True):
+    """다운로드 응답의 공통 헤더"""
+    return {
+        "ETag": etag,
+        "Accept-Ranges": "bytes" if accept_ranges else "none",
+        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(file_name)}",
+        "file-name": quote(file_name)
+    }
+
+
+def serve_cached_file(request, entry, file_name):
+    """로컬 캐시의 파일을 StreamingResponse로 클라이언트에 전송 (Range, If-Range, If-None-Match 지원)"""
+    etag = entry["etag"]
+    total = entry["size"]
+    headers = download_headers(etag, file_name)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        file_cache.release(entry)
+        return Response(status_code=304, headers={"ETag": etag})
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    status_code = 200
+    start, end = 0, total - 1
+    if range_header and (not if_range or if_range_matches(if_range, etag)):
+        try:
+            byte_range = parse_range(range_header, total)
+        except Exception:
+            file_cache.release(entry)
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{total}"})
+        if byte_range is not None:
+            start, end = byte_range
+            status_code = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{total}"
+    headers["Content-Length"] = str(end - start + 1)
+    logger.info(f"Serving {file_name} from local cache (status {status_code}, length {headers['Content-Length']})")
+    return StreamingResponse(file_cache.read_range(entry, start, end), status_code=status_code, headers=headers,
+                             media_type=entry.get("content_type") or "application/octet-stream",
+                             background=BackgroundTask(file_cache.release, entry))
+
+
+async def stream_storage_file(request, file_path, file_name, refs=()):
+    """Storage 서버의 파일을 디스크를 거치지 않고 StreamingResponse로 클라이언트에 전송 (로컬 캐시에 있으면 캐시에서 전송)
+
+    refs는 파일을 가리키는 DB 레코드 목록이며, 캐시 항목의 무효화에 사용된다.
+    """
+    entry = file_cache.lookup(file_path)
+    if entry is not None:
+        return serve_cached_file(request, entry, file_name)
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    storage_headers = {}
+    if range_header and not if_range:
+        # If-Range가 있으면 ETag를 확인한 뒤 구간을 정해야 하므로 전체를 요청하고 직접 자른다
+        storage_headers["Range"] = range_header
+    response = await storage.request("POST", f"{STORAGE_SERVER_URL}/otherdoc_download", op="download", stream=True,
+                                     data={"file_path": file_path}, headers=storage_headers)
+    try:
+        if response.status_code == 416:
+            await response.aread()
+            return Response(status_code=416, headers={"Content-Range": response.headers.get("content-range", "bytes */*")})
+        if response.status_code not in (200, 206):
+            await response.aread()
+            logger.error(f"Storage server error: {response.status_code} - {response.text}")
+            raise HTTPException(status_code=500, detail=f"Storage server error: {response.text}")
+
+        etag = download_etag(response, file_path)
+        total = response_total_size(response)
+        headers = download_headers(etag, file_name, total is not None)
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            await response.aclose()
+            return Response(status_code=304, headers={"ETag": etag})
+
+        status_code = 200
+        chunks = response.aiter_bytes()
+        if response.status_code == 206:
+            status_code = 206
+            headers["Content-Range"] = response.headers["content-range"]
+            if response.headers.get("content-length", "").isdigit():
+                headers["Content-Length"] = response.headers["content-length"]
+        elif total is not None:
+            byte_range = None
+            if range_header and (not if_range or if_range_matches(if_range, etag)):
+                try:
+                    byte_range = parse_range(range_header, total)
+                except Exception:
+                    await response.aclose()
+                    return Response(status_code=416, headers={"Content-Range": f"bytes */{total}"})
+            if byte_range is not None:
+                start, end = byte_range
+                status_code = 206
+                chunks = slice_stream(chunks, start, end)
+                headers["Content-Range"] = f"bytes {start}-{end}/{total}"
+                headers["Content-Length"] = str(end - start + 1)
+            else:
+                headers["Content-Length"] = str(total)
+        if response.headers.get("content-type"):
+            media_type = response.headers["content-type"]
+        else:
+            media_type = "application/octet-stream"
+        if status_code == 200 and total is not None:
+            # 파일 전체를 전송하는 경우에만 전송하면서 로컬 캐시에 저장
+            chunks = file_cache.tee(file_path, chunks, refs, etag, media_type, total)
+    except BaseException:
+        await response.aclose()
+        raise
+    logger.info(f"Streaming {file_name} to client (status {status_code}, length {headers.get('Content-Length', 'unknown')})")
+    return StreamingResponse(chunks, status_code=status_code, headers=headers, media_type=media_type,
+                             background=BackgroundTask(response.aclose))
+
+
+async def push_storage_file(file_path, file_name, refs=()):
+    """Storage 서버의 파일을 디스크를 거치지 않고 Next.js로 전송 (로컬 캐시에 있으면 캐시에서 전송)"""
+    entry = file_cache.lookup(file_path)
+    if entry is not None:
+        logger.info(f"Pushing {file_name} to Next.js from local cache")
+        try:
+            return await push.pusher.send(lambda: file_cache.read_range(entry, 0, entry["size"] - 1), file_name, entry["size"])
+        finally:
+            file_cache.release(entry)
+    async with storage.stream(f"{STORAGE_SERVER_URL}/otherdoc_download", data={"file_path": file_path}) as response:
+        if response.status_code != 200:
+            await response.aread()
+            logger.error(f"Storage server error: {response.status_code} - {response.text}")
+            raise HTTPException(status_code=500, detail=f"Storage server error: {response.text}")
+        logger.info(f"Streaming file to Next.js: {file_name}")
+        total = response_total_size(response)
+        chunks = response.aiter_bytes()
+        if total is not None:
+            chunks = file_cache.tee(file_path, chunks, refs, download_etag(response, file_path), response.headers.get("content-type"), total)
+        return await push.push_stream_to_nextjs(chunks, file_name, total)
+
+
+# 프로젝트 파일 전체 다운로드는 기타 산출물과 첨부파일을 zip 파일 하나로 묶어 만들어지는 대로 전송한다.
+#   - Storage 서버(또는 로컬 캐시)에서 ARCHIVE_CONCURRENCY개 파일을 미리 받으며, 파일마다 최대 ARCHIVE_QUEUE_CHUNKS개
+#     블록만 메모리에 보관하므로 프로젝트 크기와 관계없이 메모리 사용량이 일정하다.
+#   - zip 항목은 압축하지 않고(ZIP_STORED, 산출물은 대부분 이미 압축된 형식) 데이터 디스크립터와 ZIP64로 기록하므로
+#     파일 크기를 미리 알 필요가 없다.
+#   - 받지 못한 파일은 건너뛰고 MISSING_FILES.txt에 기록한다 (응답이 이미 시작된 뒤이므로 오류로 중단하지 않음).
+class ArchiveBuffer:
+    """zipfile이 기록한 바이트를 모아 두었다가 스트림으로 전달하는 쓰기 전용 버퍼"""
+
+    def __init__(self):
+        self.blocks = []
+
+    def write(self, data):
+        self.blocks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.blocks)
+        self.blocks.clear()
+        return data
+
+
+def safe_file_name(name):
+    """DB에 저장된 파일 이름을 압축 파일 항목 이름으로 사용할 수 있게 정리 (경로 구분자와 상위 경로 제거)"""
+    name = str(name or "").replace("\\", "/").rsplit("/", 1)[-1]
+    name = "".join(ch for ch in name if ch.isprintable()).strip().lstrip(".")
+    return name or "unnamed"
+
+
+def unique_archive_name(folder, file_name, used):
+    """folder 안에서 이름이 겹치지 않도록 번호를 붙인 압축 파일 항목 이름 (대소문자만 다른 이름도 겹치는 것으로 봄)"""
+    stem, ext = os.path.splitext(safe_file_name(file_name))
+    candidate = f"{folder}/{stem}{ext}"
+    counter = 2
+    while candidate.lower() in used:
+        candidate = f"{folder}/{stem} ({counter}){ext}"
+        counter += 1
+    used.add(candidate.lower())
+    return candidate
+
+
+def fetch_attachment_documents(doc_type, pid):
+    """첨부파일을 가질 수 있는 산출물 목록 조회"""
+    if doc_type == 0:
+        return output_DB.fetch_all_summary_documents(pid)
+    if doc_type == 1:
+        return output_DB.fetch_all_meeting_minutes(pid)
+    if doc_type == 3:
+        return output_DB.fetch_all_reqspec(pid)
+    return output_DB.fetch_all_report(pid)
+
+
+def collect_project_files(pid, doc_types=None, include_other=True):
+    """프로젝트의 기타 산출물과 첨부파일 목록 [(압축 파일 내 이름, file_path, refs)]"""
+    files = []
+    used = set()
+    if include_other:
+        for document in output_DB.fetch_all_other_documents(pid) or []:
+            refs = [("otherdoc", document[key]) for key in ("file_no", "file_unique_id") if document.get(key) is not None]
+            files.append((unique_archive_name("기타산출물", document['file_name'], used), document['file_path'], refs))
+    for doc_type, key in ATTACHMENT_DOCUMENTS.items():
+        if doc_types is not None and doc_type not in doc_types:
+            continue
+        for document in fetch_attachment_documents(doc_type, pid) or []:
+            for att in output_DB.fetch_all_attachments(doc_type, document[key], pid) or []:
+                name = unique_archive_name(f"첨부파일/{doc_type}_{document[key]}", att['doc_a_name'], used)
+                files.append((name, att['doc_a_path'], [("attach", att['doc_a_no'])]))
+    return files
+
+
+async def fetch_archive_file(file_path, refs, queue):
+    """압축 파일에 넣을 파일을 로컬 캐시 또는 Storage 서버에서 받아 queue에 넣음 (끝은 None, 실패하면 Exception)"""
+    try:
+        entry = file_cache.lookup(file_path)
+        if entry is not None:
+            try:
+                async for block in file_cache.read_range(entry, 0, entry["size"] - 1):
+                    await queue.put(block)
+            finally:
+                file_cache.release(entry)
+        else:
+            async with storage.stream(f"{STORAGE_SERVER_URL}/otherdoc_download", data={"file_path": file_path}) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    raise Exception(f"Storage server error: {response.status_code} - {response.text}")
+                total = response_total_size(response)
+                chunks = response.aiter_bytes()
+                if total is not None:
+                    chunks = file_cache.tee(file_path, chunks, refs, download_etag(response, file_path), response.headers.get("content-type"), total)
+                async for block in chunks:
+                    await queue.put(block)
+        await queue.put(None)
+    except Exception as e:
+        await queue.put(e)
+
+
+async def project_archive_stream(pid, files):
+    """파일 목록을 zip 스트림으로 만들어 전달 (Storage 서버에서 받는 동시에 기록)"""
+    buffer = ArchiveBuffer()
+    archive = zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED, allowZip64=True)
+    fetches = {}
+    current = None  # 지금 기록 중인 파일의 fetch Task (fetches에서 꺼낸 뒤에도 종료 시 취소해야 함)
+    missing = []
+
+    def start_fetch(index):
+        if index < len(files):
+            queue = asyncio.Queue(ARCHIVE_QUEUE_CHUNKS)
+            _, file_path, refs = files[index]
+            fetches[index] = (queue, asyncio.create_task(fetch_archive_file(file_path, refs, queue)))
+
+    started = time.monotonic()
+    total_bytes = 0
+    try:
+        for index in range(ARCHIVE_CONCURRENCY):
+            start_fetch(index)
+        for index, (name, file_path, _) in enumerate(files):
+            queue, current = fetches.pop(index)
+            start_fetch(index + ARCHIVE_CONCURRENCY)
+            info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_STORED
+            entry = None
+            written = 0
+            while True:
+                block = await queue.get()
+                if block is None:
+                    if entry is None:
+                        entry = archive.open(info, "w", force_zip64=True)  # 빈 파일
+                    break
+                if isinstance(block, Exception):
+                    # 일부를 이미 기록했다면 받은 부분까지만 남고 MISSING_FILES.txt에 불완전한 파일로 기록
+                    logger.warning(f"Skipping {file_path} in archive of project {pid}: {block}")
+                    missing.append(f"{name}: {block}" if written == 0 else f"{name}: incomplete ({written} bytes) - {block}")
+                    break
+                if entry is None:
+                    entry = archive.open(info, "w", force_zip64=True)
+                entry.write(block)
+                written += len(block)
+                data = buffer.drain()
+                if data:
+                    total_bytes += len(data)
+                    yield data
+            if entry is not None:
+                entry.close()
+        if missing:
+            archive.writestr("MISSING_FILES.txt", "\n".join(missing) + "\n")
+        archive.close()
+        data = buffer.drain()
+        total_bytes += len(data)
+        yield data
+        logger.info(f"Archive of project {pid} sent: {len(files)} files ({len(missing)} missing), "
+                    f"{total_bytes} bytes in {time.monotonic() - started:.2f}s")
+    finally:
+        # 클라이언트 연결이 끊겨 중간에 종료되면 queue.put에서 대기 중인 Task와 Storage 연결을 정리
+        for task in [current] + [task for _, task in fetches.values()]:
+            if task is not None:
+                task.cancel()
+
+
+@router.post("/output/project_archive")
+async def api_project_archive(payload: ProjectArchivePayload):
+    """프로젝트의 기타 산출물과 첨부파일 전체를 zip 파일 하나로 전송 (doc_types로 첨부파일의 산출물 종류를 선택)"""
+    logger.info(f"Building file archive for project {payload.pid} (doc_types={payload.doc_types}, include_other={payload.include_other})")
+    try:
+        files = await asyncio.to_thread(collect_project_files, payload.pid, payload.doc_types, payload.include_other)
+    except Exception as e:
+        logger.error(f"Error collecting files for project {payload.pid}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error collecting project files: {e}")
+    if not files:
+        raise HTTPException(status_code=404, detail="No files found for the project")
+    archive_name = f"project_{payload.pid}.zip"
+    logger.info(f"Streaming {len(files)} files of project {payload.pid} as {archive_name}")
+    if not payload.direct:
+        return await push.push_stream_to_nextjs(project_archive_stream(payload.pid, files), archive_name)
+    return StreamingResponse(project_archive_stream(payload.pid, files), media_type="application/zip", headers={
+        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(archive_name)}",
+        "file-name": quote(archive_name)
+    })
 
 
 @router.post("/output/sum_doc_add")
@@ -687,12 +1166,86 @@ async def delete_report(payload: DocumentDeletePayload):
         raise HTTPException(status_code=500, detail=f"Error deleting report: {e}")
 
 
-def gen_file_uid():
+# 파일 고유 ID는 10,000,000부터 int형 최대값까지 순서대로 발급한다. 기존 random 방식의 ID는 1~2,147,483,647 전체에
+# 흩어져 있어 이 범위 안에도 있으므로, 블록을 예약할 때 FILE_ID_SOURCES의 IN 조회로 이미 사용 중인 번호를 건너뛴다.
+# (중복 방지는 이 조회에 의존하므로 범위와 관계없이 조회를 생략하면 안 됨)
+file_ids = id_allocator.IdAllocator("file", 10_000_000, 2_147_483_647, 256, batch_DB.FILE_ID_SOURCES)
+
+
+async def gen_file_uid():
     """파일 고유 ID 생성"""
-    while True:
-        tmp_uid = random.randint(1, 2_147_483_647)  # 본래 9,999,999이었으나, int형 최대 범위 때문에 줄임
-        if not output_DB.is_uid_exists(tmp_uid):
-            return tmp_uid
+    return await file_ids.allocate_async()
+
+
+async def upload_other_document(idx, total_files, file, file_unique_id, pid, univ_id, headers, semaphore, state):
+    """기타 산출물 파일 하나를 Storage 서버에 업로드하고 저장 정보를 반환 (앞선 파일이 실패했으면 None)"""
+    async with semaphore:
+        if state["failed"] is not None and state["failed"] < idx:
+            # 앞선 파일이 실패하면 그 이후 파일은 어차피 롤백되므로 아직 시작하지 않은 업로드는 건너뜀
+            return None
+        logger.info(f"[{idx}/{total_files}] Processing file: {file.filename} (file unique id: {file_unique_id})")
+        data = {
+            "fuid": file_unique_id,
+            "pid": pid,
+            "userid": univ_id
+        }
+        try:
+            # 연결 오류와 5xx 응답은 storage 클라이언트가 백오프로 재시도
+            try:
+                logger.info(f"Uploading file {file.filename} to storage server")
+                response = await upload_to_storage(f"{STORAGE_SERVER_URL}/otherdoc_add", file, data, headers)
+            except (httpx.HTTPError, StorageUnavailable) as req_exc:
+                logger.error(f"Request failed for file {file.filename}: {str(req_exc)}", exc_info=True)
+                raise HTTPException(status_code=500, detail=f"Request failed for {file.filename}: {str(req_exc)}")
+            if response.status_code != 200:
+                error_msg = (f"File upload failed for {file.filename} "
+                             f"with status code {response.status_code}: {response.text}")
+                logger.error(error_msg)
+                raise HTTPException(status_code=response.status_code, detail=error_msg)
+            logger.info(f"File upload succeeded for {file.filename}")
+            response_data = response.json()
+            logger.info(f"Received response for file {file.filename}: {response_data}")
+            file_path = response_data.get("FILE_PATH")
+            uploaded_date = response_data.get("uploaded_date")
+            if not uploaded_date:
+                error_msg = f"uploaded_date is missing in the response for {file.filename}"
+                logger.error(error_msg)
+                raise HTTPException(status_code=500, detail=error_msg)
+            try:
+                uploaded_date = datetime.strptime(uploaded_date, "%y%m%d-%H%M%S").strftime("%Y-%m-%d %H:%M:%S")
+                logger.info(f"Parsed uploaded_date for file {file.filename}: {uploaded_date}")
+            except Exception as parse_error:
+                error_msg = f"Error parsing uploaded_date for {file.filename}: {str(parse_error)}"
+                logger.error(error_msg, exc_info=True)
+                raise HTTPException(status_code=500, detail=error_msg)
+        except Exception:
+            state["failed"] = idx if state["failed"] is None else min(state["failed"], idx)
+            raise
+        return {
+            "file_unique_id": file_unique_id,
+            "file_name": file.filename,
+            "file_path": file_path,
+            "file_date": uploaded_date
+        }
+
+
+def save_other_documents(documents, pid, univ_id):
+    """업로드된 기타 산출물의 메타데이터를 하나의 트랜잭션으로 DB에 저장 (작업 스레드에서 호출, 실패하면 Exception)"""
+    saved = batch_DB.add_other_documents(documents, pid, univ_id)
+    logger.info(f"Saved metadata of {saved} other documents for project {pid}")
+    return saved
+
+
+def remove_uploaded_files(file_paths):
+    """DB에 저장하지 못한 업로드 파일을 저장소에서 삭제"""
+    for file_path in file_paths:
+        if not file_path:
+            continue
+        try:
+            os.remove(file_path)
+            logger.info(f"Removed file from storage: {file_path}")
+        except Exception as remove_exc:
+            logger.error(f"Failed to remove file {file_path}: {str(remove_exc)}", exc_info=True)
 
 
 @router.post("/output/otherdoc_add")
@@ -703,6 +1256,10 @@ async def add_other_documents(
 ):
     """
     기타 산출물 추가 API
+
+    파일은 최대 OTHERDOC_UPLOAD_CONCURRENCY개씩 동시에 업로드하고, 메타데이터는 한 번에 저장한다.
+    결과와 실패 처리는 순서대로 처리한 것과 같다: 처음 실패한 파일 앞의 파일만 저장되고,
+    그 이후에 업로드된 파일은 삭제된 뒤 처음 실패한 파일의 오류를 반환한다.
     """
     logger.info("------------------------------------------------------------")
     logger.info("Starting process to add other documents")
@@ -710,104 +1267,44 @@ async def add_other_documents(
         load_dotenv()
         logger.info("Environment variables loaded successfully")
         headers = {"Authorization": os.getenv('ST_KEY')}
-        attachments = []
         total_files = len(files)
-        logger.info(f"Number of files to process: {total_files}")
-        for idx, file in enumerate(files, start=1):
-            logger.info(f"[{idx}/{total_files}] Processing file: {file.filename}")
-            file_unique_id = gen_file_uid()
-            logger.info(f"Generated file unique id: {file_unique_id} for file: {file.filename}")
-            data = {
-                "fuid": file_unique_id,
-                "pid": pid,
-                "userid": univ_id
-            }
-            file_content = await file.read()
-            logger.info(f"Read {len(file_content)} bytes from file: {file.filename}")
-
-            files_payload = {"file": (file.filename, file_content, file.content_type)}
-            # 최대 3회 재시도
-            max_attempts = 3
-            for attempt in range(1, max_attempts + 1):
-                try:
-                    logger.info(f"Uploading file {file.filename} to storage server (Attempt {attempt})")
-                    response = requests.post(
-                        "http://192.168.50.84:10080/api/output/otherdoc_add",
-                        files=files_payload,
-                        data=data,
-                        headers=headers,
-                        timeout=60
-                    )
-                    if response.status_code == 200:
-                        logger.info(f"File upload succeeded on attempt {attempt} for {file.filename}")
-                        break
-                    else:
-                        error_msg = (f"File upload failed for {file.filename} on attempt {attempt} "
-                                     f"with status code {response.status_code}: {response.text}")
-                        logger.error(error_msg)
-                        if attempt == max_attempts:
-                            raise HTTPException(
-                                status_code=response.status_code,
-                                detail=error_msg
-                            )
-                except requests.exceptions.RequestException as req_exc:
-                    logger.error(
-                        f"RequestException on attempt {attempt} for file {file.filename}: {str(req_exc)}",
-                        exc_info=True
-                    )
-                    if attempt == max_attempts:
-                        raise HTTPException(
-                            status_code=500,
-                            detail=f"Request failed for {file.filename} after {attempt} attempts: {str(req_exc)}"
-                        )
-            response_data = response.json()
-            logger.info(f"Received response for file {file.filename}: {response_data}")
-            file_path = response_data.get("FILE_PATH")
-            uploaded_date = response_data.get("uploaded_date")
-            if uploaded_date:
-                try:
-                    uploaded_date = datetime.strptime(uploaded_date, "%y%m%d-%H%M%S").strftime("%Y-%m-%d %H:%M:%S")
-                    logger.info(f"Parsed uploaded_date for file {file.filename}: {uploaded_date}")
-                except Exception as parse_error:
-                    error_msg = f"Error parsing uploaded_date for {file.filename}: {str(parse_error)}"
-                    logger.error(error_msg, exc_info=True)
-                    raise HTTPException(status_code=500, detail=error_msg)
-            else:
-                error_msg = f"uploaded_date is missing in the response for {file.filename}"
-                logger.error(error_msg)
-                raise HTTPException(status_code=500, detail=error_msg)
-            logger.info(f"Saving metadata to database for file: {file.filename}")
-            db_result = output_DB.add_other_document(
-                file_unique_id=file_unique_id,
-                file_name=file.filename,
-                file_path=file_path,
-                file_date=uploaded_date,
-                univ_id=univ_id,
-                pid=pid
-            )
-            if not db_result:
-                logger.error(f"Database failed to save metadata for {file.filename}. Removing file from storage.")
-                try:
-                    os.remove(file_path)
-                    logger.info(f"Removed file from storage: {file_path}")
-                except Exception as remove_exc:
-                    logger.error(f"Failed to remove file {file_path}: {str(remove_exc)}", exc_info=True)
+        total_size = check_upload_request(files)
+        logger.info(f"Number of files to process: {total_files} ({total_size} bytes)")
+        file_unique_ids = [await gen_file_uid() for _ in files]
+
+        semaphore = asyncio.Semaphore(OTHERDOC_UPLOAD_CONCURRENCY)
+        state = {"failed": None}  # 실패한 파일 중 가장 앞선 파일의 순번
+        results = await asyncio.gather(*[
+            upload_other_document(idx, total_files, file, file_unique_id, pid, univ_id, headers, semaphore, state)
+            for idx, (file, file_unique_id) in enumerate(zip(files, file_unique_ids), start=1)
+        ], return_exceptions=True)
+
+        failed = next((i for i, result in enumerate(results) if isinstance(result, BaseException)), len(results))
+        documents = results[:failed]
+        failure = results[failed] if failed < len(results) else None
+        discarded_paths = [result["file_path"] for result in results[failed:] if isinstance(result, dict)]
+
+        if documents:
+            logger.info(f"Saving metadata to database for {len(documents)} files")
+            try:
+                await asyncio.to_thread(save_other_documents, documents, pid, univ_id)
+            except Exception as db_exc:
+                # 일괄 저장은 전부 저장되거나 하나도 저장되지 않으므로 업로드한 파일을 모두 삭제
+                logger.error(f"Database failed to save metadata for {len(documents)} files: {db_exc}. Removing files from storage.", exc_info=True)
+                remove_uploaded_files([document["file_path"] for document in documents] + discarded_paths)
                 raise HTTPException(
                     status_code=500,
                     detail="File uploaded but failed to save metadata to the database."
                 )
-            logger.info(f"File processed successfully: {file.filename}")
-            attachments.append({
-                "file_unique_id": file_unique_id,
-                "file_name": file.filename,
-                "file_path": file_path,
-                "file_date": uploaded_date
-            })
+        if failure is not None:
+            remove_uploaded_files(discarded_paths)
+            raise failure
+
         logger.info("All files processed successfully")
         return {
             "RESULT_CODE": 200,
             "RESULT_MSG": "Files uploaded and metadata saved successfully.",
-            "PAYLOADS": attachments
+            "PAYLOADS": documents
         }
     except HTTPException as http_exc:
         logger.error(f"HTTPException occurred: {http_exc.detail}")
@@ -831,6 +1328,8 @@ async def edit_otherdoc_path(file_unique_id: int = Form(...), new_file_path: str
             new_file_path=new_file_path
         )
         if result:
+            file_cache.invalidate_record("otherdoc", file_unique_id)
+            file_cache.invalidate_path(new_file_path)
             logger.info(f"File path updated successfully for file_unique_id: {file_unique_id}")
             return {"RESULT_CODE": 200, "RESULT_MSG": "File path updated successfully"}
         else:
@@ -902,6 +1401,7 @@ async def delete_other_document(payload: OtherDocDownloadPayload):
     try:
         result = output_DB.delete_other_document(payload.file_no)
         if result:
+            file_cache.invalidate_record("otherdoc", payload.file_no)
             logger.info(f"Other document deleted successfully for file_no: {payload.file_no}")
             return {"RESULT_CODE": 200, "RESULT_MSG": "Other document deleted successfully"}
         else:
@@ -913,19 +1413,17 @@ async def delete_other_document(payload: OtherDocDownloadPayload):
 
 
 @router.post("/output/otherdoc_download")
-async def api_otherdoc_download(payload: OtherDocDownloadPayload):
+async def api_otherdoc_download(payload: OtherDocDownloadPayload, request: Request):
     """
-        API 서버가 Storage 서버에서 파일을 복사해 프론트로 전송
+        API 서버가 Storage 서버에서 파일을 받아 프론트로 전송
         다운로드 흐름
         1. Next.JS에서 file_no를 인자로 API Server에 요청
         2. API Server에서는 해당 file_no 인자를 이용해서 다운로드하고자 하는 파일의 이름(file_name)과 경로(file_path)를 db에서 확인
         3. 확인한 경로를 Storage Server에 인자로 전달
-        4. Storage Server에서 해당 경로에 있는 파일을 form 데이터로 다시 API Server에 전달
-        5. API Server에서 form 데이터를 받으면 그것을 /data/tmp에 저장하되, 파일 이름은 db에서 확인한 파일 이름을 사용
-        6. 저장한 파일을 Next.JS에 post로 전달하며, 해당 파일의 원본 이름은 헤더에 저장
+        4. Storage Server의 응답 스트림을 디스크에 저장하지 않고 그대로 전달
+           - direct=False: Next.JS에 post로 전달하며, 해당 파일의 원본 이름은 헤더에 저장
+           - direct=True: 요청에 대한 응답 본문으로 전달 (Range, ETag 지원)
     """
-    temp_file_path = None  # 파일 삭제를 위해 finally에서 접근하기 위한 변수
-
     try:
         # 1. DB에서 파일 정보 조회
         logger.info(f"Fetching file info from DB for file_no: {payload.file_no}")
@@ -938,54 +1436,27 @@ async def api_otherdoc_download(payload: OtherDocDownloadPayload):
         file_path = file_info['file_path']
         file_name = file_info['file_name']
         logger.info(f"File info retrieved: {file_name} at {file_path}")
+        refs = {("otherdoc", payload.file_no)}
+        if file_info.get('file_unique_id') is not None:
+            refs.add(("otherdoc", file_info['file_unique_id']))
 
-        # 2. Storage 서버에서 파일 요청
+        # 2. Storage 서버에서 파일 요청 후 전달 (로컬 캐시에 있으면 캐시에서 전달)
         logger.info(f"Requesting file from Storage Server: {file_path}")
         try:
-            response = requests.post(
-                "http://192.168.50.84:10080/api/output/otherdoc_download",
-                data={"file_path": file_path},
-                # headers={"Authorization": STORAGE_API_KEY},
-                stream=True,
-                timeout=60
-            )
-        except requests.exceptions.RequestException as e:
+            if payload.direct:
+                return await stream_storage_file(request, file_path, file_name, refs)
+            return await push_storage_file(file_path, file_name, refs)
+        except (httpx.HTTPError, StorageUnavailable) as e:
             logger.error(f"Failed to request file from storage server: {str(e)}", exc_info=True)
             raise HTTPException(status_code=500, detail=f"Request to storage server failed: {str(e)}")
 
-        if response.status_code != 200:
-            logger.error(f"Storage server response error: {response.status_code} - {response.text}")
-            raise HTTPException(status_code=500, detail=f"Failed to download file: {response.text}")
-
-        # 3. 파일을 /data/tmp에 저장
-        logger.info(f"Saving file to temporary directory: {TEMP_DOWNLOAD_DIR}")
-        temp_file_path = os.path.join(TEMP_DOWNLOAD_DIR, file_name)
-
-        try:
-            with open(temp_file_path, "wb") as f:
-                shutil.copyfileobj(response.raw, f)
-            logger.info(f"File saved to {temp_file_path}")
-        except Exception as e:
-            logger.error(f"Failed to save file to {temp_file_path}: {str(e)}", exc_info=True)
-            raise HTTPException(status_code=500, detail=f"File save error: {str(e)}")
-
-        # 4. Next.js에 파일 데이터 전송
-        logger.info(f"Pushing file to Next.js: {file_name}")
-        push.push_to_nextjs(temp_file_path, file_name)
-
+    except HTTPException:
+        # 404 등 이미 정한 응답은 그대로 전달
+        raise
     except Exception as e:
         logger.error(f"Unexpected error during file transfer: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
-    finally:
-        # 5. 전송 후 임시 파일 삭제
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                os.remove(temp_file_path)
-                logger.info(f"Temporary file deleted: {temp_file_path}")
-            except Exception as e:
-                logger.error(f"Failed to delete temporary file {temp_file_path}: {str(e)}", exc_info=True)
-
 
 @router.post("/output/load_type")
 async def api_otherdoc_type(payload: OtherDocumentPayload):
@@ -1013,9 +1484,10 @@ async def add_attachments(
     headers = {"Authorization": STORAGE_API_KEY}
 
     try:
+        check_upload_request(files)
         for file in files:
             logger.info(f"Processing attachment: {file.filename}")
-            fuid = gen_file_uid()
+            fuid = await gen_file_uid()
             logger.info(f"Generated file unique ID: {fuid} for file: {file.filename}")
             
             data = {
@@ -1024,13 +1496,7 @@ async def add_attachments(
                 "userid": univ_id,
                 "doc_type": doc_type
             }
-            file_content = await file.read()
-            logger.info(f"Read {len(file_content)} bytes from file: {file.filename}")
-            files_payload = {"file": (file.filename, file_content, file.content_type)}
-            storage_url = f"{STORAGE_SERVER_URL}/attach_add"
-            logger.info(f"Uploading file {file.filename} to storage server: {storage_url}")
-            
-            response = requests.post(storage_url, files=files_payload, data=data, headers=headers)
+            response = await upload_to_storage(f"{STORAGE_SERVER_URL}/attach_add", file, data, headers)
             if response.status_code != 200:
                 logger.error(f"Storage server error for file {file.filename}: {response.status_code} - {response.text}")
                 raise HTTPException(status_code=response.status_code, detail=f"Storage server error: {response.text}")
@@ -1063,6 +1529,8 @@ async def add_attachments(
             "RESULT_MSG": "Attachments uploaded successfully",
             "PAYLOADS": attachments
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in add_attachments endpoint: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error uploading attachments: {str(e)}")
@@ -1090,13 +1558,14 @@ async def fetch_attachments(
 
 @router.post("/output/attach_download")
 async def download_attachment(
+    request: Request,
     doc_a_no: int = Form(...),
     doc_type: int = Form(...),
     doc_no: int = Form(...),
-    p_no: int = Form(...)
+    p_no: int = Form(...),
+    direct: bool = Form(False)
 ):
     logger.info(f"Downloading attachment: doc_a_no={doc_a_no}, doc_type={doc_type}, doc_no={doc_no}, p_no={p_no}")
-    temp_file_path = None
 
     try:
         # 1. DB에서 첨부파일 리스트 조회
@@ -1113,26 +1582,12 @@ async def download_attachment(
         file_name = attachment['doc_a_name']
         logger.info(f"Found attachment: {file_name} at path {file_path}")
         
-        # 3. Storage 서버에서 파일 다운로드
-        storage_download_url = f"{STORAGE_SERVER_URL}/otherdoc_download"
-        logger.info(f"Requesting file from storage server at {storage_download_url} with file_path={file_path}")
-        response = requests.post(storage_download_url, data={"file_path": file_path}, stream=True, timeout=60)
-        if response.status_code != 200:
-            logger.error(f"Storage server error: {response.status_code} - {response.text}")
-            raise HTTPException(status_code=response.status_code, detail=f"Storage server error: {response.text}")
-        
-        # 4. 임시 디렉터리에 저장
-        os.makedirs(TEMP_DOWNLOAD_DIR, exist_ok=True)
-        temp_file_path = os.path.join(TEMP_DOWNLOAD_DIR, file_name)
-        logger.info(f"Saving file to temporary path: {temp_file_path}")
-        with open(temp_file_path, "wb") as f:
-            shutil.copyfileobj(response.raw, f)
-        logger.info(f"File saved to {temp_file_path}")
-        
-        # 5. Next.js 서버로 전송
-        logger.info(f"Pushing file to Next.js: {file_name}")
-        result = push.push_to_nextjs(temp_file_path, file_name)
-        return result
+        # 3. Storage 서버에서 받은 스트림을 클라이언트 또는 Next.js 서버로 바로 전송 (로컬 캐시에 있으면 캐시에서 전송)
+        logger.info(f"Requesting file from storage server with file_path={file_path}")
+        refs = [("attach", doc_a_no)]
+        if direct:
+            return await stream_storage_file(request, file_path, file_name, refs)
+        return await push_storage_file(file_path, file_name, refs)
 
     except HTTPException:
         # 이미 HTTPException으로 적절한 응답을 던진 상태
@@ -1141,15 +1596,6 @@ async def download_attachment(
         logger.error(f"Error in download_attachment: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error downloading attachment: {e}")
 
-    finally:
-        # 6. 임시 파일 즉시 삭제
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                os.remove(temp_file_path)
-                logger.info(f"Temporary file deleted: {temp_file_path}")
-            except Exception as e:
-                logger.error(f"Failed to delete temporary file {temp_file_path}: {e}", exc_info=True)
-
 @router.post("/output/attach_edit_name")
 async def edit_attachment_name(
     doc_a_no: int = Form(...),
@@ -1180,6 +1626,8 @@ async def edit_attachment_path(
     try:
         result = output_DB.edit_attachment_path(doc_a_no, new_file_path)
         if result:
+            file_cache.invalidate_record("attach", doc_a_no)
+            file_cache.invalidate_path(new_file_path)
             logger.info(f"Attachment path updated successfully for doc_a_no={doc_a_no}")
             return {"RESULT_CODE": 200, "RESULT_MSG": "Attachment path updated successfully"}
         else:
@@ -1199,6 +1647,7 @@ async def delete_attachment(
     try:
         result = output_DB.delete_one_attachment(doc_a_no)
         if result:
+            file_cache.invalidate_record("attach", doc_a_no)
             logger.info(f"Attachment deleted successfully for doc_a_no={doc_a_no}")
             return {"RESULT_CODE": 200, "RESULT_MSG": "Attachment deleted successfully"}
         else:
@@ -1207,3 +1656,14 @@ async def delete_attachment(
     except Exception as e:
         logger.error(f"Error deleting attachment for doc_a_no={doc_a_no}: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error deleting attachment: {e}")
+
+
+@router.post("/output/cache_stats")
+async def api_cache_stats():
+    """산출물/첨부파일 다운로드 캐시의 조회 통계와 사용량 조회 (통계는 요청을 처리한 worker 기준)"""
+    try:
+        result = await asyncio.to_thread(file_cache.snapshot)
+        return {"RESULT_CODE": 200, "RESULT_MSG": "Cache stats fetched successfully", "PAYLOAD": result}
+    except Exception as e:
+        logger.error(f"Error fetching download cache stats: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error fetching cache stats: {e}")
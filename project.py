@@ -5,7 +5,7 @@
    생성자   : 김창환                                
                                                                               
    생성일   : 2024/10/16
-   업데이트 : 2025/04/13
+   업데이트 : 2026/10/18
                                                                              
    설명     : 프로젝트의 생성, 수정, 조회를 위한 API 엔드포인트 정의
 """
@@ -16,8 +16,8 @@ from pydantic import BaseModel
 from dotenv import load_dotenv
 from logger import logger
 from datetime import datetime
-import random  # gen_project_uid 함수에서 사용
-import sys, os, requests, json
+from storage_client import storage, StorageUnavailable
+import sys, os, json, httpx
 
 sys.path.append(os.path.abspath('/data/Database Project'))  # Database Project와 연동하기 위해 사용
 import project_DB
@@ -26,6 +26,10 @@ import account_DB
 import permission
 import wbs
 import output
+import deleted_project
+import ccp_history
+import id_allocator
+import batch_DB
 
 router = APIRouter()
 
@@ -121,49 +125,33 @@ class FindProf_Payload(BaseModel):
     univ_id: int
 
 # 유틸리티 함수
-def gen_project_uid():
+project_ids = id_allocator.IdAllocator("project", 10000, 99999, 16, batch_DB.PROJECT_ID_SOURCES)  # 프로젝트 번호는 5자리 유지
+
+async def gen_project_uid():
     """프로젝트 고유 ID 생성"""
-    while True:
-        tmp_uid = random.randint(10000, 99999)
-        if not project_DB.is_uid_exists(tmp_uid):
-            return tmp_uid
+    return await project_ids.allocate_async()
 
-def init_file_system(PUID):
+async def init_file_system(PUID):
     """파일 시스템 초기화"""
     load_dotenv()
     headers = {"Authorization": os.getenv('ST_KEY')}
     data = {"PUID": PUID}
     try:
-        response = requests.post("http://192.168.50.84:10080/api/project/init", json=data, headers=headers)
+        response = await storage.post("/project/init", json=data, headers=headers)
         if response.status_code == 200:
             return True
         else:
             logger.error(f"File system initialization failed for PUID {PUID}: {response.status_code} - {response.text}")
             return False
-    except requests.exceptions.RequestException as e:
+    except (httpx.HTTPError, StorageUnavailable) as e:
         logger.error(f"Request to init file system failed for PUID {PUID}: {str(e)}", exc_info=True)
         return False
 
 def save_deleted_project_info(pid, pname, ccp_found: bool):
-    """삭제된 프로젝트의 정보를 deleted_project.json에 저장"""
-    file_path = "deleted_project.json"
-    if os.path.exists(file_path):
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-        except json.JSONDecodeError:
-            data = {}
-    else:
-        data = {}
-    pid_str = str(pid)
+    """삭제된 프로젝트의 정보를 삭제 프로젝트 저장소에 저장"""
     deleted_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    data[pid_str] = {
-        "pname": pname,
-        "deleted_time": deleted_time,
-        "ccp": ccp_found
-    }
-    with open(file_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
+    deleted_project.save_deleted_project(pid, pname, ccp_found, deleted_time)
+    ccp_history.notify_change()
 
 # API 엔드포인트
 @router.post("/project/init")
@@ -173,7 +161,7 @@ async def api_project_init(payload: ProjectInit):
         logger.info("------------------------------------------------------------")
         logger.info("Starting project creation process")
         logger.info("Step 1: Generating Project UID")
-        PUID = gen_project_uid()
+        PUID = await gen_project_uid()
         logger.info(f"Generated PUID: {PUID}")
         logger.info("Step 2: Initializing project in the database")
         db_result = project_DB.init_project(payload, PUID)
@@ -184,7 +172,7 @@ async def api_project_init(payload: ProjectInit):
                 detail=f"Database initialization failed for PUID: {PUID}",
             )
         logger.info("Step 3: Initializing file system")
-        file_result = init_file_system(PUID)
+        file_result = await init_file_system(PUID)
         if not file_result:
             logger.error(f"File system initialization failed for PUID: {PUID}")
             delete_result = project_DB.delete_project(PUID)
@@ -1,48 +1,216 @@
 """
    CodeCraft PMS Backend Project
-                                                                              
+
    파일명   : push.py
    생성자   : 김창환
-                                                                              
-   생성일   : 2025/01/25                                                  
-   업데이트 : 2025/03/08
-                                                                             
+
+   생성일   : 2025/01/25
+   업데이트 : 2026/10/18
+
    설명     : Next.JS에 파일을 전송하는 함수 정의
 """
 
+import os
+import time
+import random
+import asyncio
+import tarfile
 import logging
-import requests
+import httpx
 from fastapi import HTTPException
 from logger import logger
 from urllib.parse import quote
 
-def push_to_nextjs(file_path, file_name):
-    """파일을 Next.js 서버로 전송"""
-    logging.info(f"------ Starting file transfer to Next.js for {file_name} ------")
-    try:
-        with open(file_path, "rb") as file:
-            logging.info(f"Sending file {file_name} to Next.js using Raw Binary")
-            
-            response = requests.post(
-                "http://192.168.50.84:90/api/file_receive",
-                data=file,
-                headers={
-                    "Content-Type": "application/octet-stream",
-                    "file-name": quote(file_name)
-                }
-            )
+# Next.js 파일 수신 API로 보내는 전송은 모두 이 모듈의 pusher 객체 하나를 사용한다.
+#   - 연결은 keep-alive 풀로 재사용하고, 파일 본문은 CHUNK_SIZE 단위로 읽으며 전송 (메모리에 전체를 올리지 않음)
+#   - 동시에 전송 중인 파일은 PUSH_MAX_INFLIGHT개로 제한하고, 나머지는 자리가 날 때까지 대기
+#     (PUSH_QUEUE_TIMEOUT 안에 전송을 시작하지 못하면 503)
+#   - 연결 오류와 5xx 응답은 지수 백오프로 재시도 (파일은 처음부터 다시 읽음, 한 번만 읽을 수 있는 스트림은 재시도하지 않음)
+#   - 여러 파일은 tar 스트림 하나로 묶어 전송할 수 있다 (push_batch)
+# 연결 풀과 전송 자리는 서버 시작 시 start()로 메인 이벤트 루프에 하나만 만들며, 작업 스레드에서는 call()로 전송한다.
+NEXTJS_RECEIVE_URL = os.getenv('NEXTJS_RECEIVE_URL', "http://192.168.50.84:90/api/file_receive")
+PUSH_MAX_INFLIGHT = int(os.getenv('PUSH_MAX_INFLIGHT', '8'))  # 동시에 Next.js로 전송 중인 파일 수
+PUSH_QUEUE_TIMEOUT = float(os.getenv('PUSH_QUEUE_TIMEOUT', '60'))  # 전송 자리가 날 때까지 대기하는 최대 시간 (초)
+PUSH_RETRIES = int(os.getenv('PUSH_RETRIES', '3'))  # 전송당 최대 시도 횟수
+PUSH_BACKOFF = 0.5  # 재시도 대기 시간 기준값 (초); 시도마다 2배
+PUSH_TIMEOUT = httpx.Timeout(120.0, connect=5.0)
+CHUNK_SIZE = 256 * 1024
+TAR_BLOCK = 512
+
+
+async def read_file_chunks(file_path):
+    """파일을 CHUNK_SIZE 단위로 읽어 전달 (디스크 읽기는 작업 스레드에서 수행)"""
+    with open(file_path, "rb") as file:
+        while True:
+            block = await asyncio.to_thread(file.read, CHUNK_SIZE)
+            if not block:
+                break
+            yield block
+
+
+def tar_entries(files):
+    """(파일 경로, 압축 파일 내 이름) 목록을 tar 헤더와 크기 목록으로 변환"""
+    entries = []
+    for file_path, name in files:
+        stat = os.stat(file_path)
+        info = tarfile.TarInfo(name)
+        info.size = stat.st_size
+        info.mtime = int(stat.st_mtime)
+        info.mode = 0o644
+        # PAX 형식은 한글 등 UTF-8 이름과 100 bytes를 넘는 이름을 그대로 기록
+        entries.append((file_path, info.tobuf(format=tarfile.PAX_FORMAT, encoding="utf-8"), stat.st_size))
+    return entries
+
+
+def tar_length(entries):
+    """tar 스트림의 전체 길이 (Content-Length로 사용)"""
+    return sum(len(header) + size + (-size % TAR_BLOCK) for _, header, size in entries) + 2 * TAR_BLOCK
+
+
+async def tar_stream(entries):
+    """tar 헤더와 파일 내용을 차례로 전달하는 tar 스트림"""
+    for file_path, header, size in entries:
+        yield header
+        sent = 0
+        async for block in read_file_chunks(file_path):
+            block = block[:size - sent]  # 헤더를 만든 뒤 파일이 늘어난 경우에도 기록한 크기만 전송
+            sent += len(block)
+            yield block
+        if sent < size:
+            raise Exception(f"{file_path} changed while building the archive")
+        yield b"\0" * (-size % TAR_BLOCK)
+    yield b"\0" * (2 * TAR_BLOCK)
+
+
+class PushClient:
+    """Next.js 파일 수신 API용 공유 비동기 클라이언트"""
+
+    def __init__(self, url=NEXTJS_RECEIVE_URL, max_inflight=PUSH_MAX_INFLIGHT):
+        self.url = url
+        self.max_inflight = max_inflight
+        self.client = None
+        self.slots = None
+        self.loop = None
+
+    def _client(self):
+        if self.client is None:
+            raise Exception("Push client is not started, call start() on server startup")
+        # 연결 풀과 전송 자리는 만든 이벤트 루프에 묶이므로 다른 루프에서는 사용할 수 없음
+        if asyncio.get_running_loop() is not self.loop:
+            raise Exception("Push client is bound to another event loop, use call() from worker threads")
+        return self.client
+
+    async def send(self, body, file_name, content_length=None, retry=True):
+        """본문을 Next.js로 전송 (body는 시도마다 새 스트림을 만드는 함수)"""
+        client = self._client()
+        try:
+            await asyncio.wait_for(self.slots.acquire(), PUSH_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=503, detail="Too many file transfers to frontend in progress, try again later")
+        headers = {
+            "Content-Type": "application/octet-stream",
+            "file-name": quote(file_name)
+        }
+        if content_length is not None:
+            headers["Content-Length"] = str(content_length)
+        attempts = PUSH_RETRIES if retry else 1
+        try:
+            for attempt in range(1, attempts + 1):
+                try:
+                    response = await client.post(self.url, content=body(), headers=headers)
+                    if response.status_code < 500 or attempt == attempts:
+                        break
+                    error = f"status {response.status_code}"
+                except httpx.TransportError as e:
+                    if attempt == attempts:
+                        raise
+                    error = str(e) or type(e).__name__
+                delay = PUSH_BACKOFF * 2 ** (attempt - 1) + random.uniform(0, PUSH_BACKOFF)
+                logger.warning(f"Push of {file_name} to frontend failed (attempt {attempt}/{attempts}): {error}, retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+        except httpx.HTTPError as e:
+            logging.error(f"Request error during file transfer for {file_name}: {str(e)}", exc_info=True)
+            raise HTTPException(status_code=500, detail=f"Request to frontend failed: {str(e)}")
+        finally:
+            self.slots.release()
         if response.status_code != 200:
             logging.error(f"Frontend server response error: {response.status_code} - {response.text}", exc_info=True)
             raise HTTPException(status_code=500, detail="Failed to send file to frontend")
-        logging.info(f"File {file_name} successfully transferred to frontend")
-        logging.info(f"------ File transfer completed for {file_name} ------")
         return {"RESULT_CODE": 200, "RESULT_MSG": "File transferred successfully"}
-    except FileNotFoundError:
-        logging.error(f"File not found: {file_path}", exc_info=True)
-        raise HTTPException(status_code=404, detail="File not found")
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Request error during file transfer for {file_name}: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Request to frontend failed: {str(e)}")
-    except Exception as e:
-        logging.error(f"Unexpected error during file transfer for {file_name}: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
\ No newline at end of file
+
+    async def push_file(self, file_path, file_name):
+        """파일을 나누어 읽으며 Next.js 서버로 전송"""
+        logging.info(f"------ Starting file transfer to Next.js for {file_name} ------")
+        try:
+            size = os.path.getsize(file_path)
+        except FileNotFoundError:
+            logging.error(f"File not found: {file_path}", exc_info=True)
+            raise HTTPException(status_code=404, detail="File not found")
+        started = time.monotonic()
+        result = await self.send(lambda: read_file_chunks(file_path), file_name, size)
+        logging.info(f"File {file_name} ({size} bytes) successfully transferred to frontend in {time.monotonic() - started:.2f}s")
+        logging.info(f"------ File transfer completed for {file_name} ------")
+        return result
+
+    async def push_stream(self, chunks, file_name, content_length=None):
+        """비동기 바이트 스트림을 디스크에 저장하지 않고 Next.js 서버로 전송 (한 번만 읽을 수 있으므로 재시도하지 않음)"""
+        logging.info(f"------ Starting streamed file transfer to Next.js for {file_name} ------")
+        result = await self.send(lambda: chunks, file_name, content_length, retry=False)
+        logging.info(f"------ File transfer completed for {file_name} ------")
+        return result
+
+    async def push_batch(self, files, archive_name):
+        """여러 파일을 tar 스트림 하나로 묶어 Next.js 서버로 전송 (files: (파일 경로, 압축 파일 내 이름) 목록)"""
+        logging.info(f"------ Starting batch transfer of {len(files)} files to Next.js as {archive_name} ------")
+        try:
+            entries = await asyncio.to_thread(tar_entries, files)
+        except FileNotFoundError as e:
+            logging.error(f"File not found: {e.filename}", exc_info=True)
+            raise HTTPException(status_code=404, detail="File not found")
+        result = await self.send(lambda: tar_stream(entries), archive_name, tar_length(entries))
+        logging.info(f"------ Batch transfer completed for {archive_name} ------")
+        return result
+
+    async def start(self):
+        """서버 시작 시 연결 풀과 전송 자리를 메인 이벤트 루프에 만들어 둠 (작업 스레드의 call()이 이 루프를 사용)"""
+        if self.client is not None:
+            raise Exception("Push client is already started")
+        self.client = httpx.AsyncClient(
+            timeout=PUSH_TIMEOUT,
+            limits=httpx.Limits(max_connections=self.max_inflight, max_keepalive_connections=self.max_inflight, keepalive_expiry=30.0)
+        )
+        self.slots = asyncio.Semaphore(self.max_inflight)
+        self.loop = asyncio.get_running_loop()
+
+    def call(self, coro):
+        """작업 스레드에서 코루틴을 클라이언트의 이벤트 루프로 실행하고 결과를 기다림"""
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if self.loop is None or not self.loop.is_running():
+            coro.close()
+            raise Exception("Push client is not started, call start() on server startup")
+        if running is self.loop:
+            # 이벤트 루프 스레드에서 결과를 기다리면 코루틴을 실행할 루프가 멈춰 교착 상태가 됨
+            coro.close()
+            raise Exception("Push client call() would block the event loop, await the coroutine instead")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    async def aclose(self):
+        if self.client is not None:
+            client, self.client, self.slots, self.loop = self.client, None, None, None
+            await client.aclose()
+
+
+pusher = PushClient()
+
+
+def push_to_nextjs(file_path, file_name):
+    """파일을 Next.js 서버로 전송 (작업 스레드용; 비동기 핸들러에서는 pusher.push_file을 사용)"""
+    return pusher.call(pusher.push_file(file_path, file_name))
+
+
+async def push_stream_to_nextjs(chunks, file_name, content_length=None):
+    """비동기 바이트 스트림을 디스크에 저장하지 않고 Next.js 서버로 전송 (길이를 모르면 chunked 전송)"""
+    return await pusher.push_stream(chunks, file_name, content_length)
@@ -0,0 +1,179 @@
+"""
+   CodeCraft PMS Backend Project
+
+   파일명   : storage_client.py
+   생성자   : 김창환
+
+   생성일   : 2026/10/18
+   업데이트 : 2026/10/18
+
+   설명     : Storage 서버 호출에 공통으로 사용하는 비동기 HTTP 클라이언트 (연결 풀, 재시도, 회로 차단기) 정의
+"""
+
+from contextlib import asynccontextmanager
+from logger import logger
+import os, time, random, asyncio, threading, importlib.util, httpx
+
+# 모든 라우터와 CCP 전송은 이 모듈의 storage 객체 하나로 Storage 서버를 호출한다.
+#   - 연결은 keep-alive 풀로 재사용하며, h2 패키지가 설치되어 있고 STORAGE_HTTP2=1이면 HTTP/2를 사용
+#     (HTTP/2는 TLS(ALPN)로 협상되므로 https 주소에서만 적용되고, http 주소는 HTTP/1.1 keep-alive로 동작)
+#   - 작업 종류(op)별 timeout: control(조회/제어), upload, download
+#   - 연결 오류와 5xx 응답은 지수 백오프로 재시도
+#   - 요청이 연속으로 BREAKER_THRESHOLD번 실패하면 BREAKER_RESET초 동안 즉시 실패(StorageUnavailable)하고,
+#     이후 요청 1개를 시험 삼아 보내 성공하면 다시 연결을 허용한다.
+# 연결 풀은 서버 시작 시 start()로 메인 이벤트 루프에 하나만 만들며, 다른 루프에서 사용하면 새로 만들지 않고 예외를 발생시킨다.
+# 작업 스레드의 동기 코드는 call()로 메인 루프에서 코루틴을 실행한다. (이벤트 루프 스레드에서는 await로 직접 호출)
+STORAGE_URL = os.getenv('STORAGE_URL', 'http://192.168.50.84:10080/api')
+HTTP2 = os.getenv('STORAGE_HTTP2', '1') == '1' and importlib.util.find_spec("h2") is not None
+MAX_CONNECTIONS = int(os.getenv('STORAGE_MAX_CONNECTIONS', '32'))  # Storage 서버로 동시에 열 수 있는 연결 수
+RETRIES = int(os.getenv('STORAGE_RETRIES', '3'))  # 요청당 최대 시도 횟수
+BACKOFF = float(os.getenv('STORAGE_BACKOFF', '0.5'))  # 재시도 대기 시간 기준값 (초); 시도마다 2배
+BREAKER_THRESHOLD = int(os.getenv('STORAGE_BREAKER_THRESHOLD', '5'))
+BREAKER_RESET = float(os.getenv('STORAGE_BREAKER_RESET', '30'))
+TIMEOUTS = {
+    "control": httpx.Timeout(15.0, connect=5.0),
+    "upload": httpx.Timeout(120.0, connect=5.0),
+    "download": httpx.Timeout(120.0, connect=5.0)
+}
+
+
+class StorageUnavailable(Exception):
+    """회로 차단기가 열려 있어 Storage 서버 호출을 시도하지 않은 경우"""
+
+
+class CircuitBreaker:
+    """연속 실패 횟수로 Storage 서버 호출을 차단하는 회로 차단기 (이벤트 루프와 작업 스레드에서 공용)"""
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, reset_after=BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False  # 차단 해제 전 시험 요청이 진행 중인지 여부
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at >= self.reset_after and not self.trial:
+                self.trial = True
+                return
+        raise StorageUnavailable("Storage server is unavailable (circuit open), try again later")
+
+    def record_success(self):
+        with self.lock:
+            if self.opened_at is not None:
+                logger.info("Storage server recovered, circuit closed")
+            self.failures = 0
+            self.opened_at = None
+            self.trial = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial or self.failures >= self.threshold:
+                if self.opened_at is None or self.trial:
+                    logger.error(f"Storage server failed {self.failures} times in a row, circuit opened for {self.reset_after}s")
+                self.opened_at = time.monotonic()
+                self.trial = False
+
+
+def _rewind(files):
+    """재시도 전에 multipart로 보내는 파일 객체를 처음 위치로 되돌림"""
+    for value in (files or {}).values():
+        fileobj = value[1] if isinstance(value, tuple) else value
+        if hasattr(fileobj, "seek"):
+            fileobj.seek(0)
+
+
+class StorageClient:
+    """Storage 서버용 공유 비동기 클라이언트"""
+
+    def __init__(self, base_url=STORAGE_URL):
+        self.base_url = base_url
+        self.breaker = CircuitBreaker()
+        self.client = None
+        self.loop = None
+
+    def _client(self):
+        if self.client is None:
+            raise Exception("Storage client is not started, call start() on server startup")
+        # 연결 풀은 만든 이벤트 루프에 묶이므로 다른 루프(스크립트, 작업 스레드의 asyncio.run 등)에서는 사용할 수 없음
+        if asyncio.get_running_loop() is not self.loop:
+            raise Exception("Storage client is bound to another event loop, use call() from worker threads")
+        return self.client
+
+    async def request(self, method, path, op="control", stream=False, **kwargs):
+        """Storage 서버에 요청을 보내고 응답을 반환 (연결 오류와 5xx는 재시도, stream=True이면 본문을 읽지 않음)"""
+        self.breaker.allow()
+        client = self._client()
+        for attempt in range(1, RETRIES + 1):
+            _rewind(kwargs.get("files"))
+            try:
+                request = client.build_request(method, path, timeout=TIMEOUTS[op], **kwargs)
+                response = await client.send(request, stream=stream)
+                if response.status_code < 500:
+                    self.breaker.record_success()
+                    return response
+                error = f"status {response.status_code}"
+                if attempt == RETRIES:
+                    self.breaker.record_failure()
+                    return response
+                if stream:
+                    await response.aclose()
+            except httpx.TransportError as e:
+                if attempt == RETRIES:
+                    self.breaker.record_failure()
+                    raise
+                error = str(e) or type(e).__name__
+            delay = BACKOFF * 2 ** (attempt - 1) + random.uniform(0, BACKOFF)
+            logger.warning(f"Storage {method} {path} failed (attempt {attempt}/{RETRIES}): {error}, retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+    async def post(self, path, op="control", **kwargs):
+        return await self.request("POST", path, op=op, **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, path, op="download", method="POST", **kwargs):
+        """응답 본문을 aiter_bytes()로 나누어 읽는 요청 (블록을 벗어나면 연결을 풀로 반환)"""
+        response = await self.request(method, path, op=op, stream=True, **kwargs)
+        try:
+            yield response
+        finally:
+            await response.aclose()
+
+    async def start(self):
+        """서버 시작 시 연결 풀을 메인 이벤트 루프에 만들어 둠 (작업 스레드의 call()이 이 루프를 사용)"""
+        if self.client is not None:
+            raise Exception("Storage client is already started")
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            http2=HTTP2,
+            timeout=TIMEOUTS["control"],
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS, keepalive_expiry=30.0)
+        )
+        self.loop = asyncio.get_running_loop()
+
+    def call(self, coro):
+        """작업 스레드에서 코루틴을 클라이언트의 이벤트 루프로 실행하고 결과를 기다림"""
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if self.loop is None or not self.loop.is_running():
+            coro.close()
+            raise Exception("Storage client is not started, call start() on server startup")
+        if running is self.loop:
+            # 이벤트 루프 스레드에서 결과를 기다리면 코루틴을 실행할 루프가 멈춰 교착 상태가 됨
+            coro.close()
+            raise Exception("Storage client call() would block the event loop, await the coroutine instead")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    async def aclose(self):
+        if self.client is not None:
+            client, self.client, self.loop = self.client, None, None
+            await client.aclose()
+
+
+storage = StorageClient()
@@ -0,0 +1,75 @@
+"""
+   CodeCraft PMS Backend Project
+
+   파일명   : test_batch_DB.py
+   생성자   : 김창환
+
+   생성일   : 2026/10/18
+   업데이트 : 2026/10/18
+
+   설명     : batch_DB.py의 스키마 확인, 일괄 쿼리를 실제 Database Project 스키마에 실행하는 통합 테스트 (pytest)
+              통합 테스트는 Database Project와 DB 서버에 연결할 수 있는 환경에서만 실행되며, 모든 변경은 rollback된다.
+"""
+
+import pytest
+import batch_DB
+
+
+def real_connect():
+    """Database Project의 실제 DB 연결 (연결할 수 없으면 None)"""
+    connect = getattr(batch_DB.mysql_connection, "db_connect", None)
+    if connect is None:
+        return None
+    try:
+        return connect()
+    except Exception:
+        return None
+
+
+class RollbackConnection:
+    """commit 대신 rollback하는 연결 (batch_DB 함수가 만든 변경을 DB에 남기지 않음)"""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def commit(self):
+        self.connection.rollback()
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+
+
+@pytest.fixture
+def database(monkeypatch):
+    probe = real_connect()
+    if probe is None:
+        pytest.skip("Database Project or DB server is not available")
+    probe.close()
+    connect = batch_DB.mysql_connection.db_connect
+    monkeypatch.setattr(batch_DB.mysql_connection, "db_connect", lambda: RollbackConnection(connect()))
+
+
+def test_schema_has_every_table_and_column_batch_DB_uses(database):
+    batch_DB.verify_schema()
+
+
+def test_bulk_queries_run_against_the_real_schema(database):
+    assert batch_DB.delete_history_versions(-1, [1, 2]) == 0
+    assert batch_DB.fetch_existing_ids(batch_DB.PROJECT_ID_SOURCES, [-1, -2]) == set()
+    assert batch_DB.fetch_existing_ids(batch_DB.FILE_ID_SOURCES, [-1, -2]) == set()
+    rows = batch_DB._fetch(f"SELECT s_no, p_no FROM {batch_DB.OTHER_DOCUMENT_TABLE} LIMIT 1")
+    if not rows:
+        pytest.skip("No other document row to borrow s_no/p_no from")
+    s_no, p_no = rows[0].values() if isinstance(rows[0], dict) else rows[0]
+    file_no = max({2_147_483_600 + i for i in range(40)} - batch_DB.fetch_existing_ids(batch_DB.FILE_ID_SOURCES, range(2_147_483_600, 2_147_483_640)))
+    document = {"file_unique_id": file_no, "file_name": "batch_DB_test", "file_path": "/tmp/batch_DB_test", "file_date": "2026-10-18 00:00:00"}
+    assert batch_DB.add_other_documents([document], p_no, s_no) == 1
+
+
+def test_verify_schema_reports_every_missing_table(db_connection):
+    """테이블이나 컬럼이 없으면 SCHEMA 전체를 확인한 뒤 실패한 항목을 모두 보고한다."""
+    db_connection.error = Exception("Unknown column")
+    with pytest.raises(Exception) as error:
+        batch_DB.verify_schema()
+    for table in batch_DB.SCHEMA:
+        assert table in str(error.value)
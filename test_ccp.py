@@ -0,0 +1,421 @@
+"""
+   CodeCraft PMS Backend Project
+
+   파일명   : test_ccp.py
+   생성자   : 김창환
+
+   생성일   : 2026/10/18
+   업데이트 : 2026/10/18
+
+   설명     : ccp.py의 히스토리 삭제 후 Export/Import 흐름, 델타/전체 매니페스트 선택, CSV 복원 순서, 버전 인덱스 캐시, 버전 파일 목록 조회/단일 파일 복원, 삭제된 프로젝트 복원 테스트 (pytest)
+"""
+
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+import os, shutil, asyncio, threading, pytest
+import ccp, ccp_job, ccp_store, ccp_history, ccp_transport, deleted_project
+
+PID = 7
+REMOVE_DELETED_PROJECT = deleted_project.remove_deleted_project  # db 픽스처가 바꾸기 전의 함수
+
+
+class FakeHistoryDB:
+    """csv_DB의 히스토리/CSV 함수를 메모리에서 흉내내는 DB (state가 현재 프로젝트 DB 내용)"""
+
+    def __init__(self):
+        self.history = []
+        self.state = ""
+        self.clock = datetime(2026, 10, 18)
+
+    def fetch_csv_history(self, pid):
+        return [dict(record) for record in self.history]
+
+    def insert_csv_history(self, pid, univ_id, msg):
+        ver = max((record["ver"] for record in self.history), default=0) + 1
+        self.clock += timedelta(seconds=1)  # 히스토리 행마다 저장 시각이 다름
+        self.history.append({"ver": ver, "date": self.clock, "msg": msg, "univ_id": univ_id})
+        return ver
+
+    def delete_csv_history(self, pid):
+        self.history.clear()
+        return True
+
+    def export_csv(self, pid):
+        os.makedirs(ccp.landing_path(pid), exist_ok=True)
+        with open(os.path.join(ccp.landing_path(pid), f"project_{pid}.csv"), "w") as f:
+            f.write(self.state)
+        return True
+
+
+class OkResponse:
+    status_code = 200
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    fake = FakeHistoryDB()
+    for name in ("fetch_csv_history", "insert_csv_history", "delete_csv_history", "export_csv"):
+        monkeypatch.setattr(ccp.csv_DB, name, getattr(fake, name), raising=False)
+    monkeypatch.setattr(ccp_job, "JOB_DIR", str(tmp_path / "jobs"))
+    monkeypatch.setattr(ccp_job, "LOCK_DIR", str(tmp_path / "locks"))
+    monkeypatch.setattr(ccp_job, "SCRATCH_FAST", "")
+    monkeypatch.setattr(ccp_job, "SCRATCH_DIR", str(tmp_path / "work"))
+    monkeypatch.setattr(ccp_job, "SCRATCH_RESERVE", 0)
+    monkeypatch.setattr(ccp_store, "STORE_ROOT", str(tmp_path / "store"))
+    monkeypatch.setattr(ccp_transport, "PART_DIR", str(tmp_path / "parts"))
+    monkeypatch.setattr(ccp_history, "HISTORY_STAMP", str(tmp_path / "history.stamp"))
+    monkeypatch.setattr(ccp_transport, "transport", ccp_transport.LocalStorageTransport(str(tmp_path / "storage")))
+    monkeypatch.setattr(ccp, "landing_path", lambda pid: str(tmp_path / "landing" / str(pid) / "DATABASE"))
+    monkeypatch.setattr(ccp.requests, "post", lambda url, json: OkResponse())
+    monkeypatch.setattr(deleted_project, "remove_deleted_project", lambda pid: False)
+
+    async def pull_storage_server(pid, output_path):
+        os.makedirs(output_path, exist_ok=True)
+        return {"RESULT_CODE": 200, "RESULT_MSG": "ok"}
+
+    async def push_database_csv(pid):
+        return []
+
+    async def restore_database_csv(pid):
+        with open(ccp.work_path(pid, "DATABASE", f"project_{pid}.csv")) as f:
+            fake.state = f.read()
+
+    async def push_output_archive(pid):
+        return None
+
+    monkeypatch.setattr(ccp, "pull_storage_server", pull_storage_server)
+    monkeypatch.setattr(ccp, "push_database_csv", push_database_csv)
+    monkeypatch.setattr(ccp, "restore_database_csv", restore_database_csv)
+    monkeypatch.setattr(ccp, "push_output_archive", push_output_archive)
+    for registry in (ccp_job.jobs, ccp_job.pid_locks, ccp_job.futures, ccp_job.waiting):
+        registry.clear()
+    ccp.version_index.clear()
+    return fake
+
+
+def test_delete_history_then_export_and_import_creates_backup(db, tmp_path):
+    """히스토리 삭제 후 새로 저장한 버전으로 복원하면, 삭제 전 버전과 내용이 같아도 현재 상태를 백업한다."""
+    store_dir = tmp_path / "store" / str(PID)
+
+    async def scenario():
+        db.state = "state A"
+        await ccp.api_project_export(ccp.ccp_payload(pid=PID, univ_id=1, msg="A"))
+        assert ccp_store.latest_version(PID) == 1
+        assert store_dir.is_dir()
+        part_dir = tmp_path / "parts" / str(PID) / "ccp"
+        part_dir.mkdir(parents=True)
+        (part_dir / f"{PID}_1.ccp.part").write_bytes(b"interrupted download")
+
+        await ccp.api_delete_history(ccp.ccp_payload(pid=PID))
+        # 최신 버전, fingerprint, 매니페스트 사본, 델타 기준 CSV와 받는 중이던 버전 파일이 모두 제거됨
+        assert not store_dir.exists()
+        assert not part_dir.parent.exists()
+        assert db.history == []
+
+        db.state = "state B"
+        await ccp.api_project_export(ccp.ccp_payload(pid=PID, univ_id=1, msg="B"))
+        # 새 버전 1은 삭제된 버전 체인을 기준으로 하지 않는 전체 스냅샷
+        manifest = ccp_store.read_manifest(ccp_store.manifest_cache_path(PID, 1), ccp.key)
+        assert manifest["kind"] == "full"
+
+        # 현재 상태를 삭제 전 버전 1과 같은 내용으로 되돌린 뒤 새 버전 1을 복원
+        db.state = "state A"
+        await ccp.api_project_import(ccp.ccp_payload(pid=PID, univ_id=1, ver=1))
+
+    asyncio.run(scenario())
+    assert [record["msg"] for record in db.history] == ["B", "Revert 2 to 1"]
+    assert (tmp_path / "storage" / str(PID) / f"{PID}_2.ccp").exists()
+    assert db.state == "state B"
+
+    # 백업된 버전 2로 다시 복원하면 되돌리기 전 상태(A)가 나옴
+    async def restore_backup():
+        await ccp.api_project_import(ccp.ccp_payload(pid=PID, univ_id=1, ver=2, is_removed=1))
+
+    asyncio.run(restore_backup())
+    assert db.state == "state A"
+
+
+def test_delete_history_waits_for_running_job(db):
+    """진행 중인 Export가 끝난 뒤에 히스토리를 삭제한다."""
+    async def scenario():
+        gate = asyncio.Event()
+        deleted = []
+
+        async def running_export():
+            await gate.wait()
+            deleted.append(len(db.history))
+
+        db.insert_csv_history(PID, 1, "old")
+        job = asyncio.ensure_future(ccp_job.run("export", PID, running_export))
+        await asyncio.sleep(0.05)
+        delete = asyncio.ensure_future(ccp.api_delete_history(ccp.ccp_payload(pid=PID)))
+        await asyncio.sleep(0.05)
+        assert not delete.done()
+        gate.set()
+        await job
+        await delete
+        return deleted
+
+    assert asyncio.run(scenario()) == [1]
+    assert db.history == []
+
+
+def test_list_files_rejects_legacy_version_without_downloading_it(db, tmp_path, monkeypatch):
+    """구 포맷(tar) 버전은 헤더만 읽고 거부하며 파일 전체를 받지 않는다."""
+    legacy = tmp_path / "storage" / str(PID) / f"{PID}_1.ccp"
+    legacy.parent.mkdir(parents=True)
+    legacy.write_bytes(b"\x00\x00\x00\x03" + os.urandom(4096))
+    downloads = []
+
+    async def download(kind, params, dst_path):
+        downloads.append(params)
+
+    monkeypatch.setattr(ccp_transport.transport, "download", download)
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(ccp.api_list_version_files(ccp.ccp_payload(pid=PID, ver=1)))
+    assert "not stored in manifest format" in error.value.detail
+    assert downloads == []
+    assert not os.path.exists(ccp_store.manifest_cache_path(PID, 1))
+
+
+def test_list_files_waits_for_running_job(db):
+    """진행 중인 작업(Import, 보존 정책 정리 등)이 끝난 뒤에 매니페스트 캐시를 읽는다."""
+    async def scenario():
+        gate = asyncio.Event()
+        db.state = "state A"
+        await ccp.api_project_export(ccp.ccp_payload(pid=PID, univ_id=1, msg="A"))
+
+        async def running_job():
+            await gate.wait()
+
+        job = asyncio.ensure_future(ccp_job.run("retention", PID, running_job))
+        await asyncio.sleep(0.05)
+        listing = asyncio.ensure_future(ccp.api_list_version_files(ccp.ccp_payload(pid=PID, ver=1)))
+        await asyncio.sleep(0.05)
+        assert not listing.done()
+        gate.set()
+        await job
+        return await listing
+
+    response = asyncio.run(scenario())
+    assert [entry["path"] for entry in response["PAYLOAD"]] == [f"DATABASE/project_{PID}.csv"]
+
+
+def test_load_history_reads_the_db_off_the_event_loop(db, monkeypatch):
+    threads = []
+    fetch = db.fetch_csv_history
+
+    def fetch_csv_history(pid):
+        threads.append(threading.current_thread())
+        return fetch(pid)
+
+    monkeypatch.setattr(ccp.csv_DB, "fetch_csv_history", fetch_csv_history, raising=False)
+    db.insert_csv_history(PID, 1, "A")
+    response = asyncio.run(ccp.api_load_history(ccp.ccp_payload(pid=PID)))
+    assert [record["msg"] for record in response["PAYLOAD"]] == ["A"]
+    assert threads and threading.main_thread() not in threads
+
+
+def csv_state(changed_row):
+    """행 하나만 바뀌는 프로젝트 CSV (델타에서 패치로 저장될 만큼 큼)"""
+    rows = [f'{i},"note {i}\nsecond line",{"x" * 40}\n' for i in range(200)]
+    rows[changed_row] = f'{changed_row},"changed",{"y" * 40}\n'
+    return "p_no,note,pad\n" + "".join(rows)
+
+
+def test_export_chooses_delta_or_full_manifest(db, monkeypatch):
+    """기준 버전이 있으면 델타, full 요청이나 체인 길이가 CCP_FULL_INTERVAL에 이르면 전체 스냅샷으로 저장한다."""
+    monkeypatch.setattr(ccp, "CCP_FULL_INTERVAL", 3)
+    states = {}
+
+    async def scenario():
+        for ver, full in ((1, 0), (2, 0), (3, 0), (4, 0), (5, 1)):
+            db.state = states[ver] = csv_state(ver)
+            await ccp.api_project_export(ccp.ccp_payload(pid=PID, univ_id=1, msg=str(ver), full=full))
+        db.state = "current"
+        await ccp.api_project_import(ccp.ccp_payload(pid=PID, univ_id=1, ver=3))
+
+    asyncio.run(scenario())
+    manifests = {ver: ccp_store.read_manifest(ccp_store.manifest_cache_path(PID, ver), ccp.key) for ver in states}
+    assert [(manifests[ver]["kind"], manifests[ver].get("base"), manifests[ver].get("depth", 0)) for ver in states] == [
+        ("full", None, 0),
+        ("delta", 1, 1),
+        ("delta", 2, 2),
+        ("full", None, 0),  # 다음 델타의 깊이가 CCP_FULL_INTERVAL에 이름
+        ("full", None, 0),  # full=1 요청
+    ]
+    # 델타 버전의 CSV는 전체 파일 대신 기준 CSV 대비 패치로 저장됨
+    assert "patch" in manifests[2]["files"][0]
+    # 델타 체인(3 → 2 → 1)을 따라 복원한 CSV가 저장 당시와 같음
+    assert db.state == states[3]
+
+
+CSV_FILES = {table: f"/var/lib/mysql/csv/{table}_{PID}.csv"
+             for table in ("doc_attach", "doc_meeting", "progress", "work", "project_user", "project", "student", "professor", "extra")}
+
+
+def test_plan_csv_restore_follows_foreign_key_levels():
+    assert ccp.plan_csv_restore(CSV_FILES) == [
+        ["student", "professor", "project"],
+        ["project_user", "work"],
+        ["progress", "doc_meeting"],
+        ["doc_attach"],
+        ["extra"],  # 순서에 없는 테이블은 마지막 단계
+    ]
+
+
+@pytest.fixture
+def import_csv(monkeypatch):
+    """restore_database_csv가 호출하는 csv_DB.import_csv 기록 (results에 테이블별 반환값 지정)"""
+    calls = []
+    results = {}
+    first_level = threading.Barrier(3, timeout=5)
+
+    def fake_import_csv(csv_files, pid):
+        (table,) = csv_files
+        if table in ("student", "professor", "project"):
+            first_level.wait()  # 첫 단계 세 테이블이 동시에 실행되어야 통과
+        calls.append(table)
+        return results.get(table, True)
+
+    monkeypatch.setattr(ccp, "build_csv_dict", lambda pid: dict(CSV_FILES))
+    monkeypatch.setattr(ccp.csv_DB, "import_csv", fake_import_csv, raising=False)
+    monkeypatch.setattr(ccp, "CCP_DB_CONCURRENCY", 4)
+    return calls, results
+
+
+def test_restore_database_csv_runs_levels_in_order_and_tables_in_parallel(import_csv):
+    calls, _ = import_csv
+    asyncio.run(ccp.restore_database_csv(PID))
+    levels = ccp.plan_csv_restore(CSV_FILES)
+    assert sorted(calls) == sorted(CSV_FILES)
+    # 각 테이블은 앞 단계의 테이블이 모두 끝난 뒤에 적용됨
+    level_of = {table: index for index, level in enumerate(levels) for table in level}
+    assert [level_of[table] for table in calls] == sorted(level_of[table] for table in calls)
+
+
+def test_restore_database_csv_stops_before_the_next_level_on_failure(import_csv):
+    calls, results = import_csv
+    results["work"] = False
+    with pytest.raises(Exception, match="failure for table work"):
+        asyncio.run(ccp.restore_database_csv(PID))
+    assert set(calls) == {"student", "professor", "project", "project_user", "work"}
+
+
+def test_version_index_is_cached_until_invalidated_or_expired(db, monkeypatch):
+    reads = []
+    fetch = db.fetch_csv_history
+    monkeypatch.setattr(ccp.csv_DB, "fetch_csv_history", lambda pid: reads.append(pid) or fetch(pid), raising=False)
+    clock = [1000.0]
+    monkeypatch.setattr(ccp.time, "time", lambda: clock[0])
+    db.insert_csv_history(PID, 1, "A")
+
+    assert ccp.load_version_index(PID)["latest"] == 1
+    assert ccp.has_version(PID, 1)
+    assert len(reads) == 1  # 캐시된 인덱스를 재사용
+
+    # 다른 worker가 추가한 버전은 캐시에 없으면 한 번 다시 읽어서 찾음
+    db.insert_csv_history(PID, 1, "B")
+    assert ccp.has_version(PID, 2)
+    assert len(reads) == 2
+    assert not ccp.has_version(PID, 3)
+    assert len(reads) == 3
+
+    # 무효화 후에는 다음 조회에서 다시 읽음
+    ccp.invalidate_version_index(PID)
+    assert PID not in ccp.version_index
+    ccp.load_version_index(PID)
+    assert len(reads) == 4
+
+    # CCP_INDEX_TTL이 지나면 다시 읽음
+    clock[0] += ccp.CCP_INDEX_TTL + 1
+    ccp.load_version_index(PID)
+    assert len(reads) == 5
+
+
+def test_export_invalidates_cached_version_index_and_history_views(db):
+    ccp_history.views[1] = {"stamp": 0, "loaded": 0}
+
+    async def scenario():
+        db.state = "state A"
+        await ccp.api_project_export(ccp.ccp_payload(pid=PID, univ_id=1, msg="A"))
+        assert ccp_history.views == {}
+        assert ccp.load_version_index(PID)["latest"] == 1
+        db.state = "state B"
+        await ccp.api_project_export(ccp.ccp_payload(pid=PID, univ_id=1, msg="B"))
+        return await ccp.api_load_history(ccp.ccp_payload(pid=PID))
+
+    response = asyncio.run(scenario())
+    assert [record["msg"] for record in response["PAYLOAD"]] == ["A", "B"]
+    assert ccp.load_version_index(PID)["latest"] == 2
+
+
+def test_list_and_pull_file_download_only_what_they_need(db, tmp_path, monkeypatch):
+    """파일 목록은 매니페스트만, 단일 파일 복원은 그 파일의 객체만 Storage 서버에서 받는다."""
+    report = os.urandom(100 * 1024)
+
+    async def pull_storage_server(pid, output_path):
+        os.makedirs(os.path.join(output_path, str(pid)), exist_ok=True)
+        with open(os.path.join(output_path, str(pid), "report.pdf"), "wb") as f:
+            f.write(report)
+        return {"RESULT_CODE": 200, "RESULT_MSG": "ok"}
+
+    class FakePusher:
+        async def push_file(self, file_path, file_name):
+            with open(file_path, "rb") as f:
+                pushed.append((file_name, f.read()))
+            return {"RESULT_CODE": 200}
+
+    pushed = []
+    downloads = []
+    download = ccp_transport.transport.download
+
+    async def recording_download(kind, params, dst_path):
+        downloads.append((kind, params.get("ver", params.get("name"))))
+        await download(kind, params, dst_path)
+
+    monkeypatch.setattr(ccp, "pull_storage_server", pull_storage_server)
+    monkeypatch.setattr(ccp, "TEMP_DOWNLOAD_DIR", str(tmp_path / "tmp"))
+    monkeypatch.setattr(ccp.push, "pusher", FakePusher(), raising=False)
+
+    async def scenario():
+        for state in ("state A", "state B"):
+            db.state = state
+            await ccp.api_project_export(ccp.ccp_payload(pid=PID, univ_id=1, msg=state))
+        # 다른 서버처럼 로컬 저장소(객체, 매니페스트 캐시)가 비어 있는 상태에서 조회
+        shutil.rmtree(tmp_path / "store")
+        monkeypatch.setattr(ccp_transport.transport, "download", recording_download)
+        listing = await ccp.api_list_version_files(ccp.ccp_payload(pid=PID, ver=2))
+        listed_downloads = list(downloads)
+        await ccp.api_pull_version_file(ccp.ccp_payload(pid=PID, ver=2, path=f"OUTPUT/{PID}/report.pdf"))
+        return listing, listed_downloads
+
+    listing, listed_downloads = asyncio.run(scenario())
+    assert sorted(entry["path"] for entry in listing["PAYLOAD"]) == [f"DATABASE/project_{PID}.csv", f"OUTPUT/{PID}/report.pdf"]
+    # 델타 버전 2와 기준 버전 1의 매니페스트만 받고 객체는 받지 않음
+    assert sorted(listed_downloads) == [("ccp", 1), ("ccp", 2)]
+    report_hash = next(entry["hash"] for entry in listing["PAYLOAD"] if entry["path"].endswith("report.pdf"))
+    assert downloads[len(listed_downloads):] == [("object", report_hash)]
+    assert pushed == [("report.pdf", report)]
+    assert os.listdir(tmp_path / "tmp") == []
+
+
+def test_restoring_a_deleted_project_removes_its_store_entry(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(deleted_project, "DB_PATH", str(tmp_path / "deleted_project.db"))
+    monkeypatch.setattr(deleted_project, "LEGACY_JSON_PATH", str(tmp_path / "deleted_project.json"))
+    monkeypatch.setattr(deleted_project, "local", threading.local())
+    monkeypatch.setattr(deleted_project, "migrated", False)
+    monkeypatch.setattr(deleted_project, "remove_deleted_project", REMOVE_DELETED_PROJECT)
+
+    async def scenario():
+        db.state = "state A"
+        await ccp.api_project_export(ccp.ccp_payload(pid=PID, univ_id=1, msg="A"))
+        deleted_project.save_deleted_project(PID, "A", True, "2026-10-18 09:00:00")
+        ccp_history.views[1] = {"stamp": 0, "loaded": 0}
+        db.state = ""
+        await ccp.api_project_import(ccp.ccp_payload(pid=PID, univ_id=1, ver=1, is_removed=1))
+
+    asyncio.run(scenario())
+    assert db.state == "state A"
+    assert deleted_project.fetch_deleted_project(PID) is None
+    assert ccp_history.views == {}  # 삭제된 프로젝트 목록이 바뀌었으므로 히스토리 뷰도 무효화
@@ -0,0 +1,75 @@
+"""
+   CodeCraft PMS Backend Project
+
+   파일명   : test_ccp_history.py
+   생성자   : 김창환
+
+   생성일   : 2026/10/18
+   업데이트 : 2026/10/18
+
+   설명     : ccp_history.py의 사용자 히스토리 뷰 증분 조회, 캐시 무효화 테스트 (pytest)
+"""
+
+import os, pytest
+import ccp_history, ccp_store
+
+
+@pytest.fixture
+def history(tmp_path, monkeypatch):
+    """fetch_csv_history_by_univid가 반환하는 히스토리 행 목록 (테스트에서 행을 추가)"""
+    rows = []
+    monkeypatch.setattr(ccp_history, "HISTORY_STAMP", str(tmp_path / "history.stamp"))
+    monkeypatch.setattr(ccp_store, "STORE_ROOT", str(tmp_path / "store"))
+    monkeypatch.setattr(ccp_history.csv_DB, "fetch_csv_history_by_univid", lambda univ_id: [dict(row) for row in rows], raising=False)
+    monkeypatch.setattr(ccp_history.project_DB, "fetch_project_info",
+                        lambda univ_id: [{"p_no": 1, "p_name": "A"}, {"p_no": 2, "p_name": "B"}], raising=False)
+    monkeypatch.setattr(ccp_history.deleted_project, "fetch_deleted_projects", lambda pids: {})
+    ccp_history.views.clear()
+    return rows
+
+
+def row(p_no, ver, date):
+    return {"p_no": p_no, "ver": ver, "date": date, "s_no": 20240001, "msg": f"{p_no}-{ver}"}
+
+
+def versions(grouped):
+    return {(int(p_no), item["ver"]) for p_no, p_data in grouped.items() for item in p_data["history"]}
+
+
+def test_versions_saved_in_the_same_second_as_the_cursor_are_not_skipped(history):
+    history.append(row(1, 1, "2026-10-18 09:00:00"))
+    grouped, _, latest = ccp_history.query_view(20240001, updated_since="2026-10-18 08:00:00")
+    assert versions(grouped) == {(1, 1)}
+    assert latest == "2026-10-18 09:00:00"
+
+    # 응답 직후 같은 초에 다른 프로젝트의 버전이 저장됨
+    history.append(row(2, 1, "2026-10-18 09:00:00"))
+    ccp_history.notify_change()
+    grouped, _, latest = ccp_history.query_view(20240001, updated_since=latest)
+    # 같은 초에 저장된 이미 받은 버전(1, 1)도 다시 포함되며, 클라이언트가 (p_no, ver)로 중복을 제거
+    assert versions(grouped) == {(1, 1), (2, 1)}
+
+    history.append(row(1, 2, "2026-10-18 09:00:05"))
+    ccp_history.notify_change()
+    grouped, _, latest = ccp_history.query_view(20240001, updated_since=latest)
+    assert versions(grouped) == {(1, 1), (2, 1), (1, 2)}
+    assert latest == "2026-10-18 09:00:05"
+
+
+def test_cached_view_is_rebuilt_after_a_change_in_any_worker(history, monkeypatch):
+    builds = []
+    build_view = ccp_history.build_view
+    monkeypatch.setattr(ccp_history, "build_view", lambda univ_id: builds.append(univ_id) or build_view(univ_id))
+    history.append(row(1, 1, "2026-10-18 09:00:00"))
+    ccp_history.notify_change()
+
+    assert versions(ccp_history.query_view(20240001)[0]) == {(1, 1)}
+    assert versions(ccp_history.query_view(20240001)[0]) == {(1, 1)}
+    assert len(builds) == 1  # 변경이 없으면 캐시된 뷰를 재사용
+
+    # 다른 worker의 변경: 이 worker의 views는 그대로이고 stamp 파일의 수정 시각만 바뀜
+    history.append(row(2, 1, "2026-10-18 09:00:01"))
+    stamp = ccp_history._stamp()
+    os.utime(ccp_history.HISTORY_STAMP, ns=(stamp + 1_000_000, stamp + 1_000_000))
+    assert versions(ccp_history.query_view(20240001)[0]) == {(1, 1), (2, 1)}
+    assert len(builds) == 2
@@ -0,0 +1,176 @@
+"""
+   CodeCraft PMS Backend Project
+
+   파일명   : test_ccp_job.py
+   생성자   : 김창환
+
+   생성일   : 2026/10/18
+   업데이트 : 2026/10/18
+
+   설명     : ccp_job.py의 pid별 직렬화(Import/Export 혼합), Export 요청 병합, 작업 공간 정리 동시성 테스트 (pytest)
+"""
+
+import os, fcntl, random, asyncio, pytest
+import ccp_job
+
+
+@pytest.fixture(autouse=True)
+def job_dirs(tmp_path, monkeypatch):
+    monkeypatch.setattr(ccp_job, "JOB_DIR", str(tmp_path / "jobs"))
+    monkeypatch.setattr(ccp_job, "LOCK_DIR", str(tmp_path / "locks"))
+    monkeypatch.setattr(ccp_job, "SCRATCH_FAST", "")
+    monkeypatch.setattr(ccp_job, "SCRATCH_DIR", str(tmp_path / "work"))
+    monkeypatch.setattr(ccp_job, "SCRATCH_RESERVE", 0)
+    monkeypatch.setattr(ccp_job, "LOCK_POLL_INTERVAL", 0.01)
+    for registry in (ccp_job.jobs, ccp_job.pid_locks, ccp_job.futures, ccp_job.waiting):
+        registry.clear()
+
+
+def test_jobs_on_one_pid_never_overlap_and_no_request_is_dropped():
+    """같은 pid에 Export(같은 요청과 서로 다른 요청)와 Import를 섞어 동시에 보내도 겹쳐 실행되지 않고, 요청은 모두 처리된다."""
+    running = {}
+    overlaps = []
+    recorded = []
+
+    def job_of(kind, pid, payload):
+        async def job():
+            if running.get(pid):
+                overlaps.append(pid)
+            running[pid] = True
+            workspace = ccp_job.workspace_root()
+            assert os.path.isdir(workspace)
+            await asyncio.sleep(random.uniform(0, 0.01))
+            assert os.path.isdir(workspace)  # 실행 중인 작업 공간이 다른 작업의 정리로 삭제되지 않음
+            recorded.append((kind, pid, payload))
+            running[pid] = False
+            return payload
+        return job
+
+    async def scenario():
+        calls = []
+        for i in range(300):
+            pid = i % 3
+            if i % 4 == 3:
+                # Import는 병합하지 않으므로 요청마다 한 번씩 실행
+                kind, payload, coalesce = "import", f"ver-{i}", None
+            else:
+                kind = "export"
+                payload = f"msg-{random.randint(0, 4)}"  # 같은 내용의 요청이 자주 겹치도록 5종류만 사용
+                coalesce = (payload,)
+            calls.append((kind, pid, payload, ccp_job.run(kind, pid, job_of(kind, pid, payload), coalesce=coalesce)))
+            if i % 7 == 0:
+                await asyncio.sleep(0)
+        results = await asyncio.gather(*[call for _, _, _, call in calls])
+        return [(kind, pid, payload) for kind, pid, payload, _ in calls], results
+
+    requests, results = asyncio.run(scenario())
+    assert overlaps == []
+    # 병합된 요청도 자신과 같은 내용의 결과를 받음 (다른 사용자의 메시지로 대체되지 않음)
+    assert [payload for _, _, payload in requests] == results
+    # 요청은 모두 한 번 이상 기록되고, Import는 정확히 한 번씩, Export는 병합으로 실행 횟수가 줄어듦
+    assert set(requests) == set(recorded)
+    imports = [request for request in requests if request[0] == "import"]
+    assert sorted(request for request in recorded if request[0] == "import") == sorted(imports)
+    assert len(recorded) - len(imports) < len(requests) - len(imports)
+    assert not ccp_job.waiting
+    assert all(job["status"] == "done" for job in ccp_job.jobs.values())
+
+
+def test_different_payloads_are_not_coalesced():
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def blocker():
+            await gate.wait()
+
+        async def noop():
+            return None
+
+        first = ccp_job.submit("export", 1, blocker)
+        a = ccp_job.submit("export", 1, noop, coalesce=("user A", "message A"))
+        b = ccp_job.submit("export", 1, noop, coalesce=("user B", "message B"))
+        a_again = ccp_job.submit("export", 1, noop, coalesce=("user A", "message A"))
+        gate.set()
+        await asyncio.gather(*[ccp_job.futures[job["job_id"]] for job in (first, a, b) if job["job_id"] in ccp_job.futures])
+        return a, b, a_again
+
+    a, b, a_again = asyncio.run(scenario())
+    assert a["job_id"] != b["job_id"]
+    assert a_again["job_id"] == a["job_id"]
+
+
+def test_failed_job_does_not_block_the_next_one():
+    async def scenario():
+        async def fail():
+            raise Exception("boom")
+
+        async def ok():
+            return "ok"
+
+        failed = asyncio.gather(ccp_job.run("import", 5, fail), return_exceptions=True)
+        return await failed, await ccp_job.run("import", 5, ok)
+
+    failed, result = asyncio.run(scenario())
+    assert str(failed[0]) == "boom"
+    assert result == "ok"
+
+
+def test_job_waits_for_lock_held_by_another_worker():
+    """다른 worker(프로세스)가 pid 잠금 파일을 보유 중이면 해제될 때까지 시작하지 않는다."""
+    os.makedirs(ccp_job.LOCK_DIR, exist_ok=True)
+    fd = os.open(os.path.join(ccp_job.LOCK_DIR, "9.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    started = []
+
+    async def scenario():
+        async def job():
+            started.append(True)
+
+        task = asyncio.ensure_future(ccp_job.run("export", 9, job))
+        await asyncio.sleep(0.1)
+        assert started == []
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        await task
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        os.close(fd)
+    assert started == [True]
+
+
+def test_sweep_keeps_workspaces_that_are_still_being_created():
+    """잠금을 걸기 전인 생성 중 작업 공간은 정리하지 않고, 잠금이 풀린 작업 공간과 오래된 생성 중 공간만 정리한다."""
+    root = ccp_job.SCRATCH_DIR
+    building = os.path.join(root, "new" + ccp_job.WORKSPACE_BUILDING_SUFFIX)
+    stale = os.path.join(root, "old" + ccp_job.WORKSPACE_BUILDING_SUFFIX)
+    orphan = os.path.join(root, "orphan")
+    for path in (building, stale, orphan):
+        os.makedirs(path)
+        open(os.path.join(path, ".lock"), "w").close()
+    os.utime(stale, (0, 0))
+    ccp_job.sweep_workspaces()
+    assert os.path.isdir(building)
+    assert not os.path.exists(stale)
+    assert not os.path.exists(orphan)
+
+
+def test_open_workspace_is_locked_before_it_becomes_visible(monkeypatch):
+    """작업 공간이 원래 이름으로 보이는 시점에는 이미 잠금이 걸려 있어 다른 작업의 정리 대상이 되지 않는다."""
+    job = {"job_id": "abc"}
+    rename = os.rename
+
+    def sweep_during_rename(src, dst):
+        ccp_job.sweep_workspaces()  # 이름을 바꾸기 직전에 다른 작업이 정리를 실행
+        rename(src, dst)
+        ccp_job.sweep_workspaces()  # 이름을 바꾼 직후에도 실행
+
+    monkeypatch.setattr(ccp_job.os, "rename", sweep_during_rename)
+    root, workspace, fd = ccp_job._open_workspace(job, 0)
+    try:
+        assert workspace == os.path.join(ccp_job.SCRATCH_DIR, "abc")
+        assert os.path.isdir(workspace)
+        assert os.listdir(root) == ["abc"]
+    finally:
+        ccp_job._close_workspace(root, workspace, fd, 0)
+    assert not os.path.exists(workspace)
@@ -0,0 +1,92 @@
+"""
+   CodeCraft PMS Backend Project
+
+   파일명   : test_ccp_retention.py
+   생성자   : 김창환
+
+   생성일   : 2026/10/18
+   업데이트 : 2026/10/18
+
+   설명     : ccp_retention.py의 보존 구간 경계, 히스토리 행 삭제, 작업 단계 수 테스트 (pytest)
+"""
+
+from datetime import datetime, timedelta
+import asyncio, pytest
+import ccp, ccp_job, ccp_store, ccp_history, ccp_retention
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(ccp_store, "STORE_ROOT", str(tmp_path / "store"))
+    monkeypatch.setattr(ccp_history, "HISTORY_STAMP", str(tmp_path / "history.stamp"))
+    monkeypatch.setattr(ccp_job, "JOB_DIR", str(tmp_path / "jobs"))
+    monkeypatch.setattr(ccp_job, "LOCK_DIR", str(tmp_path / "locks"))
+    monkeypatch.setattr(ccp_job, "SCRATCH_FAST", "")
+    monkeypatch.setattr(ccp_job, "SCRATCH_DIR", str(tmp_path / "work"))
+    monkeypatch.setattr(ccp_job, "SCRATCH_RESERVE", 0)
+    monkeypatch.setattr(ccp_retention, "RETENTION_LOCK", str(tmp_path / "locks" / "retention.lock"))
+    ccp.version_index.clear()
+
+
+NOW = datetime(2026, 10, 18, 12)
+
+
+def history(*ages):
+    """최신 버전부터 저장 시점(현재 시각 기준 경과 시간)을 받아 히스토리 행 목록을 만든다."""
+    return [{"ver": len(ages) - index, "date": None if age is None else NOW - age} for index, age in enumerate(ages)]
+
+
+def test_select_versions_thins_each_tier_at_its_boundary(monkeypatch):
+    monkeypatch.setattr(ccp_retention, "KEEP_MIN", 1)
+    day, hour = timedelta(days=1), timedelta(hours=1)
+    records = history(
+        timedelta(0),            # 13: 최신 KEEP_MIN개
+        7 * day - hour,          # 12: KEEP_ALL_DAYS 미만은 모두 보존
+        7 * day - 2 * hour,      # 11
+        7 * day,                 # 10: 일 단위 구간 시작 (10/11의 최근 버전)
+        7 * day + hour,          # 9: 같은 날 → 정리
+        29 * day,                # 8: 일 단위 구간 마지막 날 (9/19)
+        29 * day + hour,         # 7: 같은 날 → 정리
+        30 * day,                # 6: 주 단위 구간 시작 (2026년 38주)
+        31 * day,                # 5: 같은 주 → 정리
+        180 * day,               # 4: 월 단위 구간 시작 (2026년 4월)
+        181 * day,               # 3: 같은 달 → 정리
+        400 * day,               # 2: 다른 달
+        None,                    # 1: 저장 시각을 알 수 없는 버전은 보존
+    )
+    keep, drop = ccp_retention.select_versions(records, now=NOW)
+    assert drop == [3, 5, 7, 9]
+    assert keep == [1, 2, 4, 6, 8, 10, 11, 12, 13]
+
+
+def test_select_versions_always_keeps_the_newest_keep_min(monkeypatch):
+    monkeypatch.setattr(ccp_retention, "KEEP_MIN", 3)
+    records = history(*[timedelta(days=400, hours=hours) for hours in range(5)])  # 모두 같은 달
+    keep, drop = ccp_retention.select_versions(records, now=NOW)
+    assert keep == [2, 3, 4, 5]
+    assert drop == [1]
+
+
+def test_forget_history_deletes_rows_in_one_statement(store, db_connection):
+    db_connection.rowcount = 3
+    ccp_retention.forget_history(3, [2, 5, 9])
+    assert db_connection.queries == [("DELETE FROM history WHERE p_no = %s AND ver IN (%s, %s, %s)", [[3, 2, 5, 9]])]
+    assert db_connection.committed
+    assert ccp_store.load_pruned(3) == {2, 5, 9}
+
+
+def test_forget_history_fails_loudly_but_keeps_versions_hidden(store, db_connection):
+    db_connection.error = Exception("connection lost")
+    with pytest.raises(Exception, match="connection lost"):
+        ccp_retention.forget_history(3, [2])
+    assert db_connection.rolled_back
+    assert ccp_store.load_pruned(3) == {2}
+
+
+def test_retention_job_reports_its_own_step_count(store, tmp_path, monkeypatch):
+    monkeypatch.setattr(ccp.csv_DB, "fetch_csv_history", lambda pid: [{"ver": 1, "date": "2026-10-18 00:00:00"}], raising=False)
+    (tmp_path / "store" / "4").mkdir(parents=True)
+    asyncio.run(ccp_retention.run_retention_cycle())
+    job = next(job for job in ccp_job.jobs.values() if job["kind"] == "retention")
+    assert job["status"] == "done"
+    assert job["total_steps"] == ccp_retention.RETENTION_STEPS == 4
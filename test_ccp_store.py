@@ -0,0 +1,90 @@
+"""
+   CodeCraft PMS Backend Project
+
+   파일명   : test_ccp_store.py
+   생성자   : 김창환
+
+   생성일   : 2026/10/18
+   업데이트 : 2026/10/18
+
+   설명     : ccp_store.py의 중복 제거 객체 저장소, 매니페스트 복원, CSV 패치 테스트 (pytest)
+"""
+
+from cryptography.fernet import Fernet
+import os, pytest
+import ccp_store
+
+KEY = Fernet.generate_key()
+PID = 3
+
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(ccp_store, "STORE_ROOT", str(tmp_path / "store"))
+
+
+def write_project(root, files):
+    for path, data in files.items():
+        file_path = root / path
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_bytes(data)
+    return str(root)
+
+
+def save(source_dir, staging_dir):
+    """버전 하나를 저장 (매니페스트 생성 → 새 객체 기록 → 업로드 완료 후 저장소 반영)"""
+    manifest = ccp_store.build_manifest(PID, source_dir)
+    digests = ccp_store.stage_new_objects(PID, source_dir, manifest, str(staging_dir), KEY)
+    ccp_store.commit_objects(PID, str(staging_dir), digests)
+    return manifest, digests
+
+
+def test_identical_content_is_stored_once_across_files_and_versions(tmp_path):
+    report = os.urandom(64 * 1024)
+    files = {
+        "DATABASE/project_3.csv": b"p_no,p_name\n3,A\n",
+        "OUTPUT/3/report.pdf": report,
+        "OUTPUT/3/copy/report.pdf": report,  # 같은 내용의 다른 파일
+    }
+    manifest, digests = save(write_project(tmp_path / "v1", files), tmp_path / "staging1")
+    assert len(manifest["files"]) == 3
+    assert len(digests) == 2
+    assert sorted(ccp_store.local_objects(PID)) == sorted(digests)
+
+    # 다음 버전에서 바뀐 파일은 CSV 하나뿐이므로 새 객체도 하나만 저장
+    files["DATABASE/project_3.csv"] = b"p_no,p_name\n3,B\n"
+    _, digests = save(write_project(tmp_path / "v2", files), tmp_path / "staging2")
+    assert digests == [ccp_store.hash_file(str(tmp_path / "v2" / "DATABASE/project_3.csv"))]
+    assert len(ccp_store.local_objects(PID)) == 3
+
+
+def test_manifest_restores_every_file_byte_for_byte(tmp_path):
+    files = {
+        "DATABASE/project_3.csv": b"p_no,p_name\n3,A\n",
+        "OUTPUT/3/report.pdf": os.urandom(3 * 1024 * 1024 + 7),  # 여러 청크로 나뉘는 파일
+        "OUTPUT/3/empty.txt": b"",
+    }
+    manifest, _ = save(write_project(tmp_path / "v1", files), tmp_path / "staging")
+    ccp_store.write_manifest(manifest, str(tmp_path / "3_1.ccp"), KEY)
+    restored = tmp_path / "restored"
+    ccp_store.restore_manifest(PID, ccp_store.read_manifest(str(tmp_path / "3_1.ccp"), KEY), str(restored), KEY)
+    assert {path: (restored / path).read_bytes() for path in files} == files
+
+
+def test_missing_object_is_reported_before_restore(tmp_path):
+    manifest, digests = save(write_project(tmp_path / "v1", {"OUTPUT/3/a.txt": b"a", "OUTPUT/3/b.txt": b"b"}), tmp_path / "staging")
+    ccp_store.remove_objects(PID, digests[:1])
+    assert ccp_store.missing_objects(PID, manifest) == digests[:1]
+    with pytest.raises(Exception, match="missing from the CCP store"):
+        ccp_store.restore_manifest(PID, manifest, str(tmp_path / "restored"), KEY)
+
+
+def test_csv_patch_rebuilds_the_current_csv_exactly():
+    base = b'p_no,note\n1,"a\nb"\n2,two\n3,three\n4,four'
+    data = b'p_no,note\n1,"a\nb"\n3,three\n2,"new\nline"\n4,four\n5,five'
+    patch = ccp_store.make_csv_patch(base, data)
+    # 따옴표 안의 줄바꿈은 레코드 경계가 아니므로 1번 행은 기준 레코드 복사로 표현됨
+    assert patch["ops"][0] == [0, 2]
+    assert ccp_store.apply_csv_patch(base, patch) == data
+    with pytest.raises(Exception, match="Unsupported CSV patch format"):
+        ccp_store.apply_csv_patch(base, dict(patch, format=0))
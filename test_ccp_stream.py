@@ -0,0 +1,159 @@
+"""
+   CodeCraft PMS Backend Project
+
+   파일명   : test_ccp_stream.py
+   생성자   : 김창환
+
+   생성일   : 2026/10/18
+   업데이트 : 2026/10/18
+
+   설명     : ccp_stream.py의 청크 단위 암호화/압축 컨테이너 테스트 (pytest)
+"""
+
+from cryptography.fernet import Fernet
+import io, os, struct, asyncio, threading, pytest
+import ccp_stream
+
+KEY = Fernet.generate_key()
+CHUNK = 4096
+
+
+def pack(data, codec=ccp_stream.CODEC_NONE, workers=1, chunk_size=CHUNK):
+    out = io.BytesIO()
+    with ccp_stream.CCPStreamWriter(out, KEY, chunk_size=chunk_size, codec=codec, workers=workers) as writer:
+        for i in range(0, len(data), 1000):  # tarfile처럼 청크 크기와 맞지 않는 단위로 기록
+            writer.write(data[i:i + 1000])
+    return out.getvalue()
+
+
+def unpack(blob, read_size=-1):
+    reader = ccp_stream.CCPStreamReader(io.BytesIO(blob), KEY)
+    if read_size < 0:
+        return reader.read()
+    parts = []
+    while True:
+        part = reader.read(read_size)
+        if not part:
+            return b"".join(parts)
+        parts.append(part)
+
+
+def sample(size=10 * CHUNK + 123):
+    # 압축되는 부분과 압축되지 않는 부분(무작위 바이트)을 섞음
+    return (b"codecraft " * (size // 20) + os.urandom(size))[:size]
+
+
+@pytest.mark.parametrize("codec", ["none", "gzip", pytest.param("zstd", marks=pytest.mark.skipif(ccp_stream.zstandard is None, reason="zstandard not installed"))])
+@pytest.mark.parametrize("workers", [1, 4])
+def test_round_trip(codec, workers):
+    data = sample()
+    blob = pack(data, ccp_stream.resolve_codec(codec), workers)
+    assert unpack(blob) == data
+    assert unpack(blob, read_size=777) == data
+
+
+def test_empty_stream_and_exact_chunk_multiple():
+    assert unpack(pack(b"")) == b""
+    data = os.urandom(3 * CHUNK)
+    assert unpack(pack(data)) == data
+
+
+def test_gzip_shrinks_compressible_data():
+    data = b"a" * (8 * CHUNK)
+    assert len(pack(data, ccp_stream.CODEC_GZIP)) < len(pack(data)) // 10
+
+
+def test_truncated_stream_is_rejected():
+    blob = pack(sample())
+    # 청크 경계에서 잘림 (마지막 청크 누락)
+    first = ccp_stream.HEADER_SIZE + 4 + struct.unpack("!I", blob[ccp_stream.HEADER_SIZE:ccp_stream.HEADER_SIZE + 4])[0]
+    with pytest.raises(Exception, match="final chunk is missing"):
+        unpack(blob[:first])
+    # 청크 중간에서 잘림
+    with pytest.raises(Exception, match="truncated inside a chunk"):
+        unpack(blob[:-10])
+
+
+def test_tampered_chunk_fails_authentication():
+    blob = bytearray(pack(sample()))
+    blob[ccp_stream.HEADER_SIZE + 20] ^= 0x01
+    with pytest.raises(Exception):
+        unpack(bytes(blob))
+
+
+def test_reordered_chunks_are_rejected():
+    blob = pack(os.urandom(3 * CHUNK + 10))
+    offset = ccp_stream.HEADER_SIZE
+    frames = []
+    while offset < len(blob):
+        length = struct.unpack("!I", blob[offset:offset + 4])[0] & ~ccp_stream.LAST_CHUNK_FLAG
+        frames.append(blob[offset:offset + 4 + length])
+        offset += 4 + length
+    frames[0], frames[1] = frames[1], frames[0]
+    with pytest.raises(Exception):
+        unpack(blob[:ccp_stream.HEADER_SIZE] + b"".join(frames))
+
+
+def test_bad_header_and_wrong_key():
+    blob = pack(b"data")
+    with pytest.raises(Exception, match="Not a CCP stream file"):
+        unpack(b"XXXX" + blob[4:])
+    with pytest.raises(Exception, match="Unsupported CCP stream version"):
+        unpack(blob[:4] + b"\x09" + blob[5:])
+    with pytest.raises(Exception):
+        ccp_stream.CCPStreamReader(io.BytesIO(blob), Fernet.generate_key()).read()
+
+
+def test_unknown_codec():
+    with pytest.raises(Exception, match="Unknown CCP codec"):
+        ccp_stream.resolve_codec("lz4")
+
+
+def test_stream_pipe_transfers_in_order_with_backpressure():
+    pipe = ccp_stream.StreamPipe(max_chunks=2)
+    received = []
+    reader = threading.Thread(target=lambda: received.append(pipe.read()))
+    blocks = [os.urandom(1000) for _ in range(50)]
+
+    async def produce():
+        reader.start()
+        for block in blocks:
+            assert await pipe.feed(block)
+        await pipe.finish()
+
+    asyncio.run(produce())
+    reader.join(5)
+    assert received == [b"".join(blocks)]
+
+
+def test_stream_pipe_abort_wakes_blocked_reader():
+    pipe = ccp_stream.StreamPipe()
+    errors = []
+
+    def read():
+        try:
+            pipe.read()
+        except Exception as e:
+            errors.append(str(e))
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    pipe.abort(Exception("client disconnected"))
+    reader.join(5)
+    assert not reader.is_alive()
+    assert errors == ["Stream aborted: client disconnected"]
+
+
+def test_stream_pipe_close_releases_blocked_producer():
+    pipe = ccp_stream.StreamPipe(max_chunks=1)
+
+    async def produce():
+        assert await pipe.feed(b"a")
+        closer = threading.Timer(0.05, pipe.close)
+        closer.start()
+        # 대기열이 가득 찬 상태에서 읽는 쪽이 종료되면 대기하던 feed가 깨어나 False를 반환
+        result = await asyncio.wait_for(pipe.feed(b"b"), 5)
+        closer.join()
+        return result, await pipe.feed(b"c")
+
+    assert asyncio.run(produce()) == (False, False)
@@ -0,0 +1,167 @@
+"""
+   CodeCraft PMS Backend Project
+
+   파일명   : test_ccp_transport.py
+   생성자   : 김창환
+
+   생성일   : 2026/10/18
+   업데이트 : 2026/10/18
+
+   설명     : ccp_transport.py의 Range 다운로드 재시도/이어받기, 헤더 읽기, 변경된 파일 이어받기 거부, 로컬 전송 테스트 (pytest)
+"""
+
+from contextlib import asynccontextmanager
+import os, asyncio, pytest
+import ccp_transport
+
+CHUNK = 1024
+
+
+class FakeResponse:
+    def __init__(self, status_code, content=b"", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    async def aread(self):
+        return self.content
+
+    async def aiter_bytes(self):
+        yield self.content
+
+
+class FakeStorage:
+    """Range 요청을 지원하는 Storage 서버 (failures: 청크 번호 -> 남은 실패 횟수)"""
+
+    def __init__(self, data, failures=None, etag=None):
+        self.data = data
+        self.failures = dict(failures or {})
+        self.etag = etag
+        self.requested = []
+
+    def _range(self, headers):
+        if "If-Range" in headers and headers["If-Range"] != self.etag:
+            return FakeResponse(200, self.data, {"ETag": self.etag})
+        start, end = headers["Range"][len("bytes="):].split("-")
+        start, end = int(start), min(int(end), len(self.data) - 1)
+        response_headers = {"Content-Range": f"bytes {start}-{end}/{len(self.data)}"}
+        if self.etag:
+            response_headers["ETag"] = self.etag
+        return FakeResponse(206, self.data[start:end + 1], response_headers)
+
+    @asynccontextmanager
+    async def stream(self, path, params=None, headers=None):
+        yield self._range(headers)
+
+    async def post(self, path, op=None, params=None, headers=None, **kwargs):
+        index = int(headers["Range"][len("bytes="):].split("-")[0]) // CHUNK
+        self.requested.append(index)
+        if self.failures.get(index, 0) > 0:
+            self.failures[index] -= 1
+            return FakeResponse(503)
+        return self._range(headers)
+
+
+@pytest.fixture
+def transport(tmp_path, monkeypatch):
+    monkeypatch.setattr(ccp_transport, "CHUNK_SIZE", CHUNK)
+    monkeypatch.setattr(ccp_transport, "PART_DIR", str(tmp_path / "parts"))
+    return ccp_transport.HttpStorageTransport()
+
+
+def test_base_transport_is_abstract():
+    with pytest.raises(TypeError):
+        ccp_transport.StorageTransport()
+
+
+def test_failed_ranges_are_retried_within_one_download(transport, monkeypatch, tmp_path):
+    data = os.urandom(10 * CHUNK + 100)
+    storage = FakeStorage(data, failures={3: 1, 7: 2})
+    monkeypatch.setattr(ccp_transport, "storage", storage)
+    dst = tmp_path / "work" / "1.ccp"
+    asyncio.run(transport.download("ccp", {"pid": 1, "ver": 2}, str(dst)))
+    assert dst.read_bytes() == data
+    assert sorted(storage.requested) == [1, 2, 3, 3, 4, 5, 6, 7, 7, 7, 8, 9, 10]
+    assert not os.listdir(tmp_path / "parts" / "1" / "ccp")
+
+
+def test_interrupted_download_resumes_outside_the_workspace(transport, monkeypatch, tmp_path):
+    """재시도 후에도 실패하면 받은 청크를 PART_DIR에 남겨, 작업 공간이 삭제된 뒤 다음 작업에서 이어받는다."""
+    data = os.urandom(6 * CHUNK)
+    storage = FakeStorage(data, failures={4: ccp_transport.RETRIES})
+    monkeypatch.setattr(ccp_transport, "storage", storage)
+    first_workspace = tmp_path / "job1"
+    with pytest.raises(Exception, match="Failed to download 1 of 6 ranges"):
+        asyncio.run(transport.download("object", {"pid": 1, "name": "abc"}, str(first_workspace / "abc")))
+    assert not first_workspace.joinpath("abc").exists()
+    assert (tmp_path / "parts" / "1" / "object" / "abc.part.json").exists()
+
+    storage.requested.clear()
+    second = tmp_path / "job2" / "abc"
+    asyncio.run(transport.download("object", {"pid": 1, "name": "abc"}, str(second)))
+    assert second.read_bytes() == data
+    assert storage.requested == [4]
+
+
+def test_local_transport_round_trip(tmp_path):
+    transport = ccp_transport.LocalStorageTransport(str(tmp_path / "storage"))
+    src = tmp_path / "src.ccp"
+    src.write_bytes(b"manifest")
+    transport.upload("ccp", 3, "3_1.ccp", str(src))
+    asyncio.run(transport.download("ccp", {"pid": 3, "ver": 1}, str(tmp_path / "out" / "3_1.ccp")))
+    assert (tmp_path / "out" / "3_1.ccp").read_bytes() == b"manifest"
+    transport.delete("ccp", 3, "3_1.ccp")
+    with pytest.raises(Exception, match="not found"):
+        asyncio.run(transport.download("ccp", {"pid": 3, "ver": 1}, str(tmp_path / "out" / "again.ccp")))
+
+
+def test_read_head_only_requests_the_first_bytes(transport, monkeypatch):
+    data = os.urandom(10 * CHUNK)
+    storage = FakeStorage(data)
+    monkeypatch.setattr(ccp_transport, "storage", storage)
+    assert asyncio.run(transport.read_head("ccp", {"pid": 1, "ver": 2}, 4)) == data[:4]
+    assert storage.requested == []  # 청크 다운로드 요청 없음
+
+
+def test_partial_download_of_a_different_file_is_not_resumed(transport, monkeypatch, tmp_path):
+    """같은 이름이라도 크기나 ETag가 다른 파일(히스토리 삭제 후 다시 만든 버전 등)의 받은 청크는 버리고 처음부터 받는다."""
+    old = os.urandom(6 * CHUNK)
+    storage = FakeStorage(old, failures={4: ccp_transport.RETRIES}, etag='"old"')
+    monkeypatch.setattr(ccp_transport, "storage", storage)
+    with pytest.raises(Exception):
+        asyncio.run(transport.download("ccp", {"pid": 1, "ver": 1}, str(tmp_path / "job1" / "1.ccp")))
+
+    new = os.urandom(6 * CHUNK)
+    storage = FakeStorage(new, etag='"new"')
+    monkeypatch.setattr(ccp_transport, "storage", storage)
+    dst = tmp_path / "job2" / "1.ccp"
+    asyncio.run(transport.download("ccp", {"pid": 1, "ver": 1}, str(dst)))
+    assert dst.read_bytes() == new
+    assert sorted(storage.requested) == [1, 2, 3, 4, 5]
+
+
+def test_file_changed_during_download_is_rejected(transport, monkeypatch, tmp_path):
+    """받는 도중 서버의 파일이 바뀌면 If-Range 불일치로 구간 요청이 실패한다."""
+    storage = FakeStorage(os.urandom(4 * CHUNK), etag='"v1"')
+    stream = storage.stream
+
+    @asynccontextmanager
+    async def stream_then_replace(*args, **kwargs):
+        async with stream(*args, **kwargs) as response:
+            yield response
+        storage.data, storage.etag = os.urandom(4 * CHUNK), '"v2"'  # 첫 구간을 받은 직후 서버의 파일이 바뀜
+
+    storage.stream = stream_then_replace
+    monkeypatch.setattr(ccp_transport, "storage", storage)
+    with pytest.raises(Exception, match="ranges"):
+        asyncio.run(transport.download("ccp", {"pid": 1, "ver": 1}, str(tmp_path / "1.ccp")))
+
+
+def test_remove_parts_clears_the_project_partial_downloads(transport, monkeypatch, tmp_path):
+    storage = FakeStorage(os.urandom(4 * CHUNK), failures={2: ccp_transport.RETRIES})
+    monkeypatch.setattr(ccp_transport, "storage", storage)
+    with pytest.raises(Exception):
+        asyncio.run(transport.download("ccp", {"pid": 1, "ver": 1}, str(tmp_path / "1.ccp")))
+    assert (tmp_path / "parts" / "1").exists()
+    ccp_transport.remove_parts(1)
+    assert not (tmp_path / "parts" / "1").exists()
@@ -0,0 +1,74 @@
+"""
+   CodeCraft PMS Backend Project
+
+   파일명   : test_deleted_project.py
+   생성자   : 김창환
+
+   생성일   : 2026/10/18
+   업데이트 : 2026/10/18
+
+   설명     : deleted_project.py의 SQLite 저장소 조회/갱신, 기존 JSON 이전, 동시 쓰기 테스트 (pytest)
+"""
+
+import json, threading, pytest
+import deleted_project
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(deleted_project, "DB_PATH", str(tmp_path / "deleted_project.db"))
+    monkeypatch.setattr(deleted_project, "LEGACY_JSON_PATH", str(tmp_path / "deleted_project.json"))
+    monkeypatch.setattr(deleted_project, "local", threading.local())
+    monkeypatch.setattr(deleted_project, "migrated", False)
+    return tmp_path
+
+
+def test_save_fetch_and_remove(store):
+    deleted_project.initialize()
+    deleted_project.save_deleted_project(1, "A", True, "2026-10-18 09:00:00")
+    deleted_project.save_deleted_project(2, "B", False, "2026-10-18 09:00:01")
+    deleted_project.save_deleted_project(1, "A2", False, "2026-10-18 09:00:02")  # 같은 pid는 덮어씀
+
+    assert deleted_project.fetch_deleted_project(1) == {"pname": "A2", "deleted_time": "2026-10-18 09:00:02", "ccp": False}
+    assert deleted_project.fetch_deleted_project(3) is None
+    assert deleted_project.fetch_deleted_projects(["2", 3, *range(1000, 1600)]) == {
+        2: {"pname": "B", "deleted_time": "2026-10-18 09:00:01", "ccp": False}
+    }
+    assert deleted_project.remove_deleted_project(2) is True
+    assert deleted_project.remove_deleted_project(2) is False
+    assert deleted_project.fetch_deleted_projects([1, 2]).keys() == {1}
+
+
+def test_legacy_json_is_migrated_once_on_startup(store):
+    (store / "deleted_project.json").write_text(json.dumps({
+        "1": {"pname": "A", "deleted_time": "2026-10-18 09:00:00", "ccp": True},
+        "2": {"pname": "B", "deleted_time": "2026-10-18 09:00:01"},
+        "bad": {"pname": "C"},  # pid가 숫자가 아닌 항목은 무시
+    }))
+    deleted_project.initialize()
+    assert not (store / "deleted_project.json").exists()
+    assert (store / "deleted_project.json.migrated").exists()
+    assert deleted_project.fetch_deleted_projects([1, 2]) == {
+        1: {"pname": "A", "deleted_time": "2026-10-18 09:00:00", "ccp": True},
+        2: {"pname": "B", "deleted_time": "2026-10-18 09:00:01", "ccp": False},
+    }
+
+
+def test_concurrent_writers_do_not_lose_entries(store):
+    deleted_project.initialize()
+    errors = []
+
+    def writer(offset):
+        try:
+            for pid in range(offset, offset + 50):
+                deleted_project.save_deleted_project(pid, f"P{pid}", pid % 2 == 0, "2026-10-18 09:00:00")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(i * 50,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(deleted_project.fetch_deleted_projects(range(400))) == 400
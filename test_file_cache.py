@@ -0,0 +1,71 @@
+"""
+   CodeCraft PMS Backend Project
+
+   파일명   : test_file_cache.py
+   생성자   : 김창환
+
+   생성일   : 2026/10/18
+   업데이트 : 2026/10/18
+
+   설명     : file_cache.py의 캐시 저장(tee), 조회 후 삭제된 항목 전송 테스트 (pytest)
+"""
+
+import os, asyncio, threading, pytest
+import file_cache
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_cache, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(file_cache, "MAX_BYTES", 1024 * 1024)
+
+
+async def source(data, size=1000):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+def fill(file_path, data):
+    async def scenario():
+        return b"".join([block async for block in file_cache.tee(file_path, source(data), expected_size=len(data))])
+    return asyncio.run(scenario())
+
+
+def read_all(entry):
+    async def scenario():
+        return b"".join([block async for block in file_cache.read_range(entry, 0, entry["size"] - 1)])
+    return asyncio.run(scenario())
+
+
+def test_tee_writes_to_disk_off_the_event_loop(monkeypatch):
+    data = os.urandom(10_000)
+    threads = set()
+    write = file_cache._write
+
+    def recording_write(f, digest, block):
+        threads.add(threading.current_thread())
+        write(f, digest, block)
+
+    monkeypatch.setattr(file_cache, "_write", recording_write)
+    assert fill("/storage/a.pdf", data) == data
+    assert threads and threading.main_thread() not in threads
+    entry = file_cache.lookup("/storage/a.pdf")
+    try:
+        assert read_all(entry) == data
+    finally:
+        file_cache.release(entry)
+
+
+def test_entry_evicted_after_lookup_is_still_served_to_the_end():
+    """조회와 전송 사이에 LRU 정리로 항목이 삭제되어도 조회 시 연 파일로 끝까지 전송한다."""
+    data = os.urandom(600 * 1024)
+    fill("/storage/a.pdf", data)
+    entry = file_cache.lookup("/storage/a.pdf")
+    try:
+        fill("/storage/b.pdf", os.urandom(600 * 1024))  # 크기 제한을 넘어 a.pdf가 정리됨
+        assert not os.path.exists(entry["path"])
+        assert read_all(entry) == data
+        assert read_all(entry) == data  # 재시도처럼 다시 읽어도 같은 내용
+    finally:
+        file_cache.release(entry)
+    assert file_cache.lookup("/storage/a.pdf") is None
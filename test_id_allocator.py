@@ -0,0 +1,88 @@
+"""
+   CodeCraft PMS Backend Project
+
+   파일명   : test_id_allocator.py
+   생성자   : 김창환
+
+   생성일   : 2026/10/18
+   업데이트 : 2026/10/18
+
+   설명     : id_allocator.py의 블록 단위 번호 발급 테스트 (pytest)
+"""
+
+import time, asyncio, threading, pytest
+import batch_DB, id_allocator
+
+
+@pytest.fixture
+def used(tmp_path, monkeypatch, db_connection):
+    """DB에 이미 저장된 번호 집합 (IN 조회 결과를 이 집합으로 계산)"""
+    monkeypatch.setattr(id_allocator, "DB_PATH", str(tmp_path / "id_allocator.db"))
+    existing = set()
+    db_connection.rows = lambda query, rows: [(uid,) for uid in set(rows[0]) if uid in existing]
+    return existing
+
+
+def test_skips_ids_already_in_use_with_one_query_per_window(used, db_connection):
+    used.update(range(1, 101, 2))
+    allocator = id_allocator.IdAllocator("test", 1, 100, 8, batch_DB.PROJECT_ID_SOURCES)
+    ids = [allocator.allocate() for _ in range(30)]
+    assert len(set(ids)) == 30
+    assert not used & set(ids)
+    assert all(query.startswith("SELECT p_no FROM project WHERE p_no IN (") for query, _ in db_connection.queries)
+    assert len(db_connection.queries) < 30
+
+
+def test_ids_are_unique_across_threads(used):
+    allocator = id_allocator.IdAllocator("test", 1, 10_000, 16, batch_DB.FILE_ID_SOURCES)
+    results = []
+
+    def worker():
+        for _ in range(100):
+            uid = allocator.allocate()
+            results.append(uid)
+            used.add(uid)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(results) == len(set(results)) == 800
+
+
+def test_wraps_around_and_fails_when_the_range_is_exhausted(used):
+    used.update(range(1, 16))
+    allocator = id_allocator.IdAllocator("test", 1, 20, 4, batch_DB.PROJECT_ID_SOURCES)
+    ids = [allocator.allocate() for _ in range(5)]
+    assert sorted(ids) == [16, 17, 18, 19, 20]
+    used.update(ids)
+    with pytest.raises(Exception, match="No free test id left in range 1-20"):
+        allocator.allocate()
+
+
+def test_allocate_async_does_not_block_the_event_loop(used, db_connection):
+    def slow_lookup(query, rows):
+        time.sleep(0.2)  # 느린 DB 조회
+        return []
+
+    db_connection.rows = slow_lookup
+    allocator = id_allocator.IdAllocator("test", 1, 1000, 8, batch_DB.PROJECT_ID_SOURCES)
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        uid = await allocator.allocate_async()
+        task.cancel()
+        return uid, ticks
+
+    uid, ticks = asyncio.run(scenario())
+    assert uid == 1
+    assert ticks >= 10
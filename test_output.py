@@ -0,0 +1,257 @@
+"""
+   CodeCraft PMS Backend Project
+
+   파일명   : test_output.py
+   생성자   : 김창환
+
+   생성일   : 2026/10/18
+   업데이트 : 2026/10/18
+
+   설명     : output.py의 기타 산출물 다운로드 응답, 업로드 크기 제한과 스트리밍 전송, 일괄 저장, 프로젝트 압축 파일 항목 이름과 연결 종료 처리 테스트 (pytest)
+"""
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import asyncio, pytest
+import output, file_cache
+
+app = FastAPI()
+app.include_router(output.router)
+client = TestClient(app)
+
+
+@pytest.fixture
+def cached_file(tmp_path, monkeypatch):
+    """file_no 1이 가리키는 파일이 로컬 캐시에 있는 상태 (etag는 테스트에서 지정)"""
+    data = bytes(range(256)) * 4
+    entry = {"path": str(tmp_path / "cached"), "size": len(data), "etag": '"v1"', "content_type": "application/pdf"}
+    (tmp_path / "cached").write_bytes(data)
+    monkeypatch.setattr(output.output_DB, "fetch_one_other_documents",
+                        lambda file_no: {"file_path": "/storage/a.pdf", "file_name": "a.pdf"} if file_no == 1 else None, raising=False)
+    monkeypatch.setattr(file_cache, "lookup", lambda file_path: dict(entry, file=open(entry["path"], "rb")))
+    return data, entry
+
+
+def test_missing_document_is_404_not_500(cached_file):
+    response = client.post("/output/otherdoc_download", json={"file_no": 2})
+    assert response.status_code == 404
+    assert response.json()["detail"] == "File not found in database"
+
+
+def test_push_path_returns_the_push_result(cached_file, monkeypatch):
+    pushed = []
+
+    async def push_storage_file(file_path, file_name, refs=()):
+        pushed.append((file_path, file_name))
+        return {"RESULT_CODE": 200, "RESULT_MSG": "File transferred successfully"}
+
+    monkeypatch.setattr(output, "push_storage_file", push_storage_file)
+    response = client.post("/output/otherdoc_download", json={"file_no": 1})
+    assert response.status_code == 200
+    assert response.json() == {"RESULT_CODE": 200, "RESULT_MSG": "File transferred successfully"}
+    assert pushed == [("/storage/a.pdf", "a.pdf")]
+
+
+@pytest.mark.parametrize("etag, if_range, partial", [
+    ('"v1"', '"v1"', True),      # 강한 ETag 일치
+    ('"v1"', '"v2"', False),     # 불일치 → 전체 전송
+    ('"v1"', 'W/"v1"', False),   # 약한 비교로만 일치 → 전체 전송
+    ('W/"v1"', 'W/"v1"', False), # 약한 ETag는 If-Range에 사용할 수 없음
+])
+def test_if_range_uses_strong_comparison(cached_file, etag, if_range, partial):
+    data, entry = cached_file
+    entry["etag"] = etag
+    response = client.post("/output/otherdoc_download", json={"file_no": 1, "direct": True},
+                           headers={"Range": "bytes=10-19", "If-Range": if_range})
+    if partial:
+        assert response.status_code == 206
+        assert response.content == data[10:20]
+    else:
+        assert response.status_code == 200
+        assert response.content == data
+
+
+def test_if_none_match_keeps_weak_comparison(cached_file):
+    _, entry = cached_file
+    entry["etag"] = 'W/"v1"'
+    response = client.post("/output/otherdoc_download", json={"file_no": 1, "direct": True}, headers={"If-None-Match": '"v1"'})
+    assert response.status_code == 304
+
+
+@pytest.fixture
+def uploads(monkeypatch):
+    """Storage 서버 업로드를 대신하는 upload_other_document (업로드된 경로와 삭제된 경로를 기록)"""
+    state = {"removed": [], "ids": iter(range(500, 600))}
+
+    async def upload_other_document(idx, total_files, file, file_unique_id, pid, univ_id, headers, semaphore, state_):
+        return {"file_unique_id": file_unique_id, "file_name": file.filename,
+                "file_path": f"/storage/{pid}/{file.filename}", "file_date": "2026-10-18 09:00:00"}
+
+    async def gen_file_uid():
+        return next(state["ids"])
+
+    monkeypatch.setattr(output, "upload_other_document", upload_other_document)
+    monkeypatch.setattr(output, "gen_file_uid", gen_file_uid)
+    monkeypatch.setattr(output, "remove_uploaded_files", lambda paths: state["removed"].extend(paths))
+    return state
+
+
+def post_other_documents(names):
+    files = [("files", (name, b"data", "application/pdf")) for name in names]
+    return client.post("/output/otherdoc_add", files=files, data={"pid": "7", "univ_id": "20240001"})
+
+
+def test_other_documents_are_saved_with_one_multi_row_insert(uploads, db_connection):
+    response = post_other_documents(["a.pdf", "b.pdf", "c.pdf"])
+    assert response.status_code == 200
+    assert len(db_connection.queries) == 1
+    query, rows = db_connection.queries[0]
+    assert query.startswith("INSERT INTO doc_other (file_no, file_name, file_path, file_date, s_no, p_no) VALUES")
+    assert rows == [[500 + i, name, f"/storage/7/{name}", "2026-10-18 09:00:00", 20240001, 7] for i, name in enumerate(["a.pdf", "b.pdf", "c.pdf"])]
+    assert db_connection.committed
+    assert uploads["removed"] == []
+
+
+def test_failed_insert_rolls_back_and_removes_every_upload(uploads, db_connection):
+    db_connection.error = Exception("duplicate entry")
+    response = post_other_documents(["a.pdf", "b.pdf"])
+    assert response.status_code == 500
+    assert db_connection.rolled_back and not db_connection.committed
+    assert uploads["removed"] == ["/storage/7/a.pdf", "/storage/7/b.pdf"]
+
+
+def test_project_archive_names_are_sanitized_and_unique(monkeypatch):
+    db = {
+        "fetch_all_other_documents": lambda pid: [
+            {"file_no": 1, "file_name": "../../etc/passwd", "file_path": "/s/1"},
+            {"file_no": 2, "file_name": "C:\\Users\\me\\report.pdf", "file_path": "/s/2"},
+            {"file_no": 3, "file_name": "report.pdf", "file_path": "/s/3"},
+            {"file_no": 4, "file_name": "REPORT.pdf", "file_path": "/s/4"},
+            {"file_no": 5, "file_name": "/", "file_path": "/s/5"},
+        ],
+        "fetch_all_summary_documents": lambda pid: [{"doc_s_no": 10}],
+        "fetch_all_meeting_minutes": lambda pid: [],
+        "fetch_all_reqspec": lambda pid: [],
+        "fetch_all_report": lambda pid: [],
+        "fetch_all_attachments": lambda doc_type, doc_no, pid: [
+            {"doc_a_no": 21, "doc_a_name": "a/b.png", "doc_a_path": "/s/21"},
+            {"doc_a_no": 22, "doc_a_name": "b.png", "doc_a_path": "/s/22"},
+        ],
+    }
+    for name, function in db.items():
+        monkeypatch.setattr(output.output_DB, name, function, raising=False)
+    names = [name for name, _, _ in output.collect_project_files(7)]
+    assert names == [
+        "기타산출물/passwd",
+        "기타산출물/report.pdf",
+        "기타산출물/report (2).pdf",
+        "기타산출물/REPORT (3).pdf",
+        "기타산출물/unnamed",
+        "첨부파일/0_10/b.png",
+        "첨부파일/0_10/b (2).png",
+    ]
+    assert [name for name, _, _ in output.collect_project_files(7, doc_types=[1], include_other=False)] == []
+
+
+def test_archive_stream_cancels_every_fetch_when_the_client_disconnects(monkeypatch):
+    """클라이언트가 파일 전송 도중 연결을 끊으면 기록 중인 파일과 미리 받는 파일의 Task가 모두 종료된다."""
+    fetch_tasks = []
+
+    async def fetch_archive_file(file_path, refs, queue):
+        fetch_tasks.append(asyncio.current_task())
+        while True:  # 끝나지 않는 Storage 스트림
+            await queue.put(b"x" * 1024)
+
+    monkeypatch.setattr(output, "fetch_archive_file", fetch_archive_file)
+    files = [(f"기타산출물/{i}.bin", f"/s/{i}", []) for i in range(output.ARCHIVE_CONCURRENCY + 2)]
+
+    async def scenario():
+        stream = output.project_archive_stream(7, files)
+        await stream.__anext__()  # 첫 파일 일부를 보낸 뒤 연결 종료
+        await stream.aclose()
+        await asyncio.sleep(0)
+        return [task for task in fetch_tasks if not task.done()]
+
+    assert asyncio.run(scenario()) == []
+    assert len(fetch_tasks) == output.ARCHIVE_CONCURRENCY + 1
+
+
+def test_upload_budget_queues_uploads_until_space_is_released(monkeypatch):
+    monkeypatch.setattr(output, "UPLOAD_QUEUE_TIMEOUT", 5)
+    budget = output.UploadBudget(limit=100)
+
+    async def scenario():
+        order = []
+        release = asyncio.Event()
+
+        async def upload(name, size):
+            async with budget.reserve(size):
+                order.append(f"{name} start")
+                if name == "a":
+                    await release.wait()
+            order.append(f"{name} done")
+
+        first = asyncio.ensure_future(upload("a", 70))
+        await asyncio.sleep(0.01)
+        second = asyncio.ensure_future(upload("b", 40))  # 70 + 40 > 100이므로 대기
+        await asyncio.sleep(0.05)
+        assert order == ["a start"] and budget.in_use == 70
+        release.set()
+        await asyncio.gather(first, second)
+        return order
+
+    assert asyncio.run(scenario()) == ["a start", "a done", "b start", "b done"]
+    assert budget.in_use == 0
+
+
+def test_upload_budget_rejects_oversized_and_timed_out_uploads(monkeypatch):
+    monkeypatch.setattr(output, "UPLOAD_QUEUE_TIMEOUT", 0.05)
+    budget = output.UploadBudget(limit=100)
+
+    async def scenario():
+        with pytest.raises(output.HTTPException) as oversized:
+            async with budget.reserve(101):
+                pass
+        async with budget.reserve(100):
+            with pytest.raises(output.HTTPException) as timed_out:
+                async with budget.reserve(1):
+                    pass
+        return oversized.value.status_code, timed_out.value.status_code
+
+    assert asyncio.run(scenario()) == (413, 503)
+    assert budget.in_use == 0
+
+
+def test_upload_request_over_the_limit_is_rejected_before_uploading(uploads, monkeypatch):
+    monkeypatch.setattr(output, "UPLOAD_REQUEST_LIMIT", 7)
+    started = []
+    monkeypatch.setattr(output, "gen_file_uid", lambda: started.append(True))
+    response = post_other_documents(["a.pdf", "b.pdf"])  # 4 + 4 bytes
+    assert response.status_code == 413
+    assert started == []
+
+
+def test_upload_streams_the_spooled_file_instead_of_reading_it(monkeypatch):
+    sent = []
+
+    async def post(path, op, files, data, headers):
+        _, body, _ = files["file"]
+        sent.append((body, body.read()))
+        return {"path": path}
+
+    class SpooledUpload:
+        filename = "a.pdf"
+        content_type = "application/pdf"
+        size = 4
+
+        def __init__(self, tmp):
+            self.file = tmp
+
+    monkeypatch.setattr(output.storage, "post", post)
+    with open(__file__, "rb") as f:
+        expected = f.read()  # 요청 파싱 후 위치가 처음이 아니어도 처음부터 전송
+        asyncio.run(output.upload_to_storage("/output/upload", SpooledUpload(f), {}, {}))
+    # 내용을 bytes로 읽어 넘기지 않고 파일 객체 그대로 multipart 본문으로 전달
+    assert sent[0][0] is f
+    assert sent[0][1] == expected
+    assert output.upload_budget.in_use == 0
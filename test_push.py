@@ -0,0 +1,108 @@
+"""
+   CodeCraft PMS Backend Project
+
+   파일명   : test_push.py
+   생성자   : 김창환
+
+   생성일   : 2026/10/18
+   업데이트 : 2026/10/18
+
+   설명     : push.py의 연결 풀 수명(start/aclose), 작업 스레드 전송(call), tar 일괄 전송 테스트 (pytest)
+"""
+
+import os, io, asyncio, tarfile, httpx, pytest
+import push
+
+
+def test_push_requires_start(tmp_path):
+    client = push.PushClient("http://next.test/api/file_receive")
+    coro = client.push_file(str(tmp_path / "missing"), "missing")
+    with pytest.raises(Exception, match="not started"):
+        client.call(coro)
+    with pytest.raises(Exception, match="not started"):
+        asyncio.run(client.send(lambda: b"", "empty"))
+
+
+def test_worker_thread_push_uses_the_started_pool(tmp_path, monkeypatch):
+    received = []
+
+    def handler(request):
+        received.append((request.headers["file-name"], request.read()))
+        return httpx.Response(200)
+
+    file_path = tmp_path / "report.pdf"
+    file_path.write_bytes(b"x" * (push.CHUNK_SIZE + 10))
+
+    async def scenario():
+        client = push.PushClient("http://next.test/api/file_receive")
+        await client.start()
+        pool = client.client
+        pool._transport = httpx.MockTransport(handler)
+        monkeypatch.setattr(push, "pusher", client)
+        try:
+            # docs_converter처럼 작업 스레드에서 동기 함수로 전송
+            result = await asyncio.to_thread(push.push_to_nextjs, str(file_path), "report.pdf")
+            with pytest.raises(Exception, match="would block the event loop"):
+                client.call(client.push_file(str(file_path), "report.pdf"))
+            assert client.client is pool
+            return result
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(scenario())["RESULT_CODE"] == 200
+    assert received == [("report.pdf", file_path.read_bytes())]
+
+
+def test_push_client_is_not_rebound_to_another_loop():
+    client = push.PushClient("http://next.test/api/file_receive")
+    asyncio.run(client.start())
+    created = client.client
+    with pytest.raises(Exception, match="bound to another event loop"):
+        asyncio.run(client.send(lambda: b"", "empty"))
+    assert client.client is created
+
+
+def test_push_batch_sends_one_tar_with_the_exact_length(tmp_path):
+    received = []
+
+    def handler(request):
+        received.append((request.headers["file-name"], int(request.headers["content-length"]), request.read()))
+        return httpx.Response(200)
+
+    files, contents = [], []
+    # 여러 청크에 걸친 파일, 빈 파일, 한글 이름, 100 bytes를 넘는 이름
+    for name, size in (("report.pdf", push.CHUNK_SIZE + 10), ("회의록.txt", 0), ("a" * 120 + ".md", 513)):
+        contents.append(os.urandom(size))
+        (tmp_path / name).write_bytes(contents[-1])
+        files.append((str(tmp_path / name), f"docs/{name}"))
+
+    async def scenario():
+        client = push.PushClient("http://next.test/api/file_receive")
+        await client.start()
+        client.client._transport = httpx.MockTransport(handler)
+        try:
+            return await client.push_batch(files, "project_7.tar")
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(scenario())["RESULT_CODE"] == 200
+    [(name, length, body)] = received
+    assert name == "project_7.tar"
+    assert length == len(body) == push.tar_length(push.tar_entries(files))
+    with tarfile.open(fileobj=io.BytesIO(body)) as archive:
+        members = archive.getmembers()
+        assert [member.name for member in members] == [name for _, name in files]
+        assert [archive.extractfile(member).read() for member in members] == contents
+
+
+def test_push_batch_fails_when_a_file_shrinks_after_the_header(tmp_path):
+    file_path = tmp_path / "report.pdf"
+    file_path.write_bytes(b"x" * 100)
+    entries = push.tar_entries([(str(file_path), "report.pdf")])
+    file_path.write_bytes(b"x" * 10)
+
+    async def drain():
+        return [block async for block in push.tar_stream(entries)]
+
+    with pytest.raises(Exception, match="changed while building the archive"):
+        asyncio.run(drain())
@@ -0,0 +1,84 @@
+"""
+   CodeCraft PMS Backend Project
+
+   파일명   : test_storage_client.py
+   생성자   : 김창환
+
+   생성일   : 2026/10/18
+   업데이트 : 2026/10/18
+
+   설명     : storage_client.py의 연결 풀 수명(start/aclose)과 작업 스레드 호출(call) 테스트 (pytest)
+"""
+
+import asyncio, httpx, pytest
+from storage_client import StorageClient
+
+
+async def loop_of_caller():
+    return asyncio.get_running_loop()
+
+
+def test_call_requires_start():
+    client = StorageClient("http://storage.test")
+    coro = loop_of_caller()
+    with pytest.raises(Exception, match="not started"):
+        client.call(coro)
+    assert coro.cr_frame is None  # 실행하지 않은 코루틴은 닫힘 (never awaited 경고 없음)
+
+
+def test_call_runs_on_the_client_loop_from_worker_threads():
+    async def scenario():
+        client = StorageClient("http://storage.test")
+        await client.start()
+        try:
+            loop = asyncio.get_running_loop()
+            assert await asyncio.to_thread(client.call, loop_of_caller()) is loop
+            # 이벤트 루프 스레드에서 call()을 사용하면 교착 대신 예외
+            with pytest.raises(Exception, match="would block the event loop"):
+                client.call(loop_of_caller())
+        finally:
+            await client.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_client_is_not_rebound_to_another_loop():
+    client = StorageClient("http://storage.test")
+
+    async def start():
+        await client.start()
+        return client.client
+
+    async def use():
+        return client._client()
+
+    created = asyncio.run(start())
+    with pytest.raises(Exception, match="bound to another event loop"):
+        asyncio.run(use())
+    assert client.client is created
+    with pytest.raises(Exception, match="already started"):
+        asyncio.run(start())
+
+
+def test_requests_use_the_started_pool():
+    seen = []
+
+    def handler(request):
+        seen.append(request.url.path)
+        return httpx.Response(200, json={"ok": True})
+
+    async def scenario():
+        client = StorageClient("http://storage.test/api")
+        await client.start()
+        pool = client.client
+        pool._transport = httpx.MockTransport(handler)
+        try:
+            response = await client.post("/ccp/chunk_status")
+            threaded = await asyncio.to_thread(client.call, client.post("/ccp/delete"))
+            assert client.client is pool
+            return response.json(), threaded.status_code
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(scenario()) == ({"ok": True}, 200)
+    assert seen == ["/api/ccp/chunk_status", "/api/ccp/delete"]